@@ -0,0 +1,47 @@
+"""
+Time to insert candidates into a ParetoIndex vs naively rebuilding the frontier after each insert.
+
+    python -m benchmarks.bench_pareto [candidates] [instances]
+"""
+import sys
+import time
+
+import numpy as np
+
+from src.optimization.pareto import ParetoIndex
+
+def naive_frontier(scores):
+    best = scores.max(axis=0)
+    on_best = np.flatnonzero((scores == best).any(axis=1))
+    return [
+        i for i in on_best
+        if not any((scores[j] >= scores[i]).all() and (scores[j] > scores[i]).any() for j in on_best if j != i)
+    ]
+
+def main():
+    candidates = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    instances = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    rng = np.random.default_rng(0)
+    # Later candidates tend to be better, as in an optimization run
+    skill = np.linspace(0.3, 0.8, candidates)[:, None] + rng.normal(0, 0.05, (candidates, 1))
+    scores = (rng.random((candidates, instances)) < skill).astype(np.float32)
+    questions = [f"q-{i}" for i in range(instances)]
+
+    index = ParetoIndex(initial_candidates=candidates, initial_instances=instances)
+    start = time.perf_counter()
+    for i, row in enumerate(scores):
+        index.add(f"p-{i}", dict(zip(questions, row.tolist())))
+        index.frontier()
+    incremental = (time.perf_counter() - start) / candidates
+
+    sample = 5
+    start = time.perf_counter()
+    for i in range(candidates - sample, candidates):
+        naive_frontier(scores[:i + 1])
+    naive = (time.perf_counter() - start) / sample
+
+    print(f"{'incremental':>12}: {incremental * 1e3:8.2f} ms/insert (frontier size {len(index.frontier())})")
+    print(f"{'rebuild':>12}: {naive * 1e3:8.2f} ms/insert at {candidates} candidates")
+
+if __name__ == "__main__":
+    main()
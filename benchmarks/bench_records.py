@@ -0,0 +1,50 @@
+"""
+Compares per-record construction cost and memory of ModelOutputRecord vs OutputRecord.
+
+    python -m benchmarks.bench_records [n]
+"""
+import sys
+import time
+import tracemalloc
+
+from src.models.domain import ModelOutputRecord
+from src.models.records import OutputRecord
+
+def build(cls, n):
+    return [
+        cls(
+            output_id=f"out-{i}",
+            eval_id="eval-" + "0001",
+            prompt_id="prompt-" + "0001",
+            model_used="arcee-ai/" + "trinity-large-preview:free",
+            input_query="What is the derivative of x^2?",
+            raw_output="The answer is 2x",
+            parsed_answer="2x",
+            expected_answer="2x",
+            is_correct=True,
+        )
+        for i in range(n)
+    ]
+
+def measure(cls, n):
+    start = time.perf_counter()
+    build(cls, n)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    records = build(cls, n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return elapsed, current
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    results = {cls.__name__: measure(cls, n) for cls in (ModelOutputRecord, OutputRecord)}
+    for name, (elapsed, memory) in results.items():
+        print(f"{name:>18}: {elapsed / n * 1e6:6.2f} us/record, {memory / n:6.0f} B/record")
+    (slow, slow_mem), (fast, fast_mem) = results.values()
+    print(f"{'speedup':>18}: {slow / fast:.1f}x time, {slow_mem / fast_mem:.1f}x memory")
+
+if __name__ == "__main__":
+    main()
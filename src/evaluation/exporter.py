@@ -0,0 +1,125 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.models.domain import ModelOutputRecord
+
+# Low-cardinality columns repeated on every row; stored dictionary-encoded
+DICTIONARY_COLUMNS = ["eval_id", "prompt_id", "model_used"]
+
+OUTPUT_SCHEMA = pa.schema([
+    ("output_id", pa.string()),
+    ("eval_id", pa.dictionary(pa.int32(), pa.string())),
+    ("prompt_id", pa.dictionary(pa.int32(), pa.string())),
+    ("model_used", pa.dictionary(pa.int32(), pa.string())),
+    ("input_query", pa.string()),
+    ("raw_output", pa.string()),
+    ("parsed_answer", pa.string()),
+    ("expected_answer", pa.string()),
+    ("is_correct", pa.bool_()),
+])
+
+class DatasetExporter:
+    """
+    Persists ModelOutputRecords as Parquet, one file per evaluation.
+    Records are streamed into row groups of `row_group_size`, so memory is bounded by one row group.
+    """
+    def __init__(self, row_group_size: int = 10_000, compression: str = "zstd"):
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+    def persist_outputs(self, eval_id: str, records: Iterable[Any], output_dir: str) -> str:
+        """
+        Persists the model output records to `{output_dir}/{eval_id}.parquet` and returns the file path.
+        Accepts ModelOutputRecord or any object exposing the same attributes.
+        """
+        writer = self.open_writer(eval_id, output_dir)
+        for record in records:
+            writer.write(record)
+        return writer.close()
+
+    def open_writer(self, eval_id: str, output_dir: str) -> "OutputWriter":
+        """
+        Incremental form of `persist_outputs`, for callers that produce records over time.
+        """
+        return OutputWriter(self, eval_id, output_dir)
+
+    @staticmethod
+    def _write_row_group(writer: pq.ParquetWriter, columns: Dict[str, List[Any]]):
+        arrays = []
+        for field in OUTPUT_SCHEMA:
+            values = columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+            values.clear()
+        writer.write_table(pa.Table.from_arrays(arrays, schema=OUTPUT_SCHEMA))
+
+class OutputWriter:
+    """
+    One evaluation's Parquet file being written: `write` records, then `close` to publish the file
+    at `{output_dir}/{eval_id}.parquet` and get its path.
+    """
+    def __init__(self, exporter: DatasetExporter, eval_id: str, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.exporter = exporter
+        self.path = os.path.join(output_dir, f"{eval_id}.parquet")
+        self._tmp_path = f"{self.path}.tmp"
+        self._columns: Dict[str, List[Any]] = {name: [] for name in OUTPUT_SCHEMA.names}
+        self._writer = pq.ParquetWriter(
+            self._tmp_path,
+            OUTPUT_SCHEMA,
+            compression=exporter.compression,
+            use_dictionary=DICTIONARY_COLUMNS,
+        )
+
+    def write(self, record: Any):
+        for name, values in self._columns.items():
+            values.append(getattr(record, name))
+        if len(self._columns["output_id"]) >= self.exporter.row_group_size:
+            self.exporter._write_row_group(self._writer, self._columns)
+
+    def close(self) -> str:
+        if self._columns["output_id"]:
+            self.exporter._write_row_group(self._writer, self._columns)
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+def read_outputs(path: str) -> Iterator[ModelOutputRecord]:
+    """
+    Stream a persisted file back as validated ModelOutputRecords, one row group at a time.
+    """
+    parquet_file = pq.ParquetFile(path)
+    for i in range(parquet_file.num_row_groups):
+        for row in parquet_file.read_row_group(i).to_pylist():
+            yield ModelOutputRecord(**row)
+
+def export_jsonl(path: str, jsonl_path: Optional[str] = None) -> str:
+    """
+    Write the JSONL layout of the original exporter next to a Parquet file, for tools that expect it.
+    """
+    jsonl_path = jsonl_path or os.path.splitext(path)[0] + ".jsonl"
+    parquet_file = pq.ParquetFile(path)
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for i in range(parquet_file.num_row_groups):
+            for row in parquet_file.read_row_group(i).to_pylist():
+                f.write(json.dumps(row) + "\n")
+    return jsonl_path
+
+def load_outputs(source: str, columns: Optional[List[str]] = None, filter=None) -> pa.Table:
+    """
+    Column scan over one Parquet file or a directory of them, e.g. every evaluation of a sweep.
+    `filter` is a pyarrow.dataset expression such as `ds.field("model_used") == "m"`.
+    """
+    if os.path.isdir(source):
+        source = sorted(
+            os.path.join(source, name) for name in os.listdir(source) if name.endswith(".parquet")
+        )
+    dataset = ds.dataset(source, format="parquet", schema=OUTPUT_SCHEMA)
+    return dataset.to_table(columns=columns, filter=filter)
@@ -0,0 +1,137 @@
+import json
+import os
+import random
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+_TOKEN = re.compile(r"\w+")
+
+def _tokens(case: Dict[str, Any]) -> frozenset:
+    return frozenset(_TOKEN.findall(str(case.get("question", "")).lower()))
+
+def _jaccard_distance(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 0.0
+    return 1.0 - len(a & b) / len(a | b)
+
+class FailureSpill:
+    """
+    Streams failed cases to a JSONL side file while keeping only a bounded pool in memory.
+
+    With `strategy="reservoir"` the pool is a uniform reservoir sample. With `"diverse"`
+    (the default) a new case replaces the most redundant pool member whenever it is further
+    from the pool than that member is from its nearest neighbour, so rare kinds of failure
+    survive a flood of common ones. `sample()` ranks up to `sample_size` pool members by
+    farthest-point order on question tokens for the GEPA reflection step.
+    """
+    def __init__(
+        self,
+        path: str,
+        sample_size: int = 16,
+        pool_size: Optional[int] = None,
+        strategy: str = "diverse",
+        seed: int = 0,
+    ):
+        if strategy not in ("diverse", "reservoir"):
+            raise ValueError(f"Unknown failure sampling strategy: {strategy}")
+        self.path = path
+        self.sample_size = sample_size
+        self.pool_size = pool_size or sample_size * 8
+        self.strategy = strategy
+        self.count = 0
+        self._pool: List[Dict[str, Any]] = []
+        self._tokens: List[frozenset] = []
+        # Diverse strategy only: pairwise distances, and each member's nearest distance and neighbour
+        self._distances: List[List[float]] = []
+        self._nearest: List[float] = []
+        self._neighbour: List[Optional[int]] = []
+        self._rng = random.Random(seed)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def add(self, case: Dict[str, Any]):
+        self._file.write(json.dumps(case, default=str) + "\n")
+        self.count += 1
+        tokens = _tokens(case)
+        if self.strategy == "reservoir":
+            if len(self._pool) < self.pool_size:
+                self._pool.append(case)
+                self._tokens.append(tokens)
+                return
+            slot = self._rng.randrange(self.count)
+            if slot < self.pool_size:
+                self._pool[slot] = case
+                self._tokens[slot] = tokens
+            return
+        distances = [_jaccard_distance(tokens, t) for t in self._tokens]
+        if len(self._pool) < self.pool_size:
+            self._append(case, tokens, distances)
+            return
+        redundant = min(range(len(self._pool)), key=self._nearest.__getitem__)
+        if min(distances) > self._nearest[redundant]:
+            self._replace(redundant, case, tokens, distances)
+
+    def _append(self, case: Dict[str, Any], tokens: frozenset, distances: List[float]):
+        slot = len(self._pool)
+        for i, d in enumerate(distances):
+            self._distances[i].append(d)
+            if d < self._nearest[i]:
+                self._nearest[i], self._neighbour[i] = d, slot
+        self._distances.append(distances + [0.0])
+        nearest = min(range(slot), key=distances.__getitem__, default=None)
+        self._nearest.append(1.0 if nearest is None else distances[nearest])
+        self._neighbour.append(nearest)
+        self._pool.append(case)
+        self._tokens.append(tokens)
+
+    def _replace(self, slot: int, case: Dict[str, Any], tokens: frozenset, distances: List[float]):
+        """
+        Put `case` in `slot`, updating nearest neighbours incrementally: only members whose
+        nearest neighbour was the replaced case rescan their (cached) distance row.
+        """
+        distances = distances[:slot] + [0.0] + distances[slot + 1:]
+        self._pool[slot] = case
+        self._tokens[slot] = tokens
+        self._distances[slot] = distances
+        for i, d in enumerate(distances):
+            if i == slot:
+                continue
+            row = self._distances[i]
+            row[slot] = d
+            if self._neighbour[i] == slot and d > self._nearest[i]:
+                self._rescan(i)
+            elif d < self._nearest[i]:
+                self._nearest[i], self._neighbour[i] = d, slot
+        self._rescan(slot)
+
+    def _rescan(self, i: int):
+        row = self._distances[i]
+        nearest = min((j for j in range(len(row)) if j != i), key=row.__getitem__, default=None)
+        self._nearest[i] = 1.0 if nearest is None else row[nearest]
+        self._neighbour[i] = nearest
+
+    def sample(self) -> List[Dict[str, Any]]:
+        if len(self._pool) <= 1:
+            return list(self._pool)
+        chosen = [0]
+        nearest = [_jaccard_distance(self._tokens[0], t) for t in self._tokens]
+        while len(chosen) < min(self.sample_size, len(self._pool)):
+            candidate = max(
+                (i for i in range(len(self._pool)) if i not in chosen),
+                key=lambda i: nearest[i],
+            )
+            chosen.append(candidate)
+            nearest = [min(d, _jaccard_distance(self._tokens[candidate], t)) for d, t in zip(nearest, self._tokens)]
+        return [self._pool[i] for i in chosen]
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+def iter_failed_cases(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every failed case of an evaluation back from its side file.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
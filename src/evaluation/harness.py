@@ -0,0 +1,540 @@
+import asyncio
+import os
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import dspy
+
+from src.evaluation.exporter import DatasetExporter, OutputWriter, read_outputs
+from src.evaluation.failures import FailureSpill
+from src.evaluation.metrics import score
+from src.evaluation.packing import parse_packed_answers, render_packed_messages
+from src.evaluation.sequential import SequentialComparison, correctness_by_question
+from src.models.domain import EvaluationResult, PromptCandidate
+from src.models.records import EvaluationTally, OutputRecord
+from src.optimization.dedup import PromptDeduplicator
+from src.runner.state import ExperimentStateManager
+from src.utils.llm_client import AsyncBatchEngine, is_transient
+from src.utils.observability import find_history_entry
+
+def make_eval_id(prompt_id: str, benchmark: str, model: str) -> str:
+    """
+    Deterministic, filesystem-safe id of one (prompt, benchmark, model) evaluation.
+    """
+    return "__".join(re.sub(r"[^A-Za-z0-9._-]", "_", part) for part in (prompt_id, benchmark, model))
+
+def render_messages(prompt: PromptCandidate, question: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": prompt.content},
+        {"role": "user", "content": question},
+    ]
+
+def output_text(outputs) -> str:
+    first = outputs[0] if outputs else ""
+    return first.get("text", "") if isinstance(first, dict) else str(first)
+
+@dataclass
+class Cascade:
+    """
+    Speculative weak-first evaluation: each question goes to `tiers[0]` (the small model) and is
+    escalated to the next tier only when the answer is wrong, unparsable, a failed call, or scored below
+    `confidence_threshold` by `confidence(raw_output)`. Each record's `model_used` is the tier that
+    produced it; the result's `model_used` is the cascade label, e.g. "small>large".
+    """
+    tiers: List[str]
+    confidence: Optional[Callable[[str], float]] = None
+    confidence_threshold: float = 0.5
+
+    @property
+    def label(self) -> str:
+        return ">".join(self.tiers)
+
+    def should_escalate(self, raw_output: str, parsed_answer: str, is_correct: bool) -> bool:
+        if not is_correct or not parsed_answer:
+            return True
+        return self.confidence is not None and self.confidence(raw_output) < self.confidence_threshold
+
+def model_label(model: Union[str, Cascade]) -> str:
+    return model.label if isinstance(model, Cascade) else model
+
+class EvaluationRun:
+    """
+    One (prompt, benchmark, model) evaluation in flight. Completed records are re-ordered into
+    question order, then counted, handed to its WriterPool and fed to the optional early-stopping test.
+    Questions whose call failed for good complete without a record and are only counted as errors.
+    """
+    def __init__(
+        self,
+        prompt: PromptCandidate,
+        benchmark: str,
+        model: str,
+        spill: Optional[FailureSpill],
+        comparison: Optional[SequentialComparison] = None,
+        resumed: Optional[Dict[str, Tuple[OutputRecord, Dict[str, float]]]] = None,
+        cascade: Optional[Cascade] = None,
+    ):
+        self.prompt = prompt
+        self.benchmark = benchmark
+        self.model = model
+        self.cascade = cascade
+        self.tiers = cascade.tiers if cascade else [model]
+        self.eval_id = make_eval_id(prompt.prompt_id, benchmark, model)
+        self.tally = EvaluationTally(
+            eval_id=self.eval_id,
+            prompt_id=prompt.prompt_id,
+            benchmark_name=benchmark,
+            model_used=model,
+            spill=spill,
+        )
+        self.comparison = comparison
+        # Questions answered before an interruption, replayed instead of asked again
+        self.resumed = resumed or {}
+        self.finished_at: Optional[float] = None
+        self._pending: Dict[int, Tuple[str, Optional[OutputRecord], Dict[str, float]]] = {}
+        self._next = 0
+        # Streaming state, guarded by the WriterPool's lock
+        self.writers: Optional["WriterPool"] = None
+        self.file: Optional[OutputWriter] = None
+        self.buffer: List[OutputRecord] = []
+        self.scheduled = False
+        self.closed = False
+        self.written: "Future[str]" = Future()
+
+    @property
+    def stopped(self) -> bool:
+        return self.comparison is not None and self.comparison.stopped
+
+    def complete(self, index: int, question_id: str, record: Optional[OutputRecord], costs: Dict[str, float]):
+        """
+        `costs` is the API cost of each model (tier) asked for this question; `record` is None
+        when no model answered it.
+        """
+        if self.stopped:
+            # Already in flight when the candidate was cut off: paid for, but not part of the result
+            self.tally.add_cost(costs)
+            return
+        self._pending[index] = (question_id, record, costs)
+        while self._next in self._pending and not self.stopped:
+            question_id, record, costs = self._pending.pop(self._next)
+            self._next += 1
+            if record is None:
+                self.tally.add_error(costs)
+                continue
+            self.tally.add(record, costs=costs)
+            self.writers.put(self, record)
+            if self.comparison is not None:
+                self.comparison.update(question_id, record.is_correct)
+        self.finished_at = time.perf_counter()
+
+    def close(self):
+        self.writers.finish(self)
+
+class WriterPool:
+    """
+    A fixed number of exporter threads draining one queue of runs with records to write. A run is
+    queued when records arrive and it is not queued already, so only one thread writes a run at a
+    time and its file receives records in question order, however many runs are in flight.
+    """
+    def __init__(self, exporter: DatasetExporter, output_dir: str, workers: int):
+        self.exporter = exporter
+        self.output_dir = output_dir
+        self._queue: "queue.Queue[Optional[EvaluationRun]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._drain, name=f"exporter-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, run: EvaluationRun, record: OutputRecord):
+        with self._lock:
+            run.buffer.append(record)
+            self._schedule(run)
+
+    def finish(self, run: EvaluationRun):
+        """
+        No more records for `run`; its file is published and `run.written` resolved once the rest is written.
+        """
+        with self._lock:
+            run.closed = True
+            self._schedule(run)
+
+    def _schedule(self, run: EvaluationRun):
+        if not run.scheduled:
+            run.scheduled = True
+            self._queue.put(run)
+
+    def _drain(self):
+        while True:
+            run = self._queue.get()
+            if run is None:
+                return
+            with self._lock:
+                batch, run.buffer = run.buffer, []
+                closed = run.closed
+            try:
+                if not run.written.done():
+                    if run.file is None:
+                        run.file = self.exporter.open_writer(run.eval_id, self.output_dir)
+                    for record in batch:
+                        run.file.write(record)
+                    if closed:
+                        run.written.set_result(run.file.close())
+            except Exception as exc:
+                run.written.set_exception(exc)
+            with self._lock:
+                if closed:
+                    continue
+                if run.buffer or run.closed:
+                    self._queue.put(run)
+                else:
+                    run.scheduled = False
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+
+class EvaluationHarness:
+    """
+    Evaluates prompts × benchmarks × models concurrently under one global in-flight cap.
+
+    Calls run on the shared AsyncBatchEngine loop, so wall-clock time is bounded by the provider
+    rate limit rather than by a Python loop. Each evaluation streams its records, in question
+    order, to its DatasetExporter file while they are produced, through a pool of `max_writers`
+    exporter threads shared by all evaluations in flight.
+    With a PromptDeduplicator, candidates that duplicate an already evaluated prompt reuse its
+    results (re-labelled with their own prompt_id and `duplicate_of`) instead of being evaluated.
+    With an ExperimentStateManager, every answered question is checkpointed as it completes; a rerun
+    after a crash reuses finished results, replays answered questions and only asks the remainder.
+    With `pack_size > 1` (meant for cheap exploratory minibatches), questions of non-cascade
+    evaluations are asked `pack_size` at a time in one request and the answers demultiplexed into
+    per-question records; a chunk whose packed response does not parse is re-asked one by one.
+    Transient provider errors (429, 5xx, timeouts, dropped connections) are retried up to
+    `max_retries` times; a question whose call still fails is counted in the result's `errors`,
+    left out of its accuracy and not checkpointed, so a rerun asks it again. Results with errors,
+    and results cut off by early stopping, are not reused by dedup or state; a later full pass
+    resumes from their checkpointed answers. `calls` counts every request sent to a model, retries and
+    packed requests included.
+    Call `close()` (or use the harness as a context manager) to shut down the AsyncBatchEngine it
+    created when none was given.
+    """
+    def __init__(
+        self,
+        lms: Dict[str, dspy.BaseLM],
+        output_dir: str = ".outputs",
+        max_concurrency: int = 32,
+        exporter: Optional[DatasetExporter] = None,
+        engine: Optional[AsyncBatchEngine] = None,
+        spill_failures: bool = True,
+        scorer: Callable[[str, str], Tuple[bool, str]] = score,
+        dedup: Optional[PromptDeduplicator] = None,
+        state: Optional[ExperimentStateManager] = None,
+        pack_size: int = 1,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        max_writers: int = 4,
+    ):
+        if pack_size < 1:
+            raise ValueError(f"pack_size must be at least 1, got {pack_size}")
+        self.lms = lms
+        self.output_dir = output_dir
+        self.max_concurrency = max_concurrency
+        self.exporter = exporter or DatasetExporter()
+        self.engine = engine or AsyncBatchEngine(max_in_flight=max_concurrency)
+        self._owns_engine = engine is None
+        self.spill_failures = spill_failures
+        self.scorer = scorer
+        self.dedup = dedup
+        self.state = state
+        self.pack_size = pack_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_writers = max_writers
+        self.packed_calls = 0
+        self.packing_fallbacks = 0
+        self.retries = 0
+        self.calls = 0
+
+    def evaluate(
+        self,
+        prompts: List[PromptCandidate],
+        benchmarks: Dict[str, List[Dict[str, str]]],
+        models: Optional[List[Union[str, Cascade]]] = None,
+        incumbents: Optional[List[EvaluationResult]] = None,
+        stopping: Optional[Dict[str, Any]] = None,
+        reuse: Optional[List[EvaluationResult]] = None,
+    ) -> List[EvaluationResult]:
+        """
+        Blocking entrypoint; returns one EvaluationResult per (prompt, benchmark, model).
+        `benchmarks` maps a benchmark name to its standardized `{"id", "question", "answer"}` records.
+        A model may be a Cascade, e.g. `Cascade([config.small_model, config.large_model])`.
+
+        With `incumbents` (finished results of the current best prompt), each candidate is compared
+        question by question against the incumbent on the same benchmark and model, and cut off once a
+        SequentialComparison (configured by `stopping`) shows it losing. Cut-off results carry the
+        accuracy over the questions evaluated and `stopped_early=True`.
+
+        With `reuse` (finished results of the same prompts and models on other question sets, e.g. the
+        minibatches of earlier successive-halving rungs), questions already answered there are
+        replayed from their datasets instead of being asked again.
+        """
+        return self.engine.submit(self.aevaluate(prompts, benchmarks, models, incumbents, stopping, reuse))
+
+    async def aevaluate(
+        self,
+        prompts: List[PromptCandidate],
+        benchmarks: Dict[str, List[Dict[str, str]]],
+        models: Optional[List[Union[str, Cascade]]] = None,
+        incumbents: Optional[List[EvaluationResult]] = None,
+        stopping: Optional[Dict[str, Any]] = None,
+        reuse: Optional[List[EvaluationResult]] = None,
+    ) -> List[EvaluationResult]:
+        cascades = {model.label: model for model in models or [] if isinstance(model, Cascade)}
+        models = [model_label(model) for model in models] if models else list(self.lms)
+        baselines = {
+            (result.benchmark_name, result.model_used): result
+            for result in incumbents or []
+            if result.dataset_path
+        }
+        representatives = {
+            prompt.prompt_id: self.dedup.representative(prompt) if self.dedup else prompt
+            for prompt in prompts
+        }
+        runs: Dict[Tuple[str, str, str], EvaluationRun] = {}
+        for prompt in prompts:
+            target = representatives[prompt.prompt_id]
+            for benchmark in benchmarks:
+                for model in models:
+                    key = (target.prompt_id, benchmark, model)
+                    if key in runs or self._existing_result(*key):
+                        continue
+                    run = runs[key] = EvaluationRun(
+                        target, benchmark, model,
+                        self._spill_for(target, benchmark, model),
+                        self._comparison_for(target, baselines.get((benchmark, model)), stopping),
+                        {**self._reused_outputs(make_eval_id(*key), target.prompt_id, model, reuse or []), **self._resumed_outputs(make_eval_id(*key))},
+                        cascades.get(model),
+                    )
+                    if self.state:
+                        run.tally.add_cost(self.state.load_costs(run.eval_id))
+        fresh = await self._run(list(runs.values()), benchmarks)
+        for result in fresh.values():
+            if result.errors or result.stopped_early:
+                # Incomplete: its answered questions stay checkpointed and the rest is asked again
+                continue
+            if self.dedup:
+                self.dedup.record(result)
+            if self.state:
+                self.state.save_result(result)
+
+        results = []
+        for prompt in prompts:
+            target = representatives[prompt.prompt_id]
+            for benchmark in benchmarks:
+                for model in models:
+                    key = (target.prompt_id, benchmark, model)
+                    result = fresh[key] if key in fresh else self._existing_result(*key)
+                    if target.prompt_id != prompt.prompt_id:
+                        result = result.model_copy(update={"prompt_id": prompt.prompt_id, "duplicate_of": target.prompt_id})
+                    results.append(result)
+        return results
+
+    async def _run(self, runs: List[EvaluationRun], benchmarks: Dict[str, List[Dict[str, str]]]) -> Dict[Tuple[str, str, str], EvaluationResult]:
+        if not runs:
+            return {}
+
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        writers = WriterPool(self.exporter, self.output_dir, min(len(runs), self.max_writers))
+        for run in runs:
+            run.writers = writers
+        tasks = [
+            asyncio.ensure_future(ask)
+            for run in runs
+            for ask in self._questions(semaphore, run, benchmarks[run.benchmark])
+        ]
+        try:
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                for run in runs:
+                    run.close()
+            paths = await asyncio.gather(*(asyncio.wrap_future(run.written) for run in runs))
+        finally:
+            writers.close()
+
+        return {
+            (run.prompt.prompt_id, run.benchmark, run.model): run.tally.to_model(
+                duration_seconds=(run.finished_at or started) - started,
+                dataset_path=path,
+                stopped_early=run.stopped,
+            )
+            for run, path in zip(runs, paths)
+        }
+
+    def _existing_result(self, prompt_id: str, benchmark: str, model: str) -> Optional[EvaluationResult]:
+        result = self.dedup.lookup(prompt_id, benchmark, model) if self.dedup else None
+        if result is None and self.state:
+            result = self.state.load_result(make_eval_id(prompt_id, benchmark, model))
+        return result
+
+    def _resumed_outputs(self, eval_id: str) -> Dict[str, Tuple[OutputRecord, Dict[str, float]]]:
+        if not self.state:
+            return {}
+        return {
+            question_id: (OutputRecord.from_model(record), costs)
+            for question_id, (record, costs) in self.state.load_outputs(eval_id).items()
+        }
+
+    def _reused_outputs(self, eval_id: str, prompt_id: str, model: str, reuse: List[EvaluationResult]) -> Dict[str, Tuple[OutputRecord, Dict[str, float]]]:
+        outputs = {}
+        for result in reuse:
+            if (result.duplicate_of or result.prompt_id) != prompt_id or result.model_used != model or not result.dataset_path:
+                continue
+            prefix = f"{result.eval_id}__"
+            for record in read_outputs(result.dataset_path):
+                question_id = record.output_id[len(prefix):]
+                # Already paid for by the reused evaluation
+                outputs[question_id] = (
+                    OutputRecord(**{**record.model_dump(), "output_id": f"{eval_id}__{question_id}", "eval_id": eval_id}),
+                    {},
+                )
+        return outputs
+
+    def _spill_for(self, prompt: PromptCandidate, benchmark: str, model: str) -> Optional[FailureSpill]:
+        if not self.spill_failures:
+            return None
+        eval_id = make_eval_id(prompt.prompt_id, benchmark, model)
+        return FailureSpill(os.path.join(self.output_dir, f"{eval_id}.failures.jsonl"))
+
+    def _comparison_for(
+        self, prompt: PromptCandidate, incumbent: Optional[EvaluationResult], stopping: Optional[Dict[str, Any]],
+    ) -> Optional[SequentialComparison]:
+        if incumbent is None or incumbent.prompt_id == prompt.prompt_id:
+            return None
+        correctness = correctness_by_question(incumbent.eval_id, read_outputs(incumbent.dataset_path))
+        return SequentialComparison(correctness, **(stopping or {}))
+
+    def _questions(self, semaphore: asyncio.Semaphore, run: EvaluationRun, items: List[Dict[str, str]]):
+        """
+        Coroutines asking every question of a run, packed `pack_size` at a time when packing applies.
+        """
+        if self.pack_size == 1 or run.cascade is not None:
+            return [self._ask(semaphore, run, index, item) for index, item in enumerate(items)]
+        unanswered = [(index, item) for index, item in enumerate(items) if item["id"] not in run.resumed]
+        return [
+            self._ask(semaphore, run, index, item) for index, item in enumerate(items) if item["id"] in run.resumed
+        ] + [
+            self._ask_packed(semaphore, run, unanswered[start:start + self.pack_size])
+            for start in range(0, len(unanswered), self.pack_size)
+        ]
+
+    async def _ask(self, semaphore: asyncio.Semaphore, run: EvaluationRun, index: int, item: Dict[str, str]):
+        if item["id"] in run.resumed:
+            record, costs = run.resumed[item["id"]]
+            run.complete(index, item["id"], record, costs)
+            return
+        costs: Dict[str, float] = {}
+        async with semaphore:
+            if run.stopped:
+                return
+            for tier, model in enumerate(run.tiers):
+                last = tier == len(run.tiers) - 1
+                try:
+                    raw_output, costs[model] = await self._call(model, render_messages(run.prompt, item["question"]))
+                except Exception:
+                    costs.setdefault(model, 0.0)
+                    if last:
+                        self._checkpoint_cost(run, costs)
+                        run.complete(index, item["id"], None, costs)
+                        return
+                    continue
+                is_correct, parsed_answer = self.scorer(raw_output, item["answer"])
+                if last or not run.cascade.should_escalate(raw_output, parsed_answer, is_correct):
+                    break
+        self._finish(run, index, item, model, raw_output, is_correct, parsed_answer, costs)
+
+    async def _ask_packed(self, semaphore: asyncio.Semaphore, run: EvaluationRun, chunk: List[Tuple[int, Dict[str, str]]]):
+        if len(chunk) == 1:
+            await self._ask(semaphore, run, *chunk[0])
+            return
+        model = run.model
+        async with semaphore:
+            if run.stopped:
+                return
+            try:
+                raw_output, cost = await self._call(model, render_packed_messages(run.prompt, [item["question"] for _, item in chunk]))
+            except Exception:
+                raw_output, cost = None, 0.0
+        self.packed_calls += 1
+        answers = None if raw_output is None else parse_packed_answers(raw_output, len(chunk))
+        if answers is None:
+            self.packing_fallbacks += 1
+            run.tally.add_cost({model: cost})
+            self._checkpoint_cost(run, {model: cost})
+            await asyncio.gather(*(self._ask(semaphore, run, index, item) for index, item in chunk))
+            return
+        # The packed call's cost is split evenly across its questions
+        for (index, item), answer in zip(chunk, answers):
+            is_correct, parsed_answer = self.scorer(answer, item["answer"])
+            self._finish(run, index, item, model, answer, is_correct, parsed_answer, {model: cost / len(chunk)})
+
+    def _finish(
+        self, run: EvaluationRun, index: int, item: Dict[str, str], model: str,
+        raw_output: str, is_correct: bool, parsed_answer: str, costs: Dict[str, float],
+    ):
+        record = OutputRecord(
+            output_id=f"{run.eval_id}__{item['id']}",
+            eval_id=run.eval_id,
+            prompt_id=run.prompt.prompt_id,
+            model_used=model,
+            input_query=item["question"],
+            raw_output=raw_output,
+            parsed_answer=parsed_answer,
+            expected_answer=item["answer"],
+            is_correct=is_correct,
+        )
+        if self.state:
+            self.state.save_output(item["id"], record, costs)
+        run.complete(index, item["id"], record, costs)
+
+    def _checkpoint_cost(self, run: EvaluationRun, costs: Dict[str, float]):
+        if self.state and any(costs.values()):
+            self.state.save_cost(run.eval_id, costs)
+
+    async def _call(self, model: str, messages: List[Dict[str, str]]) -> Tuple[str, float]:
+        """
+        One model call, retrying transient errors with jittered exponential backoff; returns the
+        output text and its API cost, or raises the last error.
+        """
+        lm = self.lms[model]
+        for attempt in range(self.max_retries + 1):
+            self.calls += 1
+            try:
+                outputs = await lm.acall(messages=messages)
+                break
+            except Exception as exc:
+                if attempt == self.max_retries or not is_transient(exc):
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.0))
+        entry = find_history_entry(lm, outputs)
+        return output_text(outputs), (entry or {}).get("cost") or 0.0
+
+    def close(self):
+        if self._owns_engine:
+            self.engine.close()
+
+    def __enter__(self) -> "EvaluationHarness":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,233 @@
+import hashlib
+import itertools
+import json
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import pyarrow as pa
+from pydantic import BaseModel
+
+class BenchmarkSource(BaseModel):
+    """
+    Where a benchmark lives on the HuggingFace Hub and how to map its rows onto
+    the common `{"id", "question", "answer"}` record.
+    """
+    path: str
+    config_name: Optional[str] = None
+    split: str = "test"
+    question_field: str = "question"
+    answer_field: str = "answer"
+    # Multiple-choice benchmarks list their options separately; they are appended to the question
+    options_field: Optional[str] = None
+
+# Benchmarks without a public Hub dataset must be registered here before they can be loaded.
+BENCHMARK_SOURCES: Dict[str, BenchmarkSource] = {
+    "SuperGPQA": BenchmarkSource(
+        path="m-a-p/SuperGPQA",
+        split="train",
+        answer_field="answer_letter",
+        options_field="options",
+    ),
+}
+
+def standardize(benchmark: str, source: BenchmarkSource, row: Dict[str, Any], index: int) -> Dict[str, str]:
+    question = str(row[source.question_field])
+    if source.options_field and row.get(source.options_field):
+        letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        question += "\n" + "\n".join(f"{letters[i]}. {option}" for i, option in enumerate(row[source.options_field]))
+    return {"id": f"{benchmark}-{index}", "question": question, "answer": str(row[source.answer_field])}
+
+def stream_benchmark(benchmark: str, start: int = 0) -> Iterator[Dict[str, str]]:
+    """
+    Stream a registered benchmark from the Hub (no local download), starting at record `start`.
+    """
+    from datasets import load_dataset
+
+    if benchmark not in BENCHMARK_SOURCES:
+        raise ValueError(f"Unknown benchmark: {benchmark}. Register it in BENCHMARK_SOURCES.")
+    source = BENCHMARK_SOURCES[benchmark]
+    dataset = load_dataset(source.path, source.config_name, split=source.split, streaming=True)
+    for index, row in enumerate(dataset.skip(start), start=start):
+        yield standardize(benchmark, source, row, index)
+
+def shard_of(record_id: str, experiment_id: str, seed: int, num_shards: int) -> int:
+    """
+    Deterministic shard assignment: the same (experiment_id, seed) always splits a benchmark the same way.
+    """
+    digest = hashlib.blake2b(f"{experiment_id}:{seed}:{record_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+class SegmentCache:
+    """
+    Local cache of a benchmark stream as Arrow IPC segments of `segment_size` records.
+    The manifest is rewritten after every segment, so an interrupted pass keeps every full segment.
+    """
+    def __init__(self, directory: str, segment_size: int = 1000):
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.reload()
+
+    def reload(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"segments": [], "count": 0, "complete": False}
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def complete(self) -> bool:
+        return self.manifest["complete"]
+
+    def read(self, start: int = 0) -> Iterator[Dict[str, str]]:
+        """
+        Replay cached records from index `start`, memory-mapping one segment at a time.
+        """
+        offset = 0
+        for name, count in self.manifest["segments"]:
+            if offset + count > start:
+                with pa.memory_map(os.path.join(self.directory, name)) as source:
+                    table = pa.ipc.open_file(source).read_all()
+                yield from table.slice(max(0, start - offset)).to_pylist()
+            offset += count
+
+    def append(self, records: List[Dict[str, str]]):
+        name = f"segment-{self.count:010d}.arrow"
+        table = pa.Table.from_pylist(records)
+        with pa.OSFile(os.path.join(self.directory, name), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        self.manifest["segments"].append([name, len(records)])
+        self.manifest["count"] += len(records)
+        self._save_manifest()
+
+    def mark_complete(self):
+        self.manifest["complete"] = True
+        self._save_manifest()
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+_END = object()
+
+class _CacheWriter:
+    """
+    The one source stream feeding a cache directory, shared by every loader of that benchmark.
+    Loaders take turns extending the cache one segment at a time, so the lock is never held
+    while a loader waits on its consumer, and the stream is not restarted when they alternate.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stream: Optional[Iterator[Dict[str, str]]] = None
+        self.position = 0
+
+    def extend(self, cache: SegmentCache, source: Callable[[int], Iterable[Dict[str, str]]], position: int):
+        """
+        Append the next segment unless the cache already holds records past `position`,
+        and mark the cache complete once the source is exhausted.
+        """
+        with self.lock:
+            cache.reload()
+            if cache.complete or cache.count > position:
+                return
+            if self.stream is None or self.position != cache.count:
+                self.stream = iter(source(cache.count))
+                self.position = cache.count
+            records = list(itertools.islice(self.stream, cache.segment_size))
+            self.position += len(records)
+            if records:
+                cache.append(records)
+            if len(records) < cache.segment_size:
+                cache.mark_complete()
+                self.stream = None
+
+# One writer per cache directory; concurrent loaders of the same benchmark replay what the others fetched
+_cache_writers: Dict[str, _CacheWriter] = {}
+_cache_writers_guard = threading.Lock()
+
+def _cache_writer(directory: str) -> _CacheWriter:
+    with _cache_writers_guard:
+        return _cache_writers.setdefault(os.path.abspath(directory), _CacheWriter())
+
+class PrefetchingLoader:
+    """
+    Iterates one deterministic shard of a benchmark while a background thread reads ahead.
+
+    The first pass streams from the Hub a segment at a time into a SegmentCache and serves the
+    records from it; later epochs and resumed runs replay the cache from disk and only stream what is missing.
+    `source(start)` yields standardized records from index `start` and defaults to `stream_benchmark`.
+    """
+    def __init__(
+        self,
+        benchmark: str,
+        experiment_id: str,
+        seed: int = 0,
+        num_shards: int = 1,
+        shard_index: int = 0,
+        prefetch: int = 256,
+        cache_dir: str = ".cache/segments",
+        segment_size: int = 1000,
+        source: Optional[Callable[[int], Iterable[Dict[str, str]]]] = None,
+    ):
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+        self.benchmark = benchmark
+        self.experiment_id = experiment_id
+        self.seed = seed
+        self.num_shards = num_shards
+        self.shard_index = shard_index
+        self.prefetch = prefetch
+        self.cache = SegmentCache(os.path.join(cache_dir, benchmark), segment_size=segment_size)
+        self.source = source or (lambda start: stream_benchmark(benchmark, start))
+
+    def _produce(self, out: "queue.Queue", stop: threading.Event):
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            position = 0
+            while True:
+                for record in self.cache.read(position):
+                    if not put(record):
+                        return
+                    position += 1
+                if self.cache.complete:
+                    break
+                _cache_writer(self.cache.directory).extend(self.cache, self.source, position)
+            put(_END)
+        except Exception as exc:
+            put(exc)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        out: "queue.Queue" = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(out, stop), name=f"prefetch-{self.benchmark}", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = out.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                if self.num_shards == 1 or shard_of(item["id"], self.experiment_id, self.seed, self.num_shards) == self.shard_index:
+                    yield item
+        finally:
+            stop.set()
+            producer.join()
@@ -0,0 +1,40 @@
+import re
+from typing import Tuple
+
+_BOXED = re.compile(r"\\boxed\{([^{}]*(?:\{[^{}]*\}[^{}]*)*)\}")
+_ANSWER_IS = re.compile(r"(?:final answer|answer)\s*(?:is|:)\s*\**\s*([^\n]+)", re.IGNORECASE)
+
+def parse_answer(raw_output: str) -> str:
+    """
+    Extract the answer from a model output: the last \\boxed{...}, else the last
+    "answer is/answer:" phrase, else the last non-empty line.
+    """
+    boxed = _BOXED.findall(raw_output)
+    if boxed:
+        return boxed[-1].strip()
+    stated = _ANSWER_IS.findall(raw_output)
+    if stated:
+        return stated[-1].strip()
+    lines = [line.strip() for line in raw_output.strip().splitlines() if line.strip()]
+    return lines[-1] if lines else ""
+
+def normalize(answer: str) -> str:
+    answer = answer.strip().strip("*$`").rstrip(".").strip()
+    # "(B)" / "B)" / "B." -> "B" for multiple-choice answers
+    match = re.fullmatch(r"\(?([A-Za-z])[\).]?", answer)
+    if match:
+        return match.group(1).upper()
+    return re.sub(r"\s+", " ", answer).lower()
+
+def score(raw_output: str, expected_answer: str) -> Tuple[bool, str]:
+    """
+    Returns (is_correct, parsed_answer) for one output against the ground truth.
+    """
+    parsed = parse_answer(raw_output)
+    got, expected = normalize(parsed), normalize(expected_answer)
+    if got == expected:
+        return True, parsed
+    try:
+        return abs(float(got.replace(",", "")) - float(expected.replace(",", ""))) < 1e-6, parsed
+    except ValueError:
+        return False, parsed
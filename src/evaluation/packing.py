@@ -0,0 +1,43 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from src.models.domain import PromptCandidate
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+PACKING_INSTRUCTIONS = (
+    "You will be given {count} numbered questions. Answer each one independently, following the "
+    "instructions above. Reply with only a JSON array of {count} strings, where string i is your "
+    "complete answer to question i."
+)
+
+def render_packed_messages(prompt: PromptCandidate, questions: List[str]) -> List[Dict[str, str]]:
+    """
+    One request asking `questions` at once. The prompt stays the leading system message, so the
+    instruction prefix is shared with (and cacheable alongside) single-question requests.
+    """
+    return [
+        {"role": "system", "content": prompt.content},
+        {"role": "system", "content": PACKING_INSTRUCTIONS.format(count=len(questions))},
+        {"role": "user", "content": "\n\n".join(f"Question {i}:\n{q}" for i, q in enumerate(questions, 1))},
+    ]
+
+def parse_packed_answers(raw_output: str, count: int) -> Optional[List[str]]:
+    """
+    The `count` answers of a packed response in question order, or None when the response is
+    not a JSON array of exactly `count` scalar answers.
+    """
+    text = _FENCE.sub("", raw_output.strip())
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        return None
+    try:
+        answers: Any = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(answers, list) or len(answers) != count:
+        return None
+    if not all(isinstance(answer, (str, int, float)) and not isinstance(answer, bool) for answer in answers):
+        return None
+    return [str(answer) for answer in answers]
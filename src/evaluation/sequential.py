@@ -0,0 +1,91 @@
+import math
+from typing import Dict, Optional
+
+def correctness_by_question(eval_id: str, records) -> Dict[str, bool]:
+    """
+    Per-question correctness of a finished evaluation, keyed by the question id in its output ids.
+    """
+    prefix = f"{eval_id}__"
+    return {record.output_id[len(prefix):]: record.is_correct for record in records}
+
+class SequentialComparison:
+    """
+    Paired sequential test of a candidate prompt against the incumbent's per-question correctness.
+
+    Questions are fed in evaluation order; `update` returns True once the candidate is shown to
+    lose, so the rest of its pass can be skipped. Only discordant pairs carry information:
+    - "sprt": Wald's SPRT on P(candidate wins | discordant), H0 p = 0.5 vs H1 p = 0.5 - delta.
+    - "bound": anytime-valid Hoeffding upper bound on the mean paired difference falling below 0.
+    Independently of the method, a candidate that cannot catch up even by winning every remaining
+    question the incumbent missed is stopped, which never changes the winner of a full pass.
+    """
+    def __init__(
+        self,
+        incumbent: Dict[str, bool],
+        method: str = "sprt",
+        alpha: float = 0.05,
+        beta: float = 0.2,
+        delta: float = 0.2,
+        min_questions: int = 20,
+    ):
+        if method not in ("sprt", "bound"):
+            raise ValueError(f"Unknown method: {method}. Expected 'sprt' or 'bound'.")
+        if not 0 < delta < 0.5:
+            raise ValueError(f"delta must be in (0, 0.5), got {delta}")
+        self.incumbent = incumbent
+        self.method = method
+        self.alpha = alpha
+        self.min_questions = min_questions
+        self.questions = 0
+        self.wins = 0
+        self.losses = 0
+        self.llr = 0.0
+        # Upper bound on wins still available: questions the incumbent got wrong and we have not seen
+        self.remaining_incumbent_misses = sum(1 for correct in incumbent.values() if not correct)
+        self.decision: Optional[str] = None
+
+        p1 = 0.5 - delta
+        self._win_step = math.log(p1 / 0.5)
+        self._loss_step = math.log((1 - p1) / 0.5)
+        self._reject = math.log((1 - beta) / alpha)
+        self._accept = math.log(beta / (1 - alpha))
+
+    @property
+    def stopped(self) -> bool:
+        return self.decision == "worse"
+
+    def update(self, question_id: str, is_correct: bool) -> bool:
+        """
+        Record one paired outcome; returns True when the candidate should stop.
+        """
+        if self.decision == "worse" or question_id not in self.incumbent:
+            return self.stopped
+        incumbent_correct = self.incumbent[question_id]
+        self.questions += 1
+        if not incumbent_correct:
+            self.remaining_incumbent_misses -= 1
+        if is_correct and not incumbent_correct:
+            self.wins += 1
+            self.llr += self._win_step
+        elif incumbent_correct and not is_correct:
+            self.losses += 1
+            self.llr += self._loss_step
+
+        if self.wins + self.remaining_incumbent_misses < self.losses:
+            self.decision = "worse"
+        elif self.decision is None and self.questions >= self.min_questions:
+            if self.method == "sprt":
+                if self.llr >= self._reject:
+                    self.decision = "worse"
+                elif self.llr <= self._accept:
+                    self.decision = "not_worse"
+            elif self._upper_bound() < 0:
+                self.decision = "worse"
+        return self.stopped
+
+    def _upper_bound(self) -> float:
+        n = self.questions
+        mean = (self.wins - self.losses) / n
+        # Paired differences lie in [-1, 1]; a union bound over n makes the test valid at every step
+        radius = math.sqrt(2 * math.log(n * (n + 1) / self.alpha) / n)
+        return mean + radius
@@ -27,8 +27,21 @@ class EvaluationResult(BaseModel):
     accuracy: float
     api_cost: float
     duration_seconds: float
+    # A small ranked sample for GEPA reflection when the full list is spilled to `failed_cases_path`
     failed_cases: List[Dict[str, Any]]
     dataset_path: Optional[str] = None
+    failed_cases_path: Optional[str] = None
+    failed_cases_count: Optional[int] = None
+    # Set when a candidate was cut off by early stopping; accuracy then covers `questions_evaluated` only
+    questions_evaluated: Optional[int] = None
+    stopped_early: bool = False
+    # prompt_id whose evaluation was reused because this prompt duplicates it
+    duplicate_of: Optional[str] = None
+    # API cost split by the model that spent it, and questions a weak-first cascade escalated
+    cost_by_model: Optional[Dict[str, float]] = None
+    escalations: Optional[int] = None
+    # Questions left unanswered by provider errors; excluded from accuracy and `questions_evaluated`
+    errors: int = 0
 
 class ModelOutputRecord(BaseModel):
     output_id: str
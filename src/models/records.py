@@ -0,0 +1,128 @@
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.evaluation.failures import FailureSpill
+from src.models.domain import EvaluationResult, ModelOutputRecord
+
+@dataclass(slots=True)
+class OutputRecord:
+    """
+    Hot-path counterpart of ModelOutputRecord: no validation, and the id columns that
+    repeat on every row are interned so all records of a sweep share one string object.
+    Convert with `to_model()` at API and persistence boundaries.
+    """
+    output_id: str
+    eval_id: str
+    prompt_id: str
+    model_used: str
+    input_query: str
+    raw_output: str
+    parsed_answer: str
+    expected_answer: str
+    is_correct: bool
+
+    def __post_init__(self):
+        self.eval_id = sys.intern(self.eval_id)
+        self.prompt_id = sys.intern(self.prompt_id)
+        self.model_used = sys.intern(self.model_used)
+
+    def to_model(self) -> ModelOutputRecord:
+        return ModelOutputRecord(
+            output_id=self.output_id,
+            eval_id=self.eval_id,
+            prompt_id=self.prompt_id,
+            model_used=self.model_used,
+            input_query=self.input_query,
+            raw_output=self.raw_output,
+            parsed_answer=self.parsed_answer,
+            expected_answer=self.expected_answer,
+            is_correct=self.is_correct,
+        )
+
+    @classmethod
+    def from_model(cls, record: ModelOutputRecord) -> "OutputRecord":
+        return cls(**record.model_dump())
+
+@dataclass(slots=True)
+class EvaluationTally:
+    """
+    Running totals for one evaluation, updated per OutputRecord and turned into an
+    EvaluationResult once the evaluation finishes. With a FailureSpill, failed cases
+    go to its side file and only its ranked sample is kept on the result.
+    """
+    eval_id: str
+    prompt_id: str
+    benchmark_name: str
+    model_used: str
+    correct: int = 0
+    total: int = 0
+    api_cost: float = 0.0
+    failed_cases: List[Dict[str, Any]] = field(default_factory=list)
+    spill: Optional[FailureSpill] = None
+    cost_by_model: Dict[str, float] = field(default_factory=dict)
+    # Questions answered by more than one model (cascade escalations)
+    escalations: int = 0
+    # Questions no model answered (provider errors); not part of `total`
+    errors: int = 0
+
+    def add_cost(self, costs: Dict[str, float]):
+        for model, cost in costs.items():
+            self.cost_by_model[model] = self.cost_by_model.get(model, 0.0) + cost
+            self.api_cost += cost
+
+    def add_error(self, costs: Dict[str, float]):
+        self.errors += 1
+        self.add_cost(costs)
+
+    def add(self, record: OutputRecord, cost: float = 0.0, costs: Optional[Dict[str, float]] = None):
+        """
+        `costs` splits the question's API cost by model; otherwise `cost` is charged to `record.model_used`.
+        """
+        self.total += 1
+        self.add_cost(costs if costs is not None else {record.model_used: cost})
+        if costs is not None and len(costs) > 1:
+            self.escalations += 1
+        if record.is_correct:
+            self.correct += 1
+            return
+        case = {
+            "question": record.input_query,
+            "output": record.raw_output,
+            "parsed_answer": record.parsed_answer,
+            "expected_answer": record.expected_answer,
+        }
+        if self.spill is not None:
+            self.spill.add(case)
+        else:
+            self.failed_cases.append(case)
+
+    @property
+    def accuracy(self) -> float:
+        return self.correct / self.total if self.total else 0.0
+
+    def to_model(self, duration_seconds: float, dataset_path: str = None, stopped_early: bool = False) -> EvaluationResult:
+        failed_cases, failed_cases_path, failed_cases_count = self.failed_cases, None, None
+        if self.spill is not None:
+            self.spill.close()
+            failed_cases = self.spill.sample()
+            failed_cases_path = self.spill.path
+            failed_cases_count = self.spill.count
+        return EvaluationResult(
+            eval_id=self.eval_id,
+            prompt_id=self.prompt_id,
+            benchmark_name=self.benchmark_name,
+            model_used=self.model_used,
+            accuracy=self.accuracy,
+            api_cost=self.api_cost,
+            duration_seconds=duration_seconds,
+            failed_cases=failed_cases,
+            dataset_path=dataset_path,
+            failed_cases_path=failed_cases_path,
+            failed_cases_count=failed_cases_count,
+            questions_evaluated=self.total,
+            stopped_early=stopped_early,
+            cost_by_model=self.cost_by_model,
+            escalations=self.escalations,
+            errors=self.errors,
+        )
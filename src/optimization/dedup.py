@@ -0,0 +1,133 @@
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.models.domain import EvaluationResult, PromptCandidate
+
+_WHITESPACE = re.compile(r"\s+")
+
+def canonicalize(content: str) -> str:
+    """
+    A prompt with runs of whitespace collapsed and blank lines dropped. Case, punctuation and line
+    order are kept: "x > 0" and "x < 0", or instructions given in another order, are different prompts.
+    """
+    lines = (_WHITESPACE.sub(" ", line).strip() for line in content.splitlines())
+    return "\n".join(line for line in lines if line)
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(canonicalize(content).encode("utf-8")).hexdigest()
+
+def shingles(content: str, size: int = 3) -> Set[str]:
+    tokens = canonicalize(content).split()
+    if len(tokens) <= size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+class MinHasher:
+    """
+    MinHash signatures over token shingles using multiply-shift hashing on 64-bit shingle hashes.
+    """
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, content: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles(content, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        # (a * x + b) mod 2^64, keeping the high 32 bits
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(self._a, hashes) + self._b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1)
+
+class PromptDeduplicator:
+    """
+    Maps candidate prompts onto an earlier representative when they are exact duplicates after
+    canonicalization. Near-duplicate matching, by MinHash Jaccard estimate >= `threshold` (candidate
+    pairs come from LSH banding, so lookups do not scan every stored prompt), is opt-in: a one-word
+    edit such as a negation is exactly what a reflective mutation produces, and reusing the parent's
+    evaluation for it would mean it is never evaluated.
+
+    Evaluation results are stored per representative, so a duplicate reuses them instead of being
+    evaluated again.
+    """
+    def __init__(self, threshold: Optional[float] = None, num_perm: int = 128, bands: int = 16, shingle_size: int = 3, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.candidates: Dict[str, PromptCandidate] = {}
+        self._representative: Dict[str, str] = {}
+        self._exact: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(bands)]
+        self._results: Dict[Tuple[str, str, str], EvaluationResult] = {}
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find(self, content: str) -> Optional[str]:
+        """
+        prompt_id of a stored representative that `content` duplicates, if any.
+        """
+        exact = self._exact.get(content_hash(content))
+        if exact is not None or self.threshold is None:
+            return exact
+        signature = self.hasher.signature(content)
+        best, best_similarity = None, self.threshold
+        seen: Set[str] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            for prompt_id in self._buckets[band].get(key, ()):
+                if prompt_id in seen:
+                    continue
+                seen.add(prompt_id)
+                similarity = float((self._signatures[prompt_id] == signature).mean())
+                if similarity >= best_similarity:
+                    best, best_similarity = prompt_id, similarity
+        return best
+
+    def representative(self, candidate: PromptCandidate) -> PromptCandidate:
+        """
+        Register a candidate and return the candidate whose evaluations it should reuse (itself if new).
+        """
+        if candidate.prompt_id in self._representative:
+            return self.candidates[self._representative[candidate.prompt_id]]
+        digest = content_hash(candidate.content)
+        match = self._exact.get(digest)
+        if match is not None:
+            self.exact_duplicates += 1
+        else:
+            match = self.find(candidate.content)
+            if match is not None:
+                self.near_duplicates += 1
+        if match is not None:
+            self._representative[candidate.prompt_id] = match
+            return self.candidates[match]
+
+        self._representative[candidate.prompt_id] = candidate.prompt_id
+        self.candidates[candidate.prompt_id] = candidate
+        self._exact[digest] = candidate.prompt_id
+        if self.threshold is None:
+            return candidate
+        signature = self.hasher.signature(candidate.content)
+        self._signatures[candidate.prompt_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(candidate.prompt_id)
+        return candidate
+
+    def record(self, result: EvaluationResult):
+        self._results[(result.prompt_id, result.benchmark_name, result.model_used)] = result
+
+    def lookup(self, prompt_id: str, benchmark: str, model: str) -> Optional[EvaluationResult]:
+        return self._results.get((self._representative.get(prompt_id, prompt_id), benchmark, model))
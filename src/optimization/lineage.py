@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.models.domain import EvaluationResult, PromptCandidate, PromptStage
+
+class LineageStore:
+    """
+    SQLite-backed prompt lineage built from `PromptCandidate.parent_prompt_id`.
+
+    A closure table (ancestor, descendant, distance) answers ancestor/descendant queries with one
+    indexed lookup, and per-subtree aggregates (best prompt, evaluation count and accuracy sum per
+    benchmark and model) are maintained on every recorded result by updating the prompt's ancestors.
+    Subtree queries therefore never rescan the history.
+    """
+    def __init__(self, path: str = ".checkpoints/lineage.sqlite"):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS prompts (
+                prompt_id TEXT PRIMARY KEY,
+                parent_prompt_id TEXT,
+                stage TEXT NOT NULL,
+                content TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_prompts_parent ON prompts (parent_prompt_id);
+            CREATE TABLE IF NOT EXISTS closure (
+                ancestor TEXT NOT NULL,
+                descendant TEXT NOT NULL,
+                distance INTEGER NOT NULL,
+                PRIMARY KEY (ancestor, descendant)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_closure_descendant ON closure (descendant, distance);
+            CREATE TABLE IF NOT EXISTS subtree_scores (
+                ancestor TEXT NOT NULL,
+                benchmark_name TEXT NOT NULL,
+                model_used TEXT NOT NULL,
+                best_prompt_id TEXT NOT NULL,
+                best_accuracy REAL NOT NULL,
+                evaluations INTEGER NOT NULL,
+                accuracy_sum REAL NOT NULL,
+                PRIMARY KEY (ancestor, benchmark_name, model_used)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS recorded (
+                eval_id TEXT NOT NULL,
+                prompt_id TEXT NOT NULL,
+                PRIMARY KEY (eval_id, prompt_id)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+
+    def add(self, candidate: PromptCandidate):
+        """
+        Insert a candidate under its parent, which must already be stored. Re-adding is a no-op.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM prompts WHERE prompt_id = ?", (candidate.prompt_id,)).fetchone():
+                return
+            depth = 0
+            if candidate.parent_prompt_id is not None:
+                row = self._conn.execute(
+                    "SELECT depth FROM prompts WHERE prompt_id = ?", (candidate.parent_prompt_id,)
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"Unknown parent prompt: {candidate.parent_prompt_id}")
+                depth = row[0] + 1
+            self._conn.execute(
+                "INSERT INTO prompts (prompt_id, parent_prompt_id, stage, content, depth, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (candidate.prompt_id, candidate.parent_prompt_id, candidate.stage.value, candidate.content, depth, time.time()),
+            )
+            self._conn.execute(
+                "INSERT INTO closure (ancestor, descendant, distance) "
+                "SELECT ancestor, ?, distance + 1 FROM closure WHERE descendant = ? "
+                "UNION ALL SELECT ?, ?, 0",
+                (candidate.prompt_id, candidate.parent_prompt_id, candidate.prompt_id, candidate.prompt_id),
+            )
+            self._conn.commit()
+
+    def record(self, result: EvaluationResult):
+        """
+        Fold an evaluation into the aggregates of its prompt's subtree and every ancestor's.
+        Recording the same eval_id for a prompt again is a no-op. Partial results (stopped early, or
+        with unanswered questions) are skipped: their accuracy covers only some of the questions.
+        """
+        if result.stopped_early or result.errors:
+            return
+        with self._lock:
+            ancestors = self._conn.execute(
+                "SELECT ancestor FROM closure WHERE descendant = ?", (result.prompt_id,)
+            ).fetchall()
+            if not ancestors:
+                raise ValueError(f"Unknown prompt: {result.prompt_id}")
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO recorded (eval_id, prompt_id) VALUES (?, ?)", (result.eval_id, result.prompt_id)
+            ).rowcount
+            if not inserted:
+                return
+            self._conn.executemany(
+                """
+                INSERT INTO subtree_scores VALUES (?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT (ancestor, benchmark_name, model_used) DO UPDATE SET
+                    best_prompt_id = CASE WHEN excluded.best_accuracy > best_accuracy
+                        THEN excluded.best_prompt_id ELSE best_prompt_id END,
+                    best_accuracy = MAX(best_accuracy, excluded.best_accuracy),
+                    evaluations = evaluations + 1,
+                    accuracy_sum = accuracy_sum + excluded.accuracy_sum
+                """,
+                [
+                    (ancestor, result.benchmark_name, result.model_used, result.prompt_id, result.accuracy, result.accuracy)
+                    for (ancestor,) in ancestors
+                ],
+            )
+            self._conn.commit()
+
+    def _query(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get(self, prompt_id: str) -> Optional[PromptCandidate]:
+        rows = self._query("SELECT stage, content, parent_prompt_id FROM prompts WHERE prompt_id = ?", (prompt_id,))
+        if not rows:
+            return None
+        stage, content, parent_prompt_id = rows[0]
+        return PromptCandidate(prompt_id=prompt_id, stage=PromptStage(stage), content=content, parent_prompt_id=parent_prompt_id)
+
+    def depth(self, prompt_id: str) -> int:
+        rows = self._query("SELECT depth FROM prompts WHERE prompt_id = ?", (prompt_id,))
+        if not rows:
+            raise ValueError(f"Unknown prompt: {prompt_id}")
+        return rows[0][0]
+
+    def children(self, prompt_id: str) -> List[str]:
+        return [row[0] for row in self._query("SELECT prompt_id FROM prompts WHERE parent_prompt_id = ?", (prompt_id,))]
+
+    def ancestors(self, prompt_id: str) -> List[str]:
+        """
+        Ancestors from the parent up to the root.
+        """
+        return [row[0] for row in self._query(
+            "SELECT ancestor FROM closure WHERE descendant = ? AND distance > 0 ORDER BY distance", (prompt_id,)
+        )]
+
+    def descendants(self, prompt_id: str, max_distance: Optional[int] = None) -> List[str]:
+        """
+        Descendants nearest first, optionally limited to `max_distance` generations.
+        """
+        return [row[0] for row in self._query(
+            "SELECT descendant FROM closure WHERE ancestor = ? AND distance > 0 AND (? IS NULL OR distance <= ?) "
+            "ORDER BY distance",
+            (prompt_id, max_distance, max_distance),
+        )]
+
+    def best_in_subtree(self, prompt_id: str, benchmark: str, model: str) -> Optional[Tuple[str, float]]:
+        """
+        Best-scoring (prompt_id, accuracy) among `prompt_id` and its descendants.
+        """
+        rows = self._query(
+            "SELECT best_prompt_id, best_accuracy FROM subtree_scores WHERE ancestor = ? AND benchmark_name = ? AND model_used = ?",
+            (prompt_id, benchmark, model),
+        )
+        return (rows[0][0], rows[0][1]) if rows else None
+
+    def subtree_stats(self, prompt_id: str, benchmark: str, model: str) -> Dict[str, object]:
+        rows = self._query(
+            "SELECT best_prompt_id, best_accuracy, evaluations, accuracy_sum FROM subtree_scores "
+            "WHERE ancestor = ? AND benchmark_name = ? AND model_used = ?",
+            (prompt_id, benchmark, model),
+        )
+        if not rows:
+            return {"best_prompt_id": None, "best_accuracy": None, "evaluations": 0, "mean_accuracy": None}
+        best_prompt_id, best_accuracy, evaluations, accuracy_sum = rows[0]
+        return {
+            "best_prompt_id": best_prompt_id,
+            "best_accuracy": best_accuracy,
+            "evaluations": evaluations,
+            "mean_accuracy": accuracy_sum / evaluations,
+        }
+
+    def rank_branches(self, prompt_id: str, benchmark: str, model: str) -> List[Tuple[str, float]]:
+        """
+        Children of `prompt_id` ordered by the best accuracy found anywhere in their subtree, so the
+        optimizer can pick the branch of mutations that is paying off.
+        """
+        return [(row[0], row[1]) for row in self._query(
+            "SELECT p.prompt_id, s.best_accuracy FROM prompts p "
+            "JOIN subtree_scores s ON s.ancestor = p.prompt_id AND s.benchmark_name = ? AND s.model_used = ? "
+            "WHERE p.parent_prompt_id = ? ORDER BY s.best_accuracy DESC",
+            (benchmark, model, prompt_id),
+        )]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,169 @@
+import random
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+from src.evaluation.exporter import read_outputs
+from src.evaluation.sequential import correctness_by_question
+from src.models.domain import EvaluationResult
+
+MISSING = -np.inf
+
+class ParetoIndex:
+    """
+    Per-instance score matrix of prompt candidates (rows, by prompt_id) over questions (columns,
+    by question id), maintaining GEPA's Pareto frontier incrementally.
+
+    A candidate is on the frontier when it has the best score on at least one question and no other
+    candidate dominates it. Its frequency weight is the number of questions it is best on, which is
+    what parent sampling uses. Inserting a candidate only touches the columns whose best score it
+    changes and compares it against current frontier members, instead of rebuilding the frontier.
+    """
+    def __init__(self, initial_candidates: int = 64, initial_instances: int = 1024, block_rows: int = 256):
+        self.block_rows = block_rows
+        self._scores = np.full((initial_candidates, initial_instances), MISSING, dtype=np.float32)
+        self._best = np.full(initial_instances, MISSING, dtype=np.float32)
+        self._weights = np.zeros(initial_candidates, dtype=np.int64)
+        self._dominated = np.zeros(initial_candidates, dtype=bool)
+        self._rows: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._cols: Dict[str, int] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, prompt_id: str) -> bool:
+        return prompt_id in self._rows
+
+    @property
+    def num_instances(self) -> int:
+        return len(self._cols)
+
+    def _grow(self, rows: int, cols: int):
+        cap_rows, cap_cols = self._scores.shape
+        if rows <= cap_rows and cols <= cap_cols:
+            return
+        new_rows = max(cap_rows, 1)
+        while new_rows < rows:
+            new_rows *= 2
+        new_cols = max(cap_cols, 1)
+        while new_cols < cols:
+            new_cols *= 2
+        scores = np.full((new_rows, new_cols), MISSING, dtype=np.float32)
+        scores[:cap_rows, :cap_cols] = self._scores
+        self._scores = scores
+        best = np.full(new_cols, MISSING, dtype=np.float32)
+        best[:cap_cols] = self._best
+        self._best = best
+        self._weights = np.concatenate([self._weights, np.zeros(new_rows - cap_rows, dtype=np.int64)])
+        self._dominated = np.concatenate([self._dominated, np.zeros(new_rows - cap_rows, dtype=bool)])
+
+    def _columns(self, question_ids: Iterable[str]) -> np.ndarray:
+        cols = [self._cols.setdefault(qid, len(self._cols)) for qid in question_ids]
+        self._grow(len(self._ids) + 1, len(self._cols))
+        return np.asarray(cols, dtype=np.int64)
+
+    def add(self, prompt_id: str, scores: Mapping[str, float]):
+        """
+        Insert a candidate's per-question scores, or merge more scores into an existing candidate.
+        """
+        cols = self._columns(scores.keys())
+        values = np.fromiter(scores.values(), dtype=np.float32, count=len(scores))
+        if prompt_id in self._rows:
+            self._scores[self._rows[prompt_id], cols] = values
+            # Rare path (a candidate scored on more questions): rebuild lazily on the next read
+            self._dirty = True
+            return
+
+        n = len(self._ids)
+        self._rows[prompt_id] = n
+        self._ids.append(prompt_id)
+        self._scores[n, cols] = values
+        if self._dirty:
+            return
+
+        old = self._best[cols]
+        higher = values > old
+        tied = (values == old) & np.isfinite(values)
+        if higher.any():
+            raised, previous = cols[higher], old[higher]
+            # Former best holders of the raised columns lose those columns
+            held = (self._scores[:n, raised] == previous) & np.isfinite(previous)
+            self._weights[:n] -= held.sum(axis=1)
+            self._best[raised] = values[higher]
+        self._weights[n] = int(higher.sum() + tied.sum())
+        self._dominated[n] = False
+        if self._weights[n] > 0:
+            self._compare_with_frontier(n)
+
+    def add_result(self, result: EvaluationResult):
+        """
+        Insert a persisted evaluation as 0/1 per-question scores of its prompt.
+        """
+        correctness = correctness_by_question(result.eval_id, read_outputs(result.dataset_path))
+        self.add(result.prompt_id, {qid: 1.0 if correct else 0.0 for qid, correct in correctness.items()})
+
+    def _frontier_rows(self, n: Optional[int] = None) -> np.ndarray:
+        n = len(self._ids) if n is None else n
+        return np.flatnonzero((self._weights[:n] > 0) & ~self._dominated[:n])
+
+    def _compare_with_frontier(self, row: int):
+        """
+        Dominance is transitive and a dominator is best wherever the dominated row is, so comparing
+        a new row against current frontier members is enough.
+        """
+        m = len(self._cols)
+        candidate = self._scores[row, :m]
+        front = self._frontier_rows(row)
+        for start in range(0, len(front), self.block_rows):
+            block = front[start:start + self.block_rows]
+            others = self._scores[block, :m]
+            if not self._dominated[row]:
+                if ((others >= candidate).all(axis=1) & (others > candidate).any(axis=1)).any():
+                    self._dominated[row] = True
+            beaten = (candidate >= others).all(axis=1) & (candidate > others).any(axis=1)
+            self._dominated[block[beaten]] = True
+
+    def _rebuild(self):
+        n, m = len(self._ids), len(self._cols)
+        scores = self._scores[:n, :m]
+        self._best[:m] = scores.max(axis=0) if n else MISSING
+        best = self._best[:m]
+        self._weights[:n] = ((scores == best) & np.isfinite(best)).sum(axis=1)
+        self._dominated[:n] = False
+        self._dirty = False
+        for row in np.flatnonzero(self._weights[:n] > 0):
+            self._compare_with_frontier(int(row))
+
+    def frontier(self) -> List[str]:
+        if self._dirty:
+            self._rebuild()
+        return [self._ids[row] for row in self._frontier_rows()]
+
+    def weights(self) -> Dict[str, int]:
+        """
+        Frontier members and the number of questions each is best on.
+        """
+        if self._dirty:
+            self._rebuild()
+        return {self._ids[row]: int(self._weights[row]) for row in self._frontier_rows()}
+
+    def sample_parent(self, rng: Optional[random.Random] = None) -> str:
+        """
+        Frequency-weighted choice of a frontier member to mutate next.
+        """
+        weights = self.weights()
+        if not weights:
+            raise ValueError("Cannot sample a parent from an empty Pareto index.")
+        return (rng or random).choices(list(weights), weights=list(weights.values()))[0]
+
+    def dominates(self, a: str, b: str) -> bool:
+        m = len(self._cols)
+        first, second = self._scores[self._rows[a], :m], self._scores[self._rows[b], :m]
+        return bool((first >= second).all() and (first > second).any())
+
+    def mean_score(self, prompt_id: str) -> float:
+        row = self._scores[self._rows[prompt_id], :len(self._cols)]
+        known = row[np.isfinite(row)]
+        return float(known.mean(dtype=np.float64)) if known.size else 0.0
@@ -0,0 +1,148 @@
+import random
+from typing import Dict, List, Optional, Tuple
+
+from src.evaluation.harness import EvaluationHarness
+from src.models.domain import EvaluationResult, ExperimentConfig, PromptCandidate
+
+def halving_plan(num_candidates: int, full_size: int, eta: int = 3, min_size: int = 16) -> List[Tuple[int, int]]:
+    """
+    Rungs of one successive-halving bracket as (questions, candidates) pairs.
+    Each rung keeps the top 1/eta of the previous one on eta times as many questions; the last rung
+    is always a full pass over `full_size` questions.
+    """
+    if num_candidates < 1:
+        return []
+    rungs = 1
+    while (
+        rungs < num_candidates
+        and num_candidates // eta ** rungs >= 1
+        and full_size // eta ** rungs >= min_size
+    ):
+        rungs += 1
+    return [
+        (full_size // eta ** (rungs - 1 - k), max(1, num_candidates // eta ** k))
+        for k in range(rungs)
+    ]
+
+def plan_cost(plan: List[Tuple[int, int]]) -> int:
+    """
+    Planned API calls of a plan. Promoted candidates only answer the questions their previous rungs
+    did not cover, the final full pass included.
+    """
+    cost, previous = 0, 0
+    for size, candidates in plan:
+        cost += candidates * (size - previous)
+        previous = size
+    return cost
+
+class SuccessiveHalvingScheduler:
+    """
+    Multi-fidelity candidate selection under a budget of API calls.
+
+    Candidates are scored on small minibatches, the top 1/eta are promoted to eta times larger ones,
+    and only the survivors of the last rung get a full EvaluationHarness pass, which replays the
+    answers of their earlier rungs. Brackets are sized with `plan_cost`, but `calls_spent` is the
+    harness's measured call count, so packing, dedup, resumes and early stopping are accounted for.
+    `hyperband` spreads the budget over brackets that trade candidate count against starting
+    minibatch size.
+    """
+    def __init__(
+        self,
+        harness: EvaluationHarness,
+        model: str,
+        budget_calls: int,
+        eta: int = 3,
+        min_size: int = 16,
+        seed: int = 0,
+    ):
+        if eta < 2:
+            raise ValueError(f"eta must be at least 2, got {eta}")
+        self.harness = harness
+        self.model = model
+        self.budget_calls = budget_calls
+        self.eta = eta
+        self.min_size = min_size
+        self.seed = seed
+        self.calls_spent = 0
+
+    @classmethod
+    def from_config(cls, config: ExperimentConfig, harness: EvaluationHarness, model: Optional[str] = None, **kwargs) -> "SuccessiveHalvingScheduler":
+        """
+        `budget_iterations` is read as the number of API calls the scheduler may spend.
+        """
+        return cls(harness, model or config.small_model, budget_calls=config.budget_iterations, **kwargs)
+
+    @property
+    def remaining(self) -> int:
+        return self.budget_calls - self.calls_spent
+
+    def max_candidates(self, full_size: int, budget: int, limit: int) -> int:
+        """
+        Largest number of candidates (up to `limit`) whose bracket fits in `budget` calls.
+        """
+        best = 0
+        for n in range(1, limit + 1):
+            if plan_cost(halving_plan(n, full_size, self.eta, self.min_size)) <= budget:
+                best = n
+        return best
+
+    def run(self, candidates: List[PromptCandidate], benchmark: str, questions: List[Dict[str, str]]) -> List[EvaluationResult]:
+        """
+        One successive-halving bracket over as many candidates as the remaining budget allows.
+        Returns the full-pass results of the survivors, best first.
+        """
+        n = self.max_candidates(len(questions), self.remaining, len(candidates))
+        if n == 0:
+            return []
+        plan = halving_plan(n, len(questions), self.eta, self.min_size)
+        order = list(range(len(questions)))
+        random.Random(self.seed).shuffle(order)
+        shuffled = [questions[i] for i in order]
+
+        alive = candidates[:n]
+        scores: Dict[str, List[int]] = {c.prompt_id: [0, 0] for c in alive}
+        rungs: List[EvaluationResult] = []
+        previous = 0
+        for k, (size, keep) in enumerate(plan[:-1]):
+            minibatch = shuffled[previous:size]
+            results = self._evaluate(alive, {f"{benchmark}@r{k}-{size}": minibatch})
+            rungs.extend(results)
+            for result in results:
+                correct, total = scores[result.prompt_id]
+                evaluated = result.questions_evaluated or 0
+                scores[result.prompt_id] = [correct + round(result.accuracy * evaluated), total + evaluated]
+            alive = sorted(alive, key=lambda c: -scores[c.prompt_id][0] / max(1, scores[c.prompt_id][1]))[:plan[k + 1][1]]
+            previous = size
+
+        survivors = {c.prompt_id for c in alive}
+        results = self._evaluate(alive, {benchmark: questions}, [r for r in rungs if r.prompt_id in survivors])
+        return sorted(results, key=lambda r: -r.accuracy)
+
+    def _evaluate(self, candidates: List[PromptCandidate], benchmarks, reuse: Optional[List[EvaluationResult]] = None) -> List[EvaluationResult]:
+        calls = self.harness.calls
+        results = self.harness.evaluate(candidates, benchmarks, [self.model], reuse=reuse)
+        self.calls_spent += self.harness.calls - calls
+        return results
+
+    def hyperband(self, candidates: List[PromptCandidate], benchmark: str, questions: List[Dict[str, str]]) -> List[EvaluationResult]:
+        """
+        Hyperband: the budget is split evenly over brackets, from many candidates on tiny minibatches
+        to a few candidates evaluated in full. Candidates are consumed in order, each at most once.
+        """
+        full_size = len(questions)
+        s_max = 0
+        while full_size // self.eta ** (s_max + 1) >= self.min_size:
+            s_max += 1
+
+        results: List[EvaluationResult] = []
+        pool = list(candidates)
+        for s in range(s_max, -1, -1):
+            if not pool or self.remaining <= 0:
+                break
+            bracket_budget = self.remaining // (s + 1)
+            min_size = max(self.min_size, full_size // self.eta ** s)
+            bracket = SuccessiveHalvingScheduler(self.harness, self.model, bracket_budget, self.eta, min_size, self.seed + s)
+            results.extend(bracket.run(pool, benchmark, questions))
+            self.calls_spent += bracket.calls_spent
+            pool = pool[bracket.max_candidates(full_size, bracket_budget, len(pool)):]
+        return sorted(results, key=lambda r: -r.accuracy)
@@ -0,0 +1,172 @@
+import os
+import threading
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.models.domain import EvaluationResult, ModelOutputRecord, PromptCandidate
+from src.runner.wal import WriteAheadLog
+
+class ExperimentStatus(str, Enum):
+    NOT_STARTED = "NOT_STARTED"
+    STAGE_1_RUNNING = "STAGE_1_RUNNING"
+    STAGE_1_COMPLETE = "STAGE_1_COMPLETE"
+    STAGE_2_RUNNING = "STAGE_2_RUNNING"
+    STAGE_2_COMPLETE = "STAGE_2_COMPLETE"
+    STAGE_3_RUNNING = "STAGE_3_RUNNING"
+    EXPERIMENT_COMPLETE = "EXPERIMENT_COMPLETE"
+
+class ExperimentStateManager:
+    """
+    Tracks an experiment's status, iteration budget, candidates and results, checkpointed to
+    `.checkpoints/{experiment_id}/` through a WriteAheadLog.
+
+    Saves are group-committed in the background, so they cost an in-memory append; status changes
+    wait for durability. Construction replays the latest snapshot plus the log tail, and the log is
+    compacted into a new snapshot once it grows past `compact_bytes`; the snapshot is serialized and
+    fsynced on the log's writer thread, so saves from the evaluation loop never wait on it.
+
+    Per-question outputs of an unfinished evaluation are tracked by (eval_id, question id) with the
+    API cost of each model asked, so a resumed stage only re-asks what was in flight; they are
+    dropped once the result is saved, together with the cost spent on calls that answered nothing.
+    """
+    def __init__(
+        self,
+        experiment_id: str,
+        max_budget_iterations: int,
+        base_dir: str = ".checkpoints",
+        commit_interval: float = 0.05,
+        compact_bytes: int = 4 * 1024 * 1024,
+    ):
+        self.experiment_id = experiment_id
+        self.max_budget_iterations = max_budget_iterations
+        self.directory = os.path.join(base_dir, experiment_id)
+        self.status = ExperimentStatus.NOT_STARTED
+        self.current_iterations = 0
+        self._candidates: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._outputs: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._costs: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._wal = WriteAheadLog(self.directory, commit_interval=commit_interval, compact_bytes=compact_bytes)
+        self.load_state()
+
+    def load_state(self):
+        state, records = self._wal.recover()
+        if state is not None:
+            self.status = ExperimentStatus(state["status"])
+            self.current_iterations = state["current_iterations"]
+            self._candidates = state["candidates"]
+            self._results = state["results"]
+            self._outputs = state["outputs"]
+            self._costs = state["costs"]
+        for record in records:
+            self._apply(record)
+
+    def _apply(self, record: Dict[str, Any]):
+        op = record["op"]
+        if op == "status":
+            self.status = ExperimentStatus(record["status"])
+        elif op == "iterations":
+            self.current_iterations += record["count"]
+        elif op == "candidate":
+            self._candidates[record["data"]["prompt_id"]] = record["data"]
+        elif op == "result":
+            self._results[record["data"]["eval_id"]] = record["data"]
+            self._outputs.pop(record["data"]["eval_id"], None)
+            self._costs.pop(record["data"]["eval_id"], None)
+        elif op == "output":
+            self._outputs.setdefault(record["data"]["eval_id"], {})[record["question_id"]] = record
+        elif op == "unanswered_cost":
+            # Replaced rather than updated in place, so snapshots handed to the log writer stay frozen
+            costs = dict(self._costs.get(record["eval_id"], {}))
+            for model, cost in record["costs"].items():
+                costs[model] = costs.get(model, 0.0) + cost
+            self._costs[record["eval_id"]] = costs
+
+    def _snapshot(self) -> Dict[str, Any]:
+        # Entries are replaced, never mutated, so copying the containers freezes the state for the writer
+        return {
+            "status": self.status.value,
+            "current_iterations": self.current_iterations,
+            "candidates": dict(self._candidates),
+            "results": dict(self._results),
+            "outputs": {eval_id: dict(outputs) for eval_id, outputs in self._outputs.items()},
+            "costs": dict(self._costs),
+        }
+
+    def _log(self, record: Dict[str, Any], durable: bool = False):
+        with self._lock:
+            self._apply(record)
+            self._wal.append(record)
+            if self._wal.needs_compaction:
+                self._wal.compact(self._snapshot())
+        if durable:
+            self._wal.sync()
+
+    def update_status(self, status: ExperimentStatus):
+        self._log({"op": "status", "status": status.value}, durable=True)
+
+    def increment_iterations(self, count: int = 1):
+        self._log({"op": "iterations", "count": count})
+
+    def can_continue_optimization(self) -> bool:
+        return self.current_iterations < self.max_budget_iterations
+
+    def save_candidate(self, candidate: PromptCandidate):
+        self._log({"op": "candidate", "data": candidate.model_dump(mode="json")})
+
+    def save_result(self, result: EvaluationResult):
+        self._log({"op": "result", "data": result.model_dump(mode="json")})
+
+    def save_output(self, question_id: str, record, costs: Optional[Dict[str, float]] = None):
+        """
+        Checkpoint one answered question of a running evaluation (a ModelOutputRecord or OutputRecord)
+        with the API cost of each model asked for it.
+        """
+        data = {name: getattr(record, name) for name in ModelOutputRecord.model_fields}
+        self._log({"op": "output", "question_id": question_id, "costs": costs or {}, "data": data})
+
+    def save_cost(self, eval_id: str, costs: Dict[str, float]):
+        """
+        Checkpoint API cost a running evaluation spent without answering a question
+        (a packed response that did not parse, or a question no model answered).
+        """
+        self._log({"op": "unanswered_cost", "eval_id": eval_id, "costs": costs})
+
+    def load_outputs(self, eval_id: str) -> Dict[str, Tuple[ModelOutputRecord, Dict[str, float]]]:
+        """
+        Answered questions of an unfinished evaluation, by question id, with their API cost by model.
+        """
+        return {
+            question_id: (ModelOutputRecord(**entry["data"]), entry["costs"])
+            for question_id, entry in self._outputs.get(eval_id, {}).items()
+        }
+
+    def load_costs(self, eval_id: str) -> Dict[str, float]:
+        """
+        API cost by model an unfinished evaluation spent without answering a question.
+        """
+        return dict(self._costs.get(eval_id, {}))
+
+    def load_candidate(self, prompt_id: str) -> Optional[PromptCandidate]:
+        data = self._candidates.get(prompt_id)
+        return PromptCandidate(**data) if data else None
+
+    def load_result(self, eval_id: str) -> Optional[EvaluationResult]:
+        data = self._results.get(eval_id)
+        return EvaluationResult(**data) if data else None
+
+    def load_candidates(self) -> List[PromptCandidate]:
+        return [PromptCandidate(**data) for data in self._candidates.values()]
+
+    def load_results(self) -> List[EvaluationResult]:
+        return [EvaluationResult(**data) for data in self._results.values()]
+
+    def checkpoint(self):
+        """
+        Block until every save so far is durable.
+        """
+        self._wal.sync()
+
+    def close(self):
+        self._wal.close()
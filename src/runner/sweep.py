@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import dspy
+
+from src.evaluation.harness import EvaluationHarness
+from src.models.domain import EvaluationResult, ExperimentConfig, PromptCandidate
+from src.utils.cache import ResponseCache
+from src.utils.llm_client import AsyncBatchEngine, LMWrapper, RateLimitScheduler, get_llm_client
+
+def questions_digest(records: List[Dict[str, str]]) -> str:
+    """
+    Digest of a benchmark's question ids and answers, so subsets of one benchmark share nothing.
+    """
+    return hashlib.sha256(json.dumps([(r["id"], r["answer"]) for r in records]).encode("utf-8")).hexdigest()
+
+def evaluation_key(prompt: PromptCandidate, benchmark: str, digest: str, model: str) -> Tuple[str, str, str, str]:
+    """
+    What makes two evaluations of a sweep the same: the exact prompt text, the questions and the model.
+    """
+    return (hashlib.sha256(prompt.content.encode("utf-8")).hexdigest(), benchmark, digest, model)
+
+class FairGate:
+    """
+    Concurrency budget of one model shared by every experiment of a sweep. When the budget is
+    exhausted, freed slots go round-robin to the experiments with waiting calls, so a large
+    experiment cannot starve a small one. Lives on the sweep's engine loop.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.granted: Dict[str, int] = {}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self._rotation: Deque[str] = deque()
+
+    async def acquire(self, tenant: str):
+        if self.in_use < self.capacity and not self._rotation:
+            self._grant(tenant)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._waiters.setdefault(tenant, deque())
+        if not queue:
+            self._rotation.append(tenant)
+        queue.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before cancellation: hand the slot on
+                self.release()
+            raise
+
+    def __deepcopy__(self, memo):
+        # Shared by every copy of an experiment's LM
+        return self
+
+    def _grant(self, tenant: str):
+        self.in_use += 1
+        self.granted[tenant] = self.granted.get(tenant, 0) + 1
+
+    def release(self):
+        self.in_use -= 1
+        while self._rotation and self.in_use < self.capacity:
+            tenant = self._rotation.popleft()
+            queue = self._waiters[tenant]
+            waiter = queue.popleft()
+            if queue:
+                self._rotation.append(tenant)
+            if waiter.cancelled():
+                continue
+            self._grant(tenant)
+            waiter.set_result(None)
+
+class SharedModelLM(LMWrapper):
+    """
+    One experiment's view of a model shared across the sweep: every request first takes a slot
+    of the model's FairGate on behalf of `experiment_id`.
+    """
+    def __init__(self, lm: dspy.BaseLM, gate: FairGate, experiment_id: str, engine: AsyncBatchEngine):
+        super().__init__(lm)
+        self.gate = gate
+        self.experiment_id = experiment_id
+        self.engine = engine
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        loop = self.engine._ensure_loop()
+        asyncio.run_coroutine_threadsafe(self.gate.acquire(self.experiment_id), loop).result()
+        try:
+            return self.lm.forward(prompt=prompt, messages=messages, **kwargs)
+        finally:
+            loop.call_soon_threadsafe(self.gate.release)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        await self.gate.acquire(self.experiment_id)
+        try:
+            return await self.lm.aforward(prompt=prompt, messages=messages, **kwargs)
+        finally:
+            self.gate.release()
+
+class SweepContext:
+    """
+    What one experiment of a sweep sees: its config, fair-gated LMs and shared evaluations.
+    """
+    def __init__(self, runner: "SweepRunner", config: ExperimentConfig):
+        self.runner = runner
+        self.config = config
+        self.output_dir = os.path.join(runner.output_dir, config.experiment_id)
+
+    def lm(self, model: str) -> dspy.BaseLM:
+        return self.runner.lm_for(self.config.experiment_id, model)
+
+    def harness(self, **kwargs) -> EvaluationHarness:
+        models = {self.config.large_model, self.config.small_model}
+        kwargs.setdefault("output_dir", self.output_dir)
+        kwargs.setdefault("max_concurrency", self.runner.max_in_flight_per_model)
+        return EvaluationHarness({model: self.lm(model) for model in models}, engine=self.runner.engine, **kwargs)
+
+    def evaluate(
+        self,
+        prompts: List[PromptCandidate],
+        benchmarks: Dict[str, List[Dict[str, str]]],
+        models: Optional[List[str]] = None,
+    ) -> List[EvaluationResult]:
+        """
+        Evaluate like EvaluationHarness.evaluate, but each (exact prompt text, benchmark questions, model)
+        is computed once per sweep: experiments asking for an evaluation another one owns wait for its result.
+        Reused results carry this experiment's prompt_id and `duplicate_of` the owner's. A result with
+        errors or cut off early is handed only to experiments already waiting for it, never shared later.
+        """
+        models = models or [self.config.large_model, self.config.small_model]
+        combos = [(prompt, benchmark, model) for prompt in prompts for benchmark in benchmarks for model in models]
+        digests = {benchmark: questions_digest(records) for benchmark, records in benchmarks.items()}
+        owned: Dict[Tuple[str, str], List[PromptCandidate]] = {}
+        futures = []
+        with self.runner._shared_lock:
+            for prompt, benchmark, model in combos:
+                key = evaluation_key(prompt, benchmark, digests[benchmark], model)
+                if key not in self.runner._shared:
+                    self.runner._shared[key] = (prompt.prompt_id, Future())
+                    owned.setdefault((benchmark, model), []).append(prompt)
+                futures.append(self.runner._shared[key])
+
+        if owned:
+            harness = self.harness()
+            try:
+                groups = self.runner.engine.submit(self._evaluate_groups(harness, owned, benchmarks))
+            except BaseException as exc:
+                self._fail_owned(owned, digests, exc)
+                raise
+            for ((benchmark, model), group), results in zip(owned.items(), groups):
+                for prompt, result in zip(group, results):
+                    key = evaluation_key(prompt, benchmark, digests[benchmark], model)
+                    _, future = self.runner._shared[key]
+                    if result.errors or result.stopped_early:
+                        # Experiments already waiting get it, later ones compute their own
+                        with self.runner._shared_lock:
+                            del self.runner._shared[key]
+                    future.set_result(result)
+
+        results = []
+        for (prompt, _, _), (owner_id, future) in zip(combos, futures):
+            result = future.result()
+            if owner_id != prompt.prompt_id:
+                result = result.model_copy(update={"prompt_id": prompt.prompt_id, "duplicate_of": owner_id})
+            results.append(result)
+        return results
+
+    def _fail_owned(self, owned: Dict[Tuple[str, str], List[PromptCandidate]], digests: Dict[str, str], exc: BaseException):
+        for (benchmark, model), group in owned.items():
+            for prompt in group:
+                key = evaluation_key(prompt, benchmark, digests[benchmark], model)
+                with self.runner._shared_lock:
+                    _, future = self.runner._shared.pop(key)
+                if not future.done():
+                    future.set_exception(exc)
+
+    async def _evaluate_groups(self, harness: EvaluationHarness, owned, benchmarks):
+        return await asyncio.gather(*(
+            harness.aevaluate(group, {benchmark: benchmarks[benchmark]}, [model])
+            for (benchmark, model), group in owned.items()
+        ))
+
+class SweepRunner:
+    """
+    Runs a grid of experiments in one process on a worker pool, sharing per model one LM client,
+    one concurrency budget (a FairGate scheduling calls round-robin across experiments), the
+    response cache and the rate-limit scheduler, plus evaluations that several experiments request.
+
+    `experiment(context)` is called once per config on a worker thread; the returned dict maps
+    experiment ids to its return value or the exception it raised.
+    """
+    def __init__(
+        self,
+        lm_factory: Optional[Callable[[str], dspy.BaseLM]] = None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+        max_in_flight_per_model: int = 16,
+        max_workers: int = 4,
+        output_dir: str = ".outputs",
+        engine: Optional[AsyncBatchEngine] = None,
+    ):
+        self.cache = cache
+        self.scheduler = scheduler
+        self.lm_factory = lm_factory or (lambda model: get_llm_client(model, cache=self.cache, scheduler=self.scheduler))
+        self.max_in_flight_per_model = max_in_flight_per_model
+        self.max_workers = max_workers
+        self.output_dir = output_dir
+        self.engine = engine or AsyncBatchEngine(max_in_flight=max_in_flight_per_model)
+        self._models: Dict[str, Tuple[dspy.BaseLM, FairGate]] = {}
+        self._models_lock = threading.Lock()
+        self._shared: Dict[Tuple[str, str, str, str], Tuple[str, Future]] = {}
+        self._shared_lock = threading.Lock()
+
+    def lm_for(self, experiment_id: str, model: str) -> SharedModelLM:
+        with self._models_lock:
+            if model not in self._models:
+                self._models[model] = (self.lm_factory(model), FairGate(self.max_in_flight_per_model))
+            lm, gate = self._models[model]
+        return SharedModelLM(lm, gate, experiment_id, self.engine)
+
+    def gate(self, model: str) -> FairGate:
+        return self._models[model][1]
+
+    def run(self, configs: List[ExperimentConfig], experiment: Callable[[SweepContext], Any]) -> Dict[str, Any]:
+        outcomes: Dict[str, Any] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sweep") as workers:
+            futures = {
+                config.experiment_id: workers.submit(experiment, SweepContext(self, config))
+                for config in configs
+            }
+            for experiment_id, future in futures.items():
+                exc = future.exception()
+                outcomes[experiment_id] = exc if exc is not None else future.result()
+        return outcomes
+
+    def close(self):
+        self.engine.close()
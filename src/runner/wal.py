@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+class WriteAheadLog:
+    """
+    Append-only, group-committed record log with snapshot compaction, kept in one directory:
+    `wal.log` holds one `<crc32> <json>` line per record and `snapshot.json` the compacted state.
+
+    `append` only buffers; a writer thread flushes everything buffered with a single write and
+    fsync, so records appended while a sync is in flight share the next one. `sync` blocks until
+    every record appended so far is durable. `compact` hands a snapshot to the same writer thread,
+    which writes it and swaps in a log holding only the records appended since, so callers never
+    wait on the snapshot's serialization or fsync. Recovery returns the snapshot plus the records
+    logged after it, dropping a torn tail left by a crash mid-write.
+
+    If the writer thread fails (e.g. a full disk), the log stops: the error is raised from every
+    later `append`, `sync` and `close`, including syncs already waiting.
+    """
+    def __init__(self, directory: str, commit_interval: float = 0.05, compact_bytes: int = 4 * 1024 * 1024):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.compact_bytes = compact_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, "wal.log")
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self.syncs = 0
+        self.compactions = 0
+
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._appended = 0
+        self._durable = 0
+        self._sync_requested = False
+        self._closed = False
+        self._seq = 0
+        self._log_bytes = 0
+        # (state, seq, records appended, log bytes) of a requested compaction not yet written
+        self._compaction: Optional[Tuple[Dict[str, Any], int, int, int]] = None
+        self._compacting = False
+        self._file = None
+        self._writer: Optional[threading.Thread] = None
+        self._error: Optional[Exception] = None
+
+    def recover(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Load the latest snapshot state and the log records after it, then open the log for appends.
+        """
+        state, snapshot_seq = None, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            state, snapshot_seq = snapshot["state"], snapshot["seq"]
+
+        records, good_bytes = [], 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    entry = self._decode(line)
+                    if entry is None:
+                        break
+                    good_bytes += len(line)
+                    # Records already folded into the snapshot survive a crash between snapshot and truncate
+                    if entry["seq"] > snapshot_seq:
+                        records.append(entry["record"])
+                    self._seq = max(self._seq, entry["seq"])
+            if good_bytes < os.path.getsize(self.log_path):
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(good_bytes)
+        self._seq = max(self._seq, snapshot_seq)
+        self._log_bytes = good_bytes
+
+        self._file = open(self.log_path, "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._write_loop, name=f"wal-{os.path.basename(self.directory)}", daemon=True)
+        self._writer.start()
+        return state, records
+
+    @staticmethod
+    def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+        if not line.endswith(b"\n"):
+            return None
+        crc, _, payload = line[:-1].partition(b" ")
+        try:
+            if int(crc, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def append(self, record: Dict[str, Any]):
+        with self._cond:
+            if self._closed or self._file is None:
+                raise ValueError("WriteAheadLog is not open; call recover() first.")
+            if self._error is not None:
+                raise self._error
+            self._seq += 1
+            payload = json.dumps({"seq": self._seq, "record": record}, separators=(",", ":"), default=str)
+            line = f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n"
+            self._buffer.append(line)
+            self._log_bytes += len(line.encode("utf-8"))
+            self._appended += 1
+            self._cond.notify_all()
+
+    def sync(self):
+        """
+        Block until every record appended so far has been written and fsynced.
+        """
+        with self._cond:
+            target = self._appended
+            self._sync_requested = True
+            self._cond.notify_all()
+            while self._durable < target and not self._closed and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+
+    @property
+    def size(self) -> int:
+        """
+        Bytes in the log, including appended records not yet written.
+        """
+        return self._log_bytes
+
+    @property
+    def needs_compaction(self) -> bool:
+        return not self._compacting and self.size >= self.compact_bytes
+
+    def compact(self, state: Dict[str, Any]):
+        """
+        Schedule a snapshot of `state`, which must reflect every record appended so far and must not
+        be mutated afterwards; the writer thread writes it and drops the records it covers from the log.
+        """
+        with self._cond:
+            self._compaction = (state, self._seq, self._appended, self._log_bytes)
+            self._compacting = True
+            self._cond.notify_all()
+
+    def _write_compaction(self, compaction: Tuple[Dict[str, Any], int, int, int], kept: List[str]):
+        """
+        Write the snapshot, then replace the log with `kept` (the records appended after the request).
+        A crash in between leaves the old log, whose records the snapshot covers are skipped on recovery.
+        """
+        state, seq, _, covered_bytes = compaction
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": seq, "state": state}, f, separators=(",", ":"), default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        tmp_path = f"{self.log_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(kept))
+            f.flush()
+            os.fsync(f.fileno())
+        with self._io_lock:
+            self._file.close()
+            os.replace(tmp_path, self.log_path)
+            self._file = open(self.log_path, "a", encoding="utf-8")
+        self._fsync_directory()
+        with self._cond:
+            self._log_bytes -= covered_bytes
+            self._compacting = False
+            self.compactions += 1
+
+    def _fsync_directory(self):
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _write_loop(self):
+        try:
+            self._write_batches()
+        except Exception as exc:
+            with self._cond:
+                self._error = exc
+                self._cond.notify_all()
+
+    def _write_batches(self):
+        while True:
+            with self._cond:
+                while not self._buffer and self._compaction is None and not self._closed:
+                    self._cond.wait()
+                if not self._buffer and self._compaction is None and self._closed:
+                    return
+                # Let more appends join this commit unless someone is waiting on it
+                deadline = time.monotonic() + self.commit_interval
+                while not self._sync_requested and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._buffer = self._buffer, []
+                target = self._appended
+                self._sync_requested = False
+                compaction, self._compaction = self._compaction, None
+            if batch:
+                data = "".join(batch)
+                with self._io_lock:
+                    self._file.write(data)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self.syncs += 1
+                with self._cond:
+                    self._durable = target
+                    self._cond.notify_all()
+            if compaction is not None:
+                # Earlier batches were taken before the request, so only this one can hold newer records
+                newer = target - compaction[2]
+                self._write_compaction(compaction, batch[len(batch) - newer:] if newer else [])
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self.sync()
+        finally:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+            self._writer.join()
+            self._file.close()
+            self._file = None
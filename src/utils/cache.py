@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Request kwargs that never change what the model generates and must not leak into keys.
+NON_SEMANTIC_KWARGS = {"api_key", "api_base", "base_url", "headers", "cache", "num_retries"}
+
+def make_cache_key(model: str, messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+    """
+    Content-addressed key over the model name, fully rendered messages and sampling kwargs.
+    """
+    sampling = {k: v for k, v in kwargs.items() if k not in NON_SEMANTIC_KWARGS and v is not None}
+    payload = json.dumps(
+        {"model": model, "messages": messages, "kwargs": sampling},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite-backed response store with size-bounded LRU eviction and per-model TTLs.
+    """
+    def __init__(
+        self,
+        path: str = ".cache/llm_responses.sqlite",
+        max_bytes: int = 512 * 1024 * 1024,
+        default_ttl: Optional[float] = None,
+        model_ttls: Optional[Dict[str, float]] = None,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.model_ttls = model_ttls or {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses (accessed_at)")
+        self._conn.commit()
+        # Running payload total, so eviction never has to scan the table
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _ttl_for(self, model: str) -> Optional[float]:
+        return self.model_ttls.get(model, self.default_ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored response payload, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT model, payload, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            model, payload, size, created_at = row
+            ttl = self._ttl_for(model)
+            if ttl is not None and now - created_at > ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(payload)
+
+    def put(self, key: str, model: str, response: Dict[str, Any]):
+        """
+        Store a response payload and evict least-recently-used entries past `max_bytes`.
+        """
+        payload = json.dumps(response, default=str)
+        now = time.time()
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, payload, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, payload, len(payload), now, now),
+            )
+            self._bytes += len(payload) - (replaced[0] if replaced else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self, batch: int = 64):
+        while self._bytes > self.max_bytes:
+            # Oldest entries first, read off the LRU index a batch at a time
+            oldest = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at ASC LIMIT ?", (batch,)
+            ).fetchall()
+            if not oldest:
+                self._bytes = 0
+                return
+            for key, size in oldest:
+                if self._bytes <= self.max_bytes:
+                    return
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._bytes -= size
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self),
+        }
+
+    def __deepcopy__(self, memo):
+        # Shared by every copy of an LM (dspy.LM.copy deep-copies its attributes)
+        return self
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,25 +1,666 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
 import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Union
+
 import dspy
+import httpx
+import litellm
+
+from src.utils.cache import ResponseCache, make_cache_key
+from src.utils.routing import Endpoint, EndpointRouter
+from src.utils.transport import SharedTransport, TransportLM, get_transport
+
+class LMWrapper(dspy.LM):
+    """
+    Base for LMs that delegate requests to an inner LM.
+    Subclassing dspy.LM keeps DSPy callbacks (tracing, metrics) firing on the outermost wrapper.
+    """
+    def __init__(self, lm: dspy.BaseLM):
+        super().__init__(model=lm.model, model_type=lm.model_type, cache=lm.cache, callbacks=getattr(lm, "callbacks", None))
+        self.lm = lm
+        self.kwargs = lm.kwargs
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        return self.lm.forward(prompt=prompt, messages=messages, **kwargs)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        return await self.lm.aforward(prompt=prompt, messages=messages, **kwargs)
+
+class CachedLM(LMWrapper):
+    """
+    Wraps a DSPy LM so identical requests are served from a persistent ResponseCache.
+    """
+    def __init__(self, lm: dspy.BaseLM, cache: ResponseCache):
+        super().__init__(lm)
+        self.response_cache = cache
+
+    def _lookup(self, prompt, messages, kwargs):
+        messages = messages or [{"role": "user", "content": prompt}]
+        key = make_cache_key(self.model, messages, {**self.kwargs, **kwargs})
+        payload = self.response_cache.get(key)
+        if payload is None:
+            return key, None
+        response = litellm.ModelResponse(**payload)
+        response.cache_hit = True
+        return key, response
+
+    def _store(self, key, response):
+        self.response_cache.put(key, self.model, response.model_dump(warnings=False))
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        key, response = self._lookup(prompt, messages, kwargs)
+        if response is None:
+            response = self.lm.forward(prompt=prompt, messages=messages, **kwargs)
+            self._store(key, response)
+        return response
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        key, response = self._lookup(prompt, messages, kwargs)
+        if response is None:
+            response = await self.lm.aforward(prompt=prompt, messages=messages, **kwargs)
+            self._store(key, response)
+        return response
+
+# Providers that only cache a prompt prefix when it carries an explicit `cache_control`
+# breakpoint; OpenAI-style providers cache long stable prefixes automatically.
+EXPLICIT_CACHE_PROVIDERS = ("anthropic/", "claude", "gemini")
+
+def supports_cache_control(model: str) -> bool:
+    name = model.lower()
+    return any(marker in name for marker in EXPLICIT_CACHE_PROVIDERS)
+
+def _usage_field(obj, name):
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+def cached_prompt_tokens(usage) -> int:
+    """
+    Input tokens served from the provider's prompt cache, from an OpenAI-style
+    `prompt_tokens_details.cached_tokens` or an Anthropic-style `cache_read_input_tokens`.
+    """
+    cached = _usage_field(_usage_field(usage, "prompt_tokens_details"), "cached_tokens")
+    if cached is None:
+        cached = _usage_field(usage, "cache_read_input_tokens")
+    return cached or 0
+
+def mark_cacheable_prefix(messages: List[Dict[str, Any]], min_prefix_chars: int = 0) -> List[Dict[str, Any]]:
+    """
+    Copy of `messages` with a cache breakpoint after the leading system messages (the instruction
+    block shared by every question of a prompt), or `messages` itself when there is nothing to mark.
+    """
+    prefix = 0
+    while prefix < len(messages) and messages[prefix].get("role") == "system":
+        prefix += 1
+    if prefix == 0 or prefix == len(messages):
+        return messages
+    last = messages[prefix - 1]
+    content = last.get("content")
+    if isinstance(content, str):
+        if sum(len(m["content"]) if isinstance(m.get("content"), str) else 0 for m in messages[:prefix]) < min_prefix_chars:
+            return messages
+        content = [{"type": "text", "text": content}]
+    elif not isinstance(content, list) or not content:
+        return messages
+    content = content[:-1] + [{**content[-1], "cache_control": {"type": "ephemeral"}}]
+    return messages[:prefix - 1] + [{**last, "content": content}] + messages[prefix:]
+
+class PrefixCachingLM(LMWrapper):
+    """
+    Wraps a DSPy LM so the shared instruction prefix of each request is marked cacheable for
+    providers that need explicit breakpoints, and counts cached versus uncached input tokens.
+    Providers with automatic prefix caching are sent requests unchanged; their cached tokens
+    are still counted.
+    """
+    def __init__(self, lm: dspy.BaseLM, min_prefix_chars: int = 1024):
+        super().__init__(lm)
+        self.explicit = supports_cache_control(lm.model)
+        self.min_prefix_chars = min_prefix_chars
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def _prepare(self, messages):
+        if messages is None or not self.explicit:
+            return messages
+        return mark_cacheable_prefix(messages, self.min_prefix_chars)
+
+    def _account(self, response):
+        usage = getattr(response, "usage", None)
+        self.calls += 1
+        self.prompt_tokens += _usage_field(usage, "prompt_tokens") or 0
+        self.cached_tokens += cached_prompt_tokens(usage)
+
+    @property
+    def uncached_tokens(self) -> int:
+        return self.prompt_tokens - self.cached_tokens
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        response = self.lm.forward(prompt=prompt, messages=self._prepare(messages), **kwargs)
+        self._account(response)
+        return response
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        response = await self.lm.aforward(prompt=prompt, messages=self._prepare(messages), **kwargs)
+        self._account(response)
+        return response
+
+class CallPriority(IntEnum):
+    """
+    Scheduling priority of an LM call; lower values are served first.
+    """
+    EVALUATION = 0
+    OPTIMIZATION = 1
+    REFLECTION = 2
+
+# OpenRouter's documented ceiling for `:free` model variants (20 requests per minute)
+FREE_MODEL_RATE = 20 / 60
+
+class TokenBucket:
+    """
+    Request-rate token bucket whose rate is adapted from provider throttling signals.
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.ceiling: Optional[float] = None
+        # Incremented on every rate decrease; a 429 for a token taken in an earlier episode is stale
+        self.episode = 0
+        self.limited_at = 0.0
+        self.waiters: List[tuple] = []
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Seconds until a token can be taken.
+        """
+        self.refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1.0:
+            wait = max(wait, (1.0 - self.tokens) / self.rate)
+        return wait
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """
+    Parse the Retry-After header (seconds or HTTP date) from a provider error, if present.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_rate_limited(exc: Exception) -> bool:
+    return isinstance(exc, litellm.RateLimitError) or getattr(exc, "status_code", None) == 429
+
+def is_transient(exc: Exception) -> bool:
+    """
+    Whether a provider error is worth retrying (or failing over): a 429, a 5xx, a timeout or a
+    dropped connection. Client errors such as invalid requests or context-length overflows are not.
+    """
+    if is_rate_limited(exc):
+        return True
+    if isinstance(exc, (litellm.Timeout, litellm.APIConnectionError, httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+class RateLimitScheduler:
+    """
+    Per-model token buckets shared by every LM in the process.
 
-def get_llm_client(model_name: str, **kwargs):
+    The rate of a model is halved on a 429 and the rate in force at that moment is kept as
+    its learned ceiling; successes then raise the rate additively, but never above
+    `headroom * ceiling`, so throughput settles just under the provider limit instead of
+    oscillating around it. A burst of 429s for requests issued before the last decrease counts
+    as one episode, and once no 429 has been seen for `probe_interval` seconds successes raise
+    the ceiling again, so a limit that was lifted is found again. Waiters are served in
+    `CallPriority` order.
+    """
+    def __init__(
+        self,
+        default_rate: float = 1.0,
+        model_rates: Optional[Dict[str, float]] = None,
+        min_rate: float = 1 / 60,
+        max_rate: float = 50.0,
+        increase_step: float = 0.05,
+        decrease_factor: float = 0.5,
+        headroom: float = 0.9,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        probe_interval: float = 60.0,
+    ):
+        self.default_rate = default_rate
+        self.model_rates = model_rates or {}
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.headroom = headroom
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_interval = probe_interval
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.throttled = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _bucket(self, model: str) -> TokenBucket:
+        bucket = self.buckets.get(model)
+        if bucket is None:
+            rate = self.model_rates.get(model)
+            if rate is None:
+                rate = FREE_MODEL_RATE if model.endswith(":free") else self.default_rate
+            bucket = self.buckets[model] = TokenBucket(rate)
+        return bucket
+
+    def _try_take(self, bucket: TokenBucket, ticket: tuple) -> Optional[float]:
+        """
+        Take a token for `ticket` if it is at the head of the queue. Returns 0 on success,
+        the wait in seconds when at the head, or None when queued behind other callers.
+        """
+        if bucket.waiters[0] != ticket:
+            return None
+        wait = bucket.delay(time.monotonic())
+        if wait > 0:
+            return wait
+        heapq.heappop(bucket.waiters)
+        bucket.tokens -= 1.0
+        self._cond.notify_all()
+        return 0.0
+
+    def acquire(self, model: str, priority: CallPriority = CallPriority.EVALUATION) -> int:
+        """
+        Block until a token is taken; returns the backoff episode to pass to `on_rate_limited`.
+        """
+        with self._cond:
+            bucket = self._bucket(model)
+            ticket = (int(priority), next(self._seq))
+            heapq.heappush(bucket.waiters, ticket)
+            while True:
+                wait = self._try_take(bucket, ticket)
+                if wait == 0.0:
+                    return bucket.episode
+                self._cond.wait(timeout=wait)
+
+    async def aacquire(self, model: str, priority: CallPriority = CallPriority.EVALUATION) -> int:
+        with self._cond:
+            bucket = self._bucket(model)
+            ticket = (int(priority), next(self._seq))
+            heapq.heappush(bucket.waiters, ticket)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_take(bucket, ticket)
+                    if wait == 0.0:
+                        return bucket.episode
+                await asyncio.sleep(0.01 if wait is None else wait)
+        except BaseException:
+            # A cancelled waiter must not block the queue behind it
+            with self._cond:
+                if ticket in bucket.waiters:
+                    bucket.waiters.remove(ticket)
+                    heapq.heapify(bucket.waiters)
+                    self._cond.notify_all()
+            raise
+
+    def on_success(self, model: str):
+        with self._cond:
+            bucket = self._bucket(model)
+            if bucket.ceiling is not None and time.monotonic() - bucket.limited_at >= self.probe_interval:
+                # No 429 for a while: probe above the learned ceiling
+                bucket.ceiling = min(self.max_rate, bucket.ceiling + self.increase_step)
+            limit = self.max_rate if bucket.ceiling is None else self.headroom * bucket.ceiling
+            bucket.rate = max(self.min_rate, min(limit, bucket.rate + self.increase_step))
+
+    def on_rate_limited(self, model: str, retry_after: Optional[float] = None, episode: Optional[int] = None):
+        """
+        Feed back a 429 for a request whose token was taken in `episode` (from `acquire`).
+        Requests issued before the last decrease only honour `retry_after`.
+        """
+        with self._cond:
+            bucket = self._bucket(model)
+            now = time.monotonic()
+            if episode is None or episode == bucket.episode:
+                # The rate in force when the request was issued is the newly observed limit
+                bucket.ceiling = bucket.rate
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease_factor)
+                bucket.tokens = 0.0
+                bucket.updated = now
+                bucket.episode += 1
+            bucket.limited_at = now
+            if retry_after:
+                bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+            self.throttled += 1
+            self._cond.notify_all()
+
+    def __deepcopy__(self, memo):
+        # Shared by every copy of an LM (dspy.LM.copy deep-copies its attributes)
+        return self
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Jittered exponential backoff for the given retry attempt.
+        """
+        return min(self.max_backoff, self.base_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+class RateLimitedLM(LMWrapper):
+    """
+    Wraps a DSPy LM so every request first takes a token from the shared RateLimitScheduler,
+    and 429s feed back into the scheduler before being retried.
+    """
+    def __init__(
+        self,
+        lm: dspy.BaseLM,
+        scheduler: RateLimitScheduler,
+        priority: CallPriority = CallPriority.EVALUATION,
+        max_retries: int = 8,
+    ):
+        super().__init__(lm)
+        self.scheduler = scheduler
+        self.priority = priority
+        self.max_retries = max_retries
+        self.retries = 0
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            episode = self.scheduler.acquire(self.model, self.priority)
+            try:
+                response = self.lm.forward(prompt=prompt, messages=messages, **kwargs)
+            except Exception as exc:
+                if not is_rate_limited(exc) or attempt == self.max_retries:
+                    raise
+                self.scheduler.on_rate_limited(self.model, retry_after_seconds(exc), episode)
+                self.retries += 1
+                time.sleep(self.scheduler.backoff(attempt))
+                continue
+            self.scheduler.on_success(self.model)
+            return response
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            episode = await self.scheduler.aacquire(self.model, self.priority)
+            try:
+                response = await self.lm.aforward(prompt=prompt, messages=messages, **kwargs)
+            except Exception as exc:
+                if not is_rate_limited(exc) or attempt == self.max_retries:
+                    raise
+                self.scheduler.on_rate_limited(self.model, retry_after_seconds(exc), episode)
+                self.retries += 1
+                await asyncio.sleep(self.scheduler.backoff(attempt))
+                continue
+            self.scheduler.on_success(self.model)
+            return response
+
+class RoutedLM(LMWrapper):
+    """
+    Serves one logical model from several endpoints (one LM each): every request goes to the
+    healthiest endpoint according to the EndpointRouter and fails over down its ranking on transient
+    errors (see is_transient). Client errors are the request's fault, not the endpoint's: they are
+    raised at once and do not count against the endpoint's health.
+    With `hedge_quantile`, an async request still running after that quantile of its endpoint's
+    recent latency is duplicated to the next endpoint, and the first answer wins.
+    """
+    def __init__(
+        self,
+        model: str,
+        lms: Dict[str, dspy.BaseLM],
+        router: Optional[EndpointRouter] = None,
+        hedge_quantile: Optional[float] = None,
+        min_hedge_delay: float = 0.05,
+    ):
+        names = list(lms)
+        super().__init__(lms[names[0]])
+        self.model = model
+        self.endpoint_lms = [lms[name] for name in names]
+        self.router = router or EndpointRouter(names)
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+        self.failovers = 0
+        self.hedges = 0
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        error = None
+        for attempt, index in enumerate(self.router.rank()):
+            if attempt:
+                self.failovers += 1
+            start = time.perf_counter()
+            try:
+                response = self.endpoint_lms[index].forward(prompt=prompt, messages=messages, **kwargs)
+            except Exception as exc:
+                if not is_transient(exc):
+                    raise
+                self.router.record(index, time.perf_counter() - start, ok=False)
+                error = exc
+                continue
+            self.router.record(index, time.perf_counter() - start, ok=True)
+            return response
+        raise error
+
+    async def _attempt(self, index: int, prompt, messages, kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.endpoint_lms[index].aforward(prompt=prompt, messages=messages, **kwargs)
+        except asyncio.CancelledError:
+            self.router.record_abandoned(index, time.perf_counter() - start)
+            raise
+        except Exception as exc:
+            if is_transient(exc):
+                self.router.record(index, time.perf_counter() - start, ok=False)
+            raise
+        self.router.record(index, time.perf_counter() - start, ok=True)
+        return response
+
+    def _hedge_delay(self, running: Dict[asyncio.Future, int], order: List[int]) -> Optional[float]:
+        if self.hedge_quantile is None or not order or len(running) != 1:
+            return None
+        delay = self.router.hedge_delay(next(iter(running.values())), self.hedge_quantile)
+        return None if delay is None else max(delay, self.min_hedge_delay)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        order = self.router.rank()
+        running: Dict[asyncio.Future, int] = {}
+        error = None
+        try:
+            while order or running:
+                if not running:
+                    if error is not None:
+                        self.failovers += 1
+                    index = order.pop(0)
+                    running[asyncio.ensure_future(self._attempt(index, prompt, messages, kwargs))] = index
+                done, _ = await asyncio.wait(running, timeout=self._hedge_delay(running, order), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    index = order.pop(0)
+                    running[asyncio.ensure_future(self._attempt(index, prompt, messages, kwargs))] = index
+                    continue
+                for task in done:
+                    del running[task]
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                    if not is_transient(error):
+                        raise error
+        finally:
+            for task in running:
+                task.cancel()
+        raise error
+
+OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
+
+def get_llm_client(
+    model_name: str,
+    cache: Optional[ResponseCache] = None,
+    scheduler: Optional[RateLimitScheduler] = None,
+    priority: CallPriority = CallPriority.EVALUATION,
+    prompt_caching: bool = True,
+    transport: Optional[SharedTransport] = None,
+    endpoints: Optional[List[Endpoint]] = None,
+    hedge_quantile: Optional[float] = None,
+    **kwargs
+):
     """
     Returns a DSPy LM client configured for OpenRouter.
+    If a ResponseCache is given, the LM is wrapped so repeated requests never hit the network.
+    If a RateLimitScheduler is given, requests are throttled per model at `priority`.
+    With `prompt_caching`, instruction prefixes are marked cacheable (see PrefixCachingLM).
+    Requests go through `transport`, by default the process-wide pooled SharedTransport.
+    With `endpoints`, the model is served from several OpenAI-compatible endpoints instead of
+    OpenRouter alone, routed by health with optional hedging (see RoutedLM).
     """
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
-        raise ValueError("OPENROUTER_API_KEY must be set in environment variables.")
+    if scheduler is not None:
+        # The scheduler owns retries; LiteLLM's own backoff would hide 429s from it
+        kwargs.setdefault("num_retries", 0)
+
+    if not endpoints:
+        # OpenRouter is OpenAI-compatible
+        lm = _endpoint_lm(model_name, Endpoint("openrouter", OPENROUTER_API_BASE), transport, kwargs)
+    else:
+        # Retrying inside one endpoint would only delay failing over to the next
+        kwargs.setdefault("num_retries", 0)
+        lm = RoutedLM(
+            model_name,
+            {endpoint.name: _endpoint_lm(model_name, endpoint, transport, kwargs) for endpoint in endpoints},
+            hedge_quantile=hedge_quantile,
+        )
 
-    # OpenRouter is OpenAI-compatible
-    lm = dspy.LM(
-        model=model_name,
-        api_base="https://openrouter.ai/api/v1",
+    if prompt_caching:
+        lm = PrefixCachingLM(lm)
+    if scheduler is not None:
+        lm = RateLimitedLM(lm, scheduler, priority=priority)
+    # Cache outermost so hits never spend rate-limit tokens
+    if cache is not None:
+        lm = CachedLM(lm, cache)
+    return lm
+
+def _endpoint_lm(model_name: str, endpoint: Endpoint, transport: Optional[SharedTransport], kwargs) -> TransportLM:
+    api_key = endpoint.api_key
+    if not api_key:
+        if endpoint.api_base.rstrip("/") != OPENROUTER_API_BASE:
+            # Never send the OpenRouter key to any other host
+            raise ValueError(f"No API key for endpoint '{endpoint.name}' ({endpoint.api_base}); pass api_key.")
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            raise ValueError("OPENROUTER_API_KEY must be set in environment variables.")
+    return TransportLM(
+        model=endpoint.model or model_name,
+        transport=transport,
+        api_base=endpoint.api_base,
         api_key=api_key,
         **kwargs
     )
-    
-    return lm
 
-def configure_dspy_lm(lm: dspy.LM):
+class AsyncBatchEngine:
+    """
+    Runs batches of LM requests concurrently and returns outputs in input order.
+    Requests run on a dedicated event loop whose pooled HTTP client comes from the SharedTransport
+    (the process-wide one by default) and is installed as LiteLLM's async session, so connections
+    are reused across batches.
+    Other async workloads (e.g. the evaluation harness) can share the loop and pool through `submit`.
+    """
+    def __init__(self, lm: Optional[dspy.BaseLM] = None, max_in_flight: int = 16, transport: Optional[SharedTransport] = None):
+        self.lm = lm
+        self.max_in_flight = max_in_flight
+        self.transport = transport
+        self._loop = None
+        self._thread = None
+        self._http_client = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="lm-batch-engine", daemon=True)
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._open_http_client(), self._loop).result()
+        return self._loop
+
+    async def _open_http_client(self):
+        self.transport = self.transport or get_transport()
+        self._http_client = self.transport.async_handler().client
+        litellm.aclient_session = self._http_client
+
+    async def _call(self, semaphore: asyncio.Semaphore, request: Union[str, List[Dict[str, Any]]], kwargs):
+        async with semaphore:
+            if isinstance(request, str):
+                return await self.lm.acall(prompt=request, **kwargs)
+            return await self.lm.acall(messages=request, **kwargs)
+
+    async def arun(self, requests: List[Union[str, List[Dict[str, Any]]]], return_exceptions: bool = False, **kwargs):
+        """
+        Await a batch of prompts (strings) or message lists with at most `max_in_flight` outstanding.
+        """
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        return await asyncio.gather(
+            *(self._call(semaphore, request, kwargs) for request in requests),
+            return_exceptions=return_exceptions,
+        )
+
+    async def _run_in_context(self, context: contextvars.Context, coro):
+        return await asyncio.get_running_loop().create_task(coro, context=context)
+
+    def submit(self, coro):
+        """
+        Run a coroutine on the engine loop and block until it finishes.
+        The caller's context (dspy.context overrides, tracing stage) is carried over to the engine loop.
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_in_context(contextvars.copy_context(), coro), loop
+        )
+        return future.result()
+
+    def run(self, requests: List[Union[str, List[Dict[str, Any]]]], return_exceptions: bool = False, **kwargs):
+        """
+        Blocking entrypoint for synchronous callers such as the stage executors.
+        """
+        return self.submit(self.arun(requests, return_exceptions=return_exceptions, **kwargs))
+
+    def __deepcopy__(self, memo):
+        # Shared by every copy of an LM that holds it
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            if self._http_client is not None:
+                asyncio.run_coroutine_threadsafe(self.transport.aclose_loop(), self._loop).result()
+                if litellm.aclient_session is self._http_client:
+                    litellm.aclient_session = None
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            self._http_client = None
+
+def configure_dspy_lm(lm: dspy.BaseLM):
     """
     Set the default LM for DSPy.
     """
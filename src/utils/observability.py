@@ -1,40 +1,575 @@
+import contextvars
+import hashlib
+import json
+import logging
 import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
 import dspy
 from langfuse import Langfuse
 from dspy.utils.callback import BaseCallback
+from pydantic import BaseModel, Field
+
+from src.utils.llm_client import cached_prompt_tokens
+
+logger = logging.getLogger(__name__)
+
+_current_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("tracing_stage", default=None)
+
+@contextmanager
+def tracing_stage(stage: str):
+    """
+    Tag LM calls made inside the block with a stage name (e.g. a PromptStage value or "EVALUATION")
+    so TracingPolicy can sample them per stage.
+    """
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+class SamplingRule(BaseModel):
+    head: float = Field(1.0, ge=0.0, le=1.0)
+    tail: float = Field(1.0, ge=0.0, le=1.0)
+
+class TracingPolicy(BaseModel):
+    """
+    Decides which LM calls are exported and how much of each payload is uploaded.
+
+    The head rate is applied when a call starts, the tail rate when it finishes; rules
+    are looked up by stage first, then by model, then fall back to `default`. Failed calls
+    are always exported when `always_trace_errors` is set, even if not head-sampled.
+    Payloads whose JSON exceeds `max_payload_chars` are replaced by a prefix plus the
+    SHA-256 of the full body.
+    """
+    default: SamplingRule = Field(default_factory=SamplingRule)
+    models: Dict[str, SamplingRule] = Field(default_factory=dict)
+    stages: Dict[str, SamplingRule] = Field(default_factory=dict)
+    always_trace_errors: bool = True
+    max_payload_chars: Optional[int] = None
+
+    def rule_for(self, model: Optional[str], stage: Optional[str]) -> SamplingRule:
+        if stage in self.stages:
+            return self.stages[stage]
+        if model in self.models:
+            return self.models[model]
+        return self.default
+
+    def truncate(self, payload: Any) -> Any:
+        if self.max_payload_chars is None or payload is None:
+            return payload
+        body = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+        if len(body) <= self.max_payload_chars:
+            return payload
+        return {
+            "truncated": True,
+            "original_chars": len(body),
+            "sha256": hashlib.sha256(body.encode("utf-8")).hexdigest(),
+            "head": body[: self.max_payload_chars],
+        }
+
+@dataclass(slots=True)
+class SpanRecord:
+    """
+    Lightweight record of one LM call, captured on the hot path and exported later.
+    """
+    call_id: str
+    name: str
+    model: Optional[str]
+    inputs: Any
+    start_time: float
+    end_time: Optional[float] = None
+    outputs: Any = None
+    error: Optional[str] = None
+    # "ok", "error", or "timeout" for calls whose end callback never fired
+    status: str = "ok"
+    stage: Optional[str] = None
+    sampled: bool = True
+
+class BatchExporter:
+    """
+    Bounded ring buffer drained by a background worker in batches.
+    Batches are flushed when `batch_size` records are queued or every `flush_interval` seconds.
+    When the buffer is full, records are appended to `spill_path` as JSONL if set, otherwise dropped.
+    """
+    def __init__(
+        self,
+        export_fn: Callable[[List[SpanRecord]], None],
+        capacity: int = 10_000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        spill_path: Optional[str] = None,
+    ):
+        self.export_fn = export_fn
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.exported = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._export_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, name="langfuse-exporter", daemon=True)
+        self._worker.start()
+
+    def submit(self, record: SpanRecord):
+        with self._cond:
+            if len(self._buffer) < self.capacity:
+                self._buffer.append(record)
+                if len(self._buffer) == self.batch_size:
+                    self._cond.notify()
+                return
+        self._overflow(record)
+
+    def _overflow(self, record: SpanRecord):
+        if self.spill_path is None:
+            self.dropped += 1
+            return
+        try:
+            with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(asdict(record), default=str) + "\n")
+            self.spilled += 1
+        except OSError:
+            self.dropped += 1
+
+    def _take(self) -> List[SpanRecord]:
+        with self._cond:
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _export_next(self) -> bool:
+        """
+        Export one batch; returns False when nothing was queued.
+        """
+        with self._export_lock:
+            batch = self._take()
+            if not batch:
+                return False
+            try:
+                self.export_fn(batch)
+                self.exported += len(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("Failed to export %d trace records", len(batch))
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._buffer) < self.batch_size:
+                    self._cond.wait(timeout=self.flush_interval)
+                if self._stopped:
+                    return
+            self._export_next()
+
+    def flush(self):
+        """
+        Export everything queued so far from the calling thread.
+        """
+        while self._export_next():
+            pass
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._worker.join()
+        self.flush()
+
+class GenerationRegistry:
+    """
+    In-flight LM calls keyed by `call_id`, bounded by a TTL and a hard size cap.
+    Entries are kept in start order, so expiry only ever inspects the oldest ones.
+    """
+    def __init__(self, ttl: float = 600.0, max_size: int = 10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.expired = 0
+        self.evicted = 0
+        self._entries: "OrderedDict[str, SpanRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, record: SpanRecord) -> List[SpanRecord]:
+        """
+        Register a call and return the orphans pushed out by expiry or the size cap.
+        """
+        with self._lock:
+            orphans = self._expire(record.start_time)
+            self._entries[record.call_id] = record
+            while len(self._entries) > self.max_size:
+                orphans.append(self._entries.popitem(last=False)[1])
+                self.evicted += 1
+        return orphans
+
+    def pop(self, call_id: str) -> Optional[SpanRecord]:
+        with self._lock:
+            return self._entries.pop(call_id, None)
+
+    def expire(self, now: Optional[float] = None) -> List[SpanRecord]:
+        with self._lock:
+            return self._expire(time.time() if now is None else now)
+
+    def _expire(self, now: float) -> List[SpanRecord]:
+        orphans = []
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if now - oldest.start_time <= self.ttl:
+                break
+            orphans.append(self._entries.popitem(last=False)[1])
+            self.expired += 1
+        return orphans
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, call_id: str) -> bool:
+        return call_id in self._entries
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": len(self), "expired": self.expired, "evicted": self.evicted}
 
 class LangfuseCallback(BaseCallback):
     """
     Custom Langfuse callback for DSPy.
+    The LM hooks only record spans in memory; a BatchExporter ships them to Langfuse off the call path.
     """
-    def __init__(self, public_key, secret_key, host):
+    def __init__(
+        self,
+        public_key,
+        secret_key,
+        host,
+        capacity: int = 10_000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        spill_path: Optional[str] = None,
+        generation_ttl: float = 600.0,
+        max_active_generations: int = 10_000,
+        policy: Optional[TracingPolicy] = None,
+    ):
         self.langfuse = Langfuse(
             public_key=public_key,
             secret_key=secret_key,
             host=host
         )
-        self.active_generations = {}
+        self.policy = policy or TracingPolicy()
+        self.sampled_out = 0
+        self.active_generations = GenerationRegistry(ttl=generation_ttl, max_size=max_active_generations)
+        self.exporter = BatchExporter(
+            self._export_spans,
+            capacity=capacity,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            spill_path=spill_path,
+        )
 
     def on_lm_start(self, call_id, instance, inputs):
-        # Create a generation in Langfuse
-        generation = self.langfuse.generation(
-            name=f"dspy_lm_{instance.model if hasattr(instance, 'model') else 'unknown'}",
-            input=inputs,
-            model=getattr(instance, "model", None)
-        )
-        self.active_generations[call_id] = generation
+        model = getattr(instance, "model", None)
+        stage = _current_stage.get()
+        sampled = random.random() < self.policy.rule_for(model, stage).head
+        if not sampled and not self.policy.always_trace_errors:
+            self.sampled_out += 1
+            return
+        orphans = self.active_generations.add(SpanRecord(
+            call_id=call_id,
+            name=f"dspy_lm_{model if model is not None else 'unknown'}",
+            model=model,
+            inputs=inputs,
+            start_time=time.time(),
+            stage=stage,
+            sampled=sampled,
+        ))
+        self._close_orphans(orphans)
 
     def on_lm_end(self, call_id, outputs, exception=None):
-        generation = self.active_generations.pop(call_id, None)
-        if generation:
+        record = self.active_generations.pop(call_id)
+        if record:
+            record.end_time = time.time()
             if exception:
-                generation.update(output=str(exception), level="ERROR")
+                record.error = str(exception)
+                record.status = "error"
+                keep = self.policy.always_trace_errors or record.sampled
+            else:
+                record.outputs = outputs
+                keep = record.sampled and random.random() < self.policy.rule_for(record.model, record.stage).tail
+            if keep:
+                self.exporter.submit(record)
+            else:
+                self.sampled_out += 1
+
+    def _close_orphans(self, orphans: List[SpanRecord]):
+        now = time.time()
+        for record in orphans:
+            if not record.sampled:
+                self.sampled_out += 1
+                continue
+            record.end_time = now
+            record.status = "timeout"
+            record.error = f"No on_lm_end received within {now - record.start_time:.1f}s"
+            self.exporter.submit(record)
+
+    def expire_generations(self):
+        """
+        Close generations that outlived the TTL; called from flush and on every new LM call.
+        """
+        self._close_orphans(self.active_generations.expire())
+
+    def _export_spans(self, records: List[SpanRecord]):
+        for record in records:
+            generation = self.langfuse.start_generation(
+                name=record.name,
+                input=self.policy.truncate(record.inputs),
+                model=record.model,
+                metadata={
+                    "call_id": record.call_id,
+                    "stage": record.stage,
+                    "start_time": record.start_time,
+                    "latency_seconds": record.end_time - record.start_time,
+                },
+            )
+            if record.status == "timeout":
+                generation.update(level="WARNING", status_message=record.error)
+            elif record.error is not None:
+                generation.update(output=self.policy.truncate(record.error), level="ERROR")
             else:
-                generation.update(output=outputs)
+                generation.update(output=self.policy.truncate(record.outputs))
+            generation.end()
+
+    def __deepcopy__(self, memo):
+        # Shared by every copy of an LM (dspy.LM.copy deep-copies its callbacks)
+        return self
+
+    def flush(self):
+        """
+        Export queued spans and flush the Langfuse client.
+        """
+        self.expire_generations()
+        self.exporter.flush()
+        self.langfuse.flush()
+
+def find_history_entry(lm, outputs) -> Optional[Dict[str, Any]]:
+    """
+    History entry (usage, cost, raw response) of the LM call that returned `outputs`.
+    The processed outputs list is the same object as the entry's, so this is safe under concurrency.
+    """
+    for entry in reversed(getattr(lm, "history", [])):
+        if entry.get("outputs") is outputs:
+            return entry
+    return None
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class ModelStats:
+    """
+    Running totals for one model. Latency is kept as a fixed-bucket histogram,
+    so memory is constant and percentiles are interpolated within buckets.
+    """
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.cost = 0.0
 
-def init_langfuse():
+    def observe(self, latency: float):
+        index = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                index = i
+                break
+        self.bucket_counts[index] += 1
+        self.latency_sum += latency
+
+    def percentile(self, q: float) -> Optional[float]:
+        if self.calls == 0:
+            return None
+        rank = q * self.calls
+        seen = 0
+        for i, count in enumerate(self.bucket_counts):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return LATENCY_BUCKETS[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_p50": self.percentile(0.50),
+            "latency_p95": self.percentile(0.95),
+            "latency_p99": self.percentile(0.99),
+            "latency_sum": self.latency_sum,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "prompt_cache_hit_rate": self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_second": self.completion_tokens / self.latency_sum if self.latency_sum else 0.0,
+            "retries": self.retries,
+            "cost": self.cost,
+        }
+
+class MetricsCallback(BaseCallback):
+    """
+    In-process LM metrics per model: latency histogram, token counts, throughput, retries and cost.
+    Token usage and cost come from the LM history entry of each call, so they are only
+    recorded while DSPy history is enabled.
+    """
+    def __init__(self, max_in_flight: int = 10_000):
+        self.models: Dict[str, ModelStats] = {}
+        self.max_in_flight = max_in_flight
+        self._starts: "OrderedDict[str, tuple]" = OrderedDict()
+        self._retries_seen: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def on_lm_start(self, call_id, instance, inputs):
+        with self._lock:
+            self._starts[call_id] = (instance, time.perf_counter())
+            # Calls that never end must not accumulate (see GenerationRegistry)
+            while len(self._starts) > self.max_in_flight:
+                self._starts.popitem(last=False)
+
+    def on_lm_end(self, call_id, outputs, exception=None):
+        with self._lock:
+            started = self._starts.pop(call_id, None)
+        if started is None:
+            return
+        instance, start = started
+        latency = time.perf_counter() - start
+        entry = find_history_entry(instance, outputs) if exception is None else None
+        retries = self._new_retries(instance)
+        model = getattr(instance, "model", None) or "unknown"
+
+        with self._lock:
+            stats = self.models.setdefault(model, ModelStats())
+            stats.calls += 1
+            stats.observe(latency)
+            stats.retries += retries
+            if exception is not None:
+                stats.errors += 1
+            if entry is not None:
+                usage = entry.get("usage") or {}
+                stats.prompt_tokens += usage.get("prompt_tokens") or 0
+                stats.cached_prompt_tokens += cached_prompt_tokens(usage)
+                stats.completion_tokens += usage.get("completion_tokens") or 0
+                stats.cost += entry.get("cost") or 0.0
+
+    def _new_retries(self, instance) -> int:
+        # Sum the cumulative retry counters along the wrapper chain (see RateLimitedLM)
+        total = 0
+        lm = instance
+        while lm is not None:
+            total += getattr(lm, "retries", 0)
+            lm = getattr(lm, "lm", None)
+        with self._lock:
+            previous = self._retries_seen.get(id(instance), 0)
+            self._retries_seen[id(instance)] = total
+        return max(0, total - previous)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"timestamp": time.time(), "models": {m: s.to_dict() for m, s in self.models.items()}}
+
+    def to_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        lines = ["# TYPE dspy_lm_latency_seconds histogram"]
+        with self._lock:
+            items = sorted(self.models.items())
+            for model, stats in items:
+                label = f'model="{model}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.bucket_counts):
+                    cumulative += count
+                    lines.append(f'dspy_lm_latency_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"dspy_lm_latency_seconds_sum{{{label}}} {stats.latency_sum}")
+                lines.append(f"dspy_lm_latency_seconds_count{{{label}}} {stats.calls}")
+            counters = [
+                ("dspy_lm_calls_total", "calls"),
+                ("dspy_lm_errors_total", "errors"),
+                ("dspy_lm_prompt_tokens_total", "prompt_tokens"),
+                ("dspy_lm_cached_prompt_tokens_total", "cached_prompt_tokens"),
+                ("dspy_lm_completion_tokens_total", "completion_tokens"),
+                ("dspy_lm_retries_total", "retries"),
+                ("dspy_lm_cost_usd_total", "cost"),
+            ]
+            for name, attr in counters:
+                lines.append(f"# TYPE {name} counter")
+                for model, stats in items:
+                    lines.append(f'{name}{{model="{model}"}} {getattr(stats, attr)}')
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve `to_prometheus()` on http://host:port/metrics from a daemon thread.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="lm-metrics-http", daemon=True).start()
+        return server
+
+    def write_snapshots(self, path: str, interval: float = 30.0) -> threading.Event:
+        """
+        Periodically overwrite `path` with the JSON snapshot; set the returned event to stop.
+        """
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.write_snapshot(path)
+            self.write_snapshot(path)
+
+        threading.Thread(target=run, name="lm-metrics-snapshot", daemon=True).start()
+        return stop
+
+    def write_snapshot(self, path: str):
+        # Per-thread temp file: the periodic writer and manual calls may overlap
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def __deepcopy__(self, memo):
+        return self
+
+def init_langfuse(policy: Optional[TracingPolicy] = None):
     """
     Initialize Langfuse client and return the callback handler for DSPy.
+    `policy` controls sampling and payload truncation; by default every call is traced.
     """
     public_key = os.getenv("LANGFUSE_PUBLIC_KEY")
     secret_key = os.getenv("LANGFUSE_SECRET_KEY")
@@ -46,13 +581,15 @@ def init_langfuse():
     handler = LangfuseCallback(
         public_key=public_key,
         secret_key=secret_key,
-        host=host
+        host=host,
+        policy=policy,
     )
-    
+
     return handler
 
-def setup_dspy_tracing(handler: LangfuseCallback):
+def setup_dspy_tracing(handler: LangfuseCallback, metrics: Optional[MetricsCallback] = None):
     """
-    Configure DSPy to use the Langfuse callback handler.
+    Configure DSPy to use the Langfuse callback handler, plus local metrics if given.
     """
-    dspy.settings.configure(callbacks=[handler])
+    callbacks = [handler] if metrics is None else [handler, metrics]
+    dspy.settings.configure(callbacks=callbacks)
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+@dataclass
+class Endpoint:
+    """
+    One OpenAI-compatible endpoint serving a logical model. `model` is the LiteLLM model name to
+    request there (defaults to the logical model). `api_key` is required except for OpenRouter
+    itself, where it defaults to OPENROUTER_API_KEY.
+    """
+    name: str
+    api_base: str
+    api_key: Optional[str] = None
+    model: Optional[str] = None
+
+class EndpointStats:
+    """
+    Rolling window of one endpoint's latencies and outcomes, plus its circuit-breaker state.
+    """
+    def __init__(self, window: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.last_used = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def latency(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+class EndpointRouter:
+    """
+    Ranks the endpoints of a logical model by expected time to a successful answer: the rolling
+    median latency inflated by the rolling error rate. Endpoints without samples, or not used for
+    `probe_interval` seconds, are tried first, so a recovered endpoint can win traffic back.
+
+    An endpoint whose error rate over at least `min_samples` calls reaches `failure_threshold`, or
+    that fails `max_consecutive_failures` times in a row, is taken out of rotation for `cooldown`
+    seconds and then probed again with a fresh window. Open endpoints are still tried last.
+    """
+    def __init__(
+        self,
+        names: List[str],
+        window: int = 50,
+        min_samples: int = 5,
+        failure_threshold: float = 0.5,
+        max_consecutive_failures: int = 3,
+        cooldown: float = 30.0,
+        probe_interval: float = 60.0,
+    ):
+        if not names:
+            raise ValueError("EndpointRouter needs at least one endpoint.")
+        self.names = names
+        self.window = window
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.stats = [EndpointStats(window) for _ in names]
+        self._lock = threading.Lock()
+
+    def _expected_latency(self, stats: EndpointStats, now: float) -> float:
+        median = stats.latency(0.5)
+        if median is None or now - stats.last_used > self.probe_interval:
+            return 0.0
+        return median / max(1e-3, 1.0 - stats.error_rate)
+
+    def rank(self) -> List[int]:
+        """
+        Endpoint indices, healthiest first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for i, stats in enumerate(self.stats):
+                if stats.open_until and stats.open_until <= now:
+                    # Cooldown over: probe with a clean slate
+                    self.stats[i] = EndpointStats(self.window)
+                    self.stats[i].requests, self.stats[i].errors = stats.requests, stats.errors
+            closed = [i for i, stats in enumerate(self.stats) if not stats.open_until]
+            opened = [i for i, stats in enumerate(self.stats) if stats.open_until]
+            closed.sort(key=lambda i: self._expected_latency(self.stats[i], now))
+            opened.sort(key=lambda i: self.stats[i].open_until)
+            return closed + opened
+
+    def record(self, index: int, latency: float, ok: bool):
+        """
+        Outcome of one request. Only failures of the endpoint itself (5xx, 429, timeouts, dropped
+        connections) belong here; a rejected request says nothing about the endpoint's health.
+        """
+        with self._lock:
+            stats = self.stats[index]
+            stats.requests += 1
+            stats.last_used = time.monotonic()
+            stats.outcomes.append(ok)
+            if ok:
+                stats.latencies.append(latency)
+                stats.consecutive_failures = 0
+                return
+            stats.errors += 1
+            stats.consecutive_failures += 1
+            tripped = len(stats.outcomes) >= self.min_samples and stats.error_rate >= self.failure_threshold
+            if (tripped or stats.consecutive_failures >= self.max_consecutive_failures) and not stats.open_until:
+                stats.open_until = time.monotonic() + self.cooldown
+
+    def record_abandoned(self, index: int, elapsed: float):
+        """
+        A hedged request that lost the race: it took at least `elapsed`, so count that as its latency.
+        """
+        with self._lock:
+            self.stats[index].latencies.append(elapsed)
+
+    def hedge_delay(self, index: int, quantile: float) -> Optional[float]:
+        """
+        The endpoint's `quantile` latency, or None until it has `min_samples` successes.
+        """
+        with self._lock:
+            stats = self.stats[index]
+            if len(stats.latencies) < self.min_samples:
+                return None
+            return stats.latency(quantile)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "error_rate": stats.error_rate,
+                    "latency_p50": stats.latency(0.5),
+                    "latency_p95": stats.latency(0.95),
+                    "open": bool(stats.open_until),
+                }
+                for name, stats in zip(self.names, self.stats)
+            }
+
+    def __deepcopy__(self, memo):
+        # Health is shared by every copy of the routed LM
+        return self
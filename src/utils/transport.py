@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import weakref
+from typing import Optional
+
+import dspy
+import httpx
+import litellm
+from dspy.clients.cache import request_cache
+from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler, HTTPHandler
+
+# Providers LiteLLM calls through the OpenAI SDK, which takes its HTTP client from
+# `litellm.client_session` / `litellm.aclient_session` rather than a per-request handler
+OPENAI_SDK_PROVIDERS = {"openai", "azure", "text-completion-openai", "azure_text"}
+
+class _SharedHandler(HTTPHandler):
+    def __deepcopy__(self, memo):
+        # DSPy deep-copies each request to build its cache key; the pool must not be copied
+        return self
+
+class _SharedAsyncHandler(AsyncHTTPHandler):
+    def __init__(self, client: httpx.AsyncClient):
+        # AsyncHTTPHandler.__init__ would open a private client
+        self.timeout = None
+        self.event_hooks = None
+        self.client = client
+        self.client_alias = "shared-transport"
+
+    def __deepcopy__(self, memo):
+        return self
+
+class SharedTransport:
+    """
+    Process-wide pooled HTTP transport for every LM, so large, small and reflection models reuse the
+    same keep-alive connections (and TLS sessions) across stages instead of each opening their own.
+
+    One sync client serves all threads. Async clients are bound to their event loop, so there is one
+    per loop; a loop's owner calls `aclose_loop` before shutting it down. HTTP/2 multiplexing
+    (`httpx[http2]`) is on unless `http2=False`.
+    """
+    def __init__(
+        self,
+        max_connections: int = 64,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: float = 90.0,
+        http2: bool = True,
+        connect_timeout: float = 5.0,
+        timeout: float = 600.0,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections or max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._lock = threading.Lock()
+        self._handler: Optional[_SharedHandler] = None
+        self._async_handlers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _SharedAsyncHandler]" = weakref.WeakKeyDictionary()
+
+    def _client_kwargs(self):
+        return {"http2": self.http2, "limits": self.limits, "timeout": self.timeout, "follow_redirects": True}
+
+    def handler(self) -> HTTPHandler:
+        with self._lock:
+            if self._handler is None:
+                self._handler = _SharedHandler(client=httpx.Client(**self._client_kwargs()))
+            return self._handler
+
+    def async_handler(self) -> AsyncHTTPHandler:
+        """
+        Handler for the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            handler = self._async_handlers.get(loop)
+            if handler is None:
+                handler = self._async_handlers[loop] = _SharedAsyncHandler(httpx.AsyncClient(**self._client_kwargs()))
+            return handler
+
+    def install(self):
+        """
+        Route LiteLLM's OpenAI-SDK providers through the sync pool as well.
+        """
+        litellm.client_session = self.handler().client
+
+    async def aclose_loop(self):
+        """
+        Close the running loop's connections.
+        """
+        with self._lock:
+            handler = self._async_handlers.pop(asyncio.get_running_loop(), None)
+        if handler is not None:
+            await handler.client.aclose()
+
+    def close(self):
+        with self._lock:
+            handler, self._handler = self._handler, None
+        if handler is not None:
+            if litellm.client_session is handler.client:
+                litellm.client_session = None
+            handler.client.close()
+
+    def __deepcopy__(self, memo):
+        # Shared by every LM in the process
+        return self
+
+_transport: Optional[SharedTransport] = None
+_transport_lock = threading.Lock()
+
+def get_transport() -> SharedTransport:
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = SharedTransport()
+            _transport.install()
+        return _transport
+
+def configure_transport(**settings) -> SharedTransport:
+    """
+    Replace the process-wide transport, e.g. `configure_transport(max_connections=128)`.
+    LMs created afterwards use the new pool.
+    """
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, SharedTransport(**settings)
+        _transport.install()
+    if previous is not None:
+        previous.close()
+    return _transport
+
+class TransportLM(dspy.LM):
+    """
+    dspy.LM whose requests go through a SharedTransport (the process-wide one by default).
+    """
+    def __init__(self, model: str, transport: Optional[SharedTransport] = None, **kwargs):
+        super().__init__(model, **kwargs)
+        self.transport = transport or get_transport()
+        try:
+            _, provider, _, _ = litellm.get_llm_provider(model, api_base=kwargs.get("api_base"))
+        except litellm.BadRequestError:
+            provider = None
+        self.per_request_client = provider is not None and provider not in OPENAI_SDK_PROVIDERS
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        if self.per_request_client:
+            kwargs["client"] = self.transport.handler()
+        return super().forward(prompt=prompt, messages=messages, **kwargs)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        if self.per_request_client:
+            kwargs["client"] = self.transport.async_handler()
+        return await super().aforward(prompt=prompt, messages=messages, **kwargs)
+
+    def _get_cached_completion_fn(self, completion_fn, cache):
+        if cache:
+            # The pooled client is not part of what identifies a request
+            completion_fn = request_cache(
+                cache_arg_name="request",
+                ignored_args_for_cache_key=["api_key", "api_base", "base_url", "client"],
+            )(completion_fn)
+        return completion_fn, {"no-cache": True, "no-store": True}
@@ -0,0 +1,33 @@
+import pytest
+
+from src.evaluation.harness import EvaluationHarness
+from src.utils.llm_client import AsyncBatchEngine
+
+@pytest.fixture
+def toy_benchmark():
+    """
+    Factory for the `{"toy": [...]}` benchmark of "What is <i>" questions whose answer is i.
+    """
+    def make(count):
+        return {"toy": [{"id": f"q-{i}", "question": f"What is {i}", "answer": str(i)} for i in range(count)]}
+
+    return make
+
+@pytest.fixture
+def make_harness(tmp_path):
+    """
+    Factory for an EvaluationHarness writing under `tmp_path` on its own AsyncBatchEngine
+    (unless `engine=` is given); every engine it creates is closed after the test.
+    """
+    engines = []
+
+    def make(lms, max_in_flight=16, **kwargs):
+        if "engine" not in kwargs:
+            kwargs["engine"] = AsyncBatchEngine(max_in_flight=max_in_flight)
+            engines.append(kwargs["engine"])
+        kwargs.setdefault("output_dir", str(tmp_path))
+        return EvaluationHarness(lms, **kwargs)
+
+    yield make
+    for engine in engines:
+        engine.close()
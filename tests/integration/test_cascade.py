@@ -0,0 +1,36 @@
+import pytest
+
+from src.evaluation.exporter import read_outputs
+from src.evaluation.harness import Cascade
+from src.models.domain import PromptCandidate, PromptStage
+from tests.mock_llm import MockLM, skill_responder
+
+def test_weak_first_cascade_escalates_only_failed_questions(make_harness, toy_benchmark):
+    small = MockLM("mock/small", responder=skill_responder, cost=0.001)
+    large = MockLM("mock/large", responder=lambda messages: skill_responder([{"content": "skill=90"}, messages[-1]]), cost=0.02)
+    harness = make_harness({"mock/small": small, "mock/large": large})
+    prompt = PromptCandidate(prompt_id="p-1", stage=PromptStage.HARDENED, content="skill=70")
+    benchmark = toy_benchmark(100)
+
+    [full] = harness.evaluate([prompt], benchmark, ["mock/large"])
+    large.calls = 0
+    [result] = harness.evaluate([prompt], benchmark, [Cascade(["mock/small", "mock/large"])])
+
+    assert small.calls == 100
+    assert large.calls == 30
+    assert result.model_used == "mock/small>mock/large"
+    assert result.escalations == 30
+    # The large model answers 90% overall, and covers 20 of the 30 questions the small one missed
+    assert result.accuracy == 0.9 == full.accuracy
+    assert result.cost_by_model == {"mock/small": pytest.approx(0.1), "mock/large": pytest.approx(0.6)}
+    assert result.api_cost == pytest.approx(0.7)
+    assert full.api_cost == pytest.approx(2.0)
+
+    tiers = [record.model_used for record in read_outputs(result.dataset_path)]
+    assert tiers.count("mock/small") == 70 and tiers.count("mock/large") == 30
+
+def test_low_confidence_answers_are_escalated():
+    cascade = Cascade(["s", "l"], confidence=lambda raw: 0.2 if "maybe" in raw else 0.9)
+    assert cascade.should_escalate("maybe 4", "4", True)
+    assert not cascade.should_escalate("surely 4", "4", True)
+    assert cascade.should_escalate("ERROR: timeout", "", False)
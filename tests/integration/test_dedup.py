@@ -0,0 +1,59 @@
+from src.models.domain import PromptCandidate, PromptStage
+from src.optimization.dedup import PromptDeduplicator, canonicalize
+from tests.mock_llm import MockLM, skill_responder
+
+INSTRUCTIONS = """You are solving graduate-level multiple choice questions.
+Read the question carefully and consider every option before answering.
+Eliminate options that contradict known physical laws or definitions.
+Show your reasoning step by step, then state the final answer as a single letter.
+If two options look equally plausible, prefer the one that is more specific."""
+
+def candidate(prompt_id, content):
+    return PromptCandidate(prompt_id=prompt_id, stage=PromptStage.HARDENED, content=content)
+
+def test_canonical_and_near_duplicates_map_to_the_first_prompt():
+    dedup = PromptDeduplicator(threshold=0.85)
+    original = candidate("p-0", INSTRUCTIONS)
+    reformatted = candidate("p-1", "  " + INSTRUCTIONS.replace(" ", "  ").replace("\n", "\n\n\t") + "  \n")
+    reworded = candidate("p-2", INSTRUCTIONS.replace("carefully", "thoroughly"))
+    different = candidate("p-3", "Answer with the number only. Do not explain. Check units and significant figures.")
+
+    assert canonicalize(reformatted.content) == canonicalize(original.content)
+    assert dedup.representative(original) is original
+    assert dedup.representative(reformatted).prompt_id == "p-0"
+    assert dedup.representative(reworded).prompt_id == "p-0"
+    assert dedup.representative(different) is different
+    assert (dedup.exact_duplicates, dedup.near_duplicates) == (1, 1)
+
+def test_one_word_edits_are_not_duplicates_by_default():
+    dedup = PromptDeduplicator()
+    original = candidate("p-0", INSTRUCTIONS)
+    antonym = candidate("p-1", INSTRUCTIONS.replace("more specific", "less specific"))
+    negated = candidate("p-2", INSTRUCTIONS.replace("Show your reasoning", "Do not show your reasoning"))
+
+    assert dedup.representative(original) is original
+    assert dedup.representative(antonym) is antonym
+    assert dedup.representative(negated) is negated
+    assert (dedup.exact_duplicates, dedup.near_duplicates) == (0, 0)
+
+def test_punctuation_case_and_line_order_are_significant():
+    assert canonicalize("Answer if x > 0") != canonicalize("Answer if x < 0")
+    assert canonicalize("Start at -1") != canonicalize("Start at 1")
+    assert canonicalize("Be brief") != canonicalize("BE BRIEF")
+    lines = INSTRUCTIONS.splitlines()
+    assert canonicalize("\n".join(reversed(lines))) != canonicalize(INSTRUCTIONS)
+
+def test_duplicates_reuse_results_instead_of_calling_the_model(make_harness, toy_benchmark):
+    mock = MockLM(responder=skill_responder)
+    harness = make_harness({"mock/model": mock}, dedup=PromptDeduplicator())
+    benchmark = toy_benchmark(50)
+
+    [first] = harness.evaluate([candidate("p-0", "skill=60")], benchmark)
+    assert mock.calls == 50
+
+    copy, new = harness.evaluate([candidate("p-1", "  skill=60 \n"), candidate("p-2", "skill=20")], benchmark)
+
+    assert mock.calls == 100
+    assert copy.prompt_id == "p-1" and copy.duplicate_of == "p-0"
+    assert copy.accuracy == first.accuracy and copy.dataset_path == first.dataset_path
+    assert new.duplicate_of is None and new.accuracy < first.accuracy
@@ -0,0 +1,38 @@
+from src.evaluation.sequential import SequentialComparison
+from src.models.domain import PromptCandidate, PromptStage
+from tests.mock_llm import MockLM, skill_responder
+
+def candidate(prompt_id, skill):
+    return PromptCandidate(prompt_id=prompt_id, stage=PromptStage.BASELINE, content=f"skill={skill}")
+
+def test_losing_candidates_are_cut_off_without_changing_the_winner(make_harness, toy_benchmark):
+    mock = MockLM(responder=skill_responder)
+    harness = make_harness({"mock/model": mock}, max_in_flight=4, max_concurrency=4)
+    benchmark = toy_benchmark(300)
+
+    [incumbent] = harness.evaluate([candidate("incumbent", 70)], benchmark)
+    mock.calls = 0
+    weak, strong = harness.evaluate(
+        [candidate("weak", 35), candidate("strong", 80)], benchmark, incumbents=[incumbent],
+    )
+
+    assert incumbent.accuracy == 0.7
+    assert weak.stopped_early
+    assert weak.questions_evaluated < 100
+    assert weak.accuracy < incumbent.accuracy
+    assert not strong.stopped_early
+    assert strong.questions_evaluated == 300 and strong.accuracy == 0.8
+    # The strong candidate's full pass plus a fraction of the weak one's
+    assert mock.calls < 300 + 100
+    assert max([incumbent, weak, strong], key=lambda r: r.accuracy).prompt_id == "strong"
+
+def test_confidence_bound_stops_only_clear_losers():
+    incumbent = {f"q-{i}": i % 10 < 7 for i in range(1000)}
+    loser = SequentialComparison(incumbent, method="bound")
+    tied = SequentialComparison(incumbent, method="bound")
+    for i in range(1000):
+        loser.update(f"q-{i}", i % 10 < 3)
+        tied.update(f"q-{i}", 1 <= i % 10 < 8)
+
+    assert loser.stopped and loser.questions < 1000
+    assert not tied.stopped
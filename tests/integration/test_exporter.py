@@ -0,0 +1,54 @@
+import json
+
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.evaluation.exporter import DatasetExporter, export_jsonl, load_outputs, read_outputs
+from src.models.domain import ModelOutputRecord
+
+def make_records(eval_id, model, n):
+    for i in range(n):
+        yield ModelOutputRecord(
+            output_id=f"{eval_id}-{i}",
+            eval_id=eval_id,
+            prompt_id="p-001",
+            model_used=model,
+            input_query=f"What is {i}+1?",
+            raw_output=f"The answer is {i + 1}",
+            parsed_answer=str(i + 1),
+            expected_answer=str(i + 1) if i % 3 else "0",
+            is_correct=bool(i % 3),
+        )
+
+def test_persist_streams_row_groups_and_round_trips(tmp_path):
+    exporter = DatasetExporter(row_group_size=100)
+    path = exporter.persist_outputs("eval-1", make_records("eval-1", "large", 250), str(tmp_path))
+
+    assert path.endswith("eval-1.parquet")
+    metadata = pq.ParquetFile(path).metadata
+    assert metadata.num_row_groups == 3
+    assert metadata.num_rows == 250
+
+    records = list(read_outputs(path))
+    assert records == list(make_records("eval-1", "large", 250))
+
+def test_jsonl_compatibility_export(tmp_path):
+    path = DatasetExporter().persist_outputs("eval-1", make_records("eval-1", "large", 5), str(tmp_path))
+    jsonl_path = export_jsonl(path)
+
+    rows = [json.loads(line) for line in open(jsonl_path)]
+    assert [ModelOutputRecord(**row) for row in rows] == list(make_records("eval-1", "large", 5))
+
+def test_cross_run_column_scan(tmp_path):
+    exporter = DatasetExporter()
+    exporter.persist_outputs("eval-1", make_records("eval-1", "large", 30), str(tmp_path))
+    exporter.persist_outputs("eval-2", make_records("eval-2", "small", 30), str(tmp_path))
+    export_jsonl(str(tmp_path / "eval-1.parquet"))
+
+    table = load_outputs(
+        str(tmp_path),
+        columns=["model_used", "is_correct"],
+        filter=ds.field("model_used") == "small",
+    )
+    assert table.num_rows == 30
+    assert table.column("is_correct").to_pylist().count(True) == 20
@@ -0,0 +1,40 @@
+from src.evaluation.failures import FailureSpill, iter_failed_cases
+from src.models.records import EvaluationTally, OutputRecord
+
+TOPICS = [
+    "integrate the polynomial over the interval",
+    "which organelle synthesizes proteins in the cell",
+    "book a flight and cancel the hotel reservation",
+]
+
+def test_weak_model_failures_spill_to_disk_with_a_diverse_sample(tmp_path):
+    spill = FailureSpill(str(tmp_path / "eval-1.failures.jsonl"), sample_size=6)
+    tally = EvaluationTally(
+        eval_id="eval-1", prompt_id="p-1", benchmark_name="SuperGPQA", model_used="small", spill=spill,
+    )
+    for i in range(5000):
+        # Mostly failures of the first kind, a handful of the others
+        topic = TOPICS[0] if i % 500 != 1 else TOPICS[(i // 500) % 3]
+        tally.add(OutputRecord(
+            output_id=f"o-{i}", eval_id="eval-1", prompt_id="p-1", model_used="small",
+            input_query=f"{topic} (case {i})", raw_output="?", parsed_answer="?",
+            expected_answer="42", is_correct=i % 50 == 0,
+        ))
+
+    result = tally.to_model(duration_seconds=10.0)
+
+    assert result.failed_cases_count == 4900
+    assert result.failed_cases_path == spill.path
+    assert len(result.failed_cases) == 6
+    assert {c["question"].split(" (")[0] for c in result.failed_cases} == set(TOPICS)
+    assert sum(1 for _ in iter_failed_cases(result.failed_cases_path)) == 4900
+    assert len(result.model_dump_json()) < 2000
+
+def test_reservoir_strategy_keeps_a_bounded_uniform_pool(tmp_path):
+    spill = FailureSpill(str(tmp_path / "f.jsonl"), sample_size=4, strategy="reservoir")
+    for i in range(1000):
+        spill.add({"question": f"question {i}"})
+    spill.close()
+
+    assert spill.count == 1000
+    assert len(spill.sample()) == 4
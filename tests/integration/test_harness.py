@@ -0,0 +1,144 @@
+import asyncio
+import threading
+from collections import Counter
+
+import litellm
+
+from src.evaluation.exporter import DatasetExporter, read_outputs
+from src.evaluation.harness import EvaluationHarness
+from src.models.domain import PromptCandidate, PromptStage
+from src.runner.state import ExperimentStateManager
+from src.utils.llm_client import AsyncBatchEngine
+from tests.mock_llm import MockLM
+
+def answer_with_question_number(messages):
+    number = messages[-1]["content"].split()[-1]
+    if number == "fail":
+        raise RuntimeError("provider error")
+    return f"The answer is {number}"
+
+def test_harness_fans_out_under_a_global_cap_and_streams_in_order(make_harness, toy_benchmark):
+    strong = MockLM("mock/strong", responder=answer_with_question_number, delay=0.05)
+    weak = MockLM("mock/weak", responder=lambda messages: "The answer is 0", delay=0.05)
+    harness = make_harness({"mock/strong": strong, "mock/weak": weak}, max_concurrency=16)
+    prompts = [
+        PromptCandidate(prompt_id=f"p-{i}", stage=PromptStage.BASELINE, content=f"system prompt {i}")
+        for i in range(2)
+    ]
+    benchmark = toy_benchmark(40)["toy"]
+    benchmark.append({"id": "q-40", "question": "What is fail", "answer": "40"})
+
+    results = harness.evaluate(prompts, {"toy": benchmark})
+
+    # Calls overlap up to the global cap instead of running one at a time
+    assert max(strong.max_in_flight, weak.max_in_flight) <= 16
+    assert strong.max_in_flight + weak.max_in_flight > 8
+    assert len(results) == 4
+
+    by_model = {(r.prompt_id, r.model_used): r for r in results}
+    # The question whose call failed is an error, not a wrong answer
+    assert by_model[("p-0", "mock/strong")].accuracy == 1.0
+    assert by_model[("p-0", "mock/strong")].errors == 1
+    assert by_model[("p-1", "mock/weak")].accuracy == 1 / 41
+
+    result = by_model[("p-0", "mock/strong")]
+    rows = list(read_outputs(result.dataset_path))
+    assert [row.output_id for row in rows] == [f"{result.eval_id}__q-{i}" for i in range(40)]
+    assert result.questions_evaluated == 40
+    assert result.failed_cases_count == 0
+
+def unavailable_for(calls):
+    state = {"calls": 0}
+
+    def responder(messages):
+        state["calls"] += 1
+        if state["calls"] <= calls:
+            raise litellm.ServiceUnavailableError(message="overloaded", llm_provider="openrouter", model="mock/model")
+        return answer_with_question_number(messages)
+
+    return responder
+
+def test_transient_errors_are_retried(make_harness, toy_benchmark):
+    harness = make_harness({"mock/model": MockLM(responder=unavailable_for(10))}, max_in_flight=4, retry_backoff=0.0)
+    prompt = PromptCandidate(prompt_id="p-0", stage=PromptStage.BASELINE, content="system prompt")
+
+    [result] = harness.evaluate([prompt], toy_benchmark(20))
+
+    assert harness.retries == 10
+    assert (result.accuracy, result.errors, result.questions_evaluated) == (1.0, 0, 20)
+
+def test_unanswered_questions_are_not_checkpointed(tmp_path, make_harness, toy_benchmark):
+    lm = MockLM(responder=unavailable_for(10))
+    state = ExperimentStateManager("exp-errors", max_budget_iterations=10, base_dir=str(tmp_path / "state"))
+    harness = make_harness({"mock/model": lm}, max_in_flight=1, state=state, max_retries=0)
+    prompt = PromptCandidate(prompt_id="p-0", stage=PromptStage.BASELINE, content="system prompt")
+    benchmark = toy_benchmark(20)
+
+    [first] = harness.evaluate([prompt], benchmark)
+    assert (first.accuracy, first.errors, first.questions_evaluated) == (1.0, 10, 10)
+
+    [second] = harness.evaluate([prompt], benchmark)
+    state.close()
+
+    assert lm.calls == 30
+    assert (second.accuracy, second.errors, second.questions_evaluated) == (1.0, 0, 20)
+
+class CountingExporter(DatasetExporter):
+    def __init__(self):
+        super().__init__()
+        self.written = Counter()
+        self.threads = set()
+
+    def open_writer(self, eval_id, output_dir):
+        writer = super().open_writer(eval_id, output_dir)
+        write = writer.write
+
+        def counted(record):
+            write(record)
+            self.written[eval_id] += 1
+            self.threads.add(threading.current_thread().name)
+
+        writer.write = counted
+        return writer
+
+def test_every_evaluation_streams_through_a_fixed_writer_pool(make_harness, toy_benchmark):
+    exporter = CountingExporter()
+    streaming = []
+
+    class LastQuestionWaitsLM(MockLM):
+        async def aforward(self, prompt=None, messages=None, **kwargs):
+            if messages[-1]["content"] == "What is 19":
+                # Held until every evaluation has written records, i.e. none is waiting for a writer
+                for _ in range(500):
+                    if len(exporter.written) == 6:
+                        break
+                    await asyncio.sleep(0.01)
+                streaming.append(len(exporter.written))
+            return await super().aforward(prompt=prompt, messages=messages, **kwargs)
+
+    harness = make_harness({"mock/model": LastQuestionWaitsLM(responder=answer_with_question_number)}, exporter=exporter, max_writers=2)
+    prompts = [
+        PromptCandidate(prompt_id=f"p-{i}", stage=PromptStage.BASELINE, content=f"system prompt {i}")
+        for i in range(6)
+    ]
+
+    results = harness.evaluate(prompts, toy_benchmark(20))
+
+    assert streaming == [6] * 6
+    assert len(exporter.threads) <= 2
+    for result in results:
+        rows = list(read_outputs(result.dataset_path))
+        assert [row.output_id for row in rows] == [f"{result.eval_id}__q-{i}" for i in range(20)]
+
+def test_close_shuts_down_only_an_engine_the_harness_created(tmp_path, toy_benchmark):
+    prompt = PromptCandidate(prompt_id="p-0", stage=PromptStage.BASELINE, content="system prompt")
+    with EvaluationHarness({"mock/model": MockLM()}, output_dir=str(tmp_path)) as harness:
+        harness.evaluate([prompt], toy_benchmark(2))
+    assert harness.engine._loop is None
+
+    shared = AsyncBatchEngine()
+    harness = EvaluationHarness({"mock/model": MockLM()}, output_dir=str(tmp_path), engine=shared)
+    harness.evaluate([prompt], toy_benchmark(2))
+    harness.close()
+    assert shared._loop is not None
+    shared.close()
@@ -0,0 +1,67 @@
+import pytest
+
+from src.models.domain import EvaluationResult, PromptCandidate, PromptStage
+from src.optimization.lineage import LineageStore
+
+def result(prompt_id, accuracy, **kwargs):
+    return EvaluationResult(
+        eval_id=f"{prompt_id}__toy__m", prompt_id=prompt_id, benchmark_name="toy", model_used="m",
+        accuracy=accuracy, api_cost=0.0, duration_seconds=1.0, failed_cases=[], **kwargs,
+    )
+
+def test_lineage_queries_and_subtree_scores(tmp_path):
+    store = LineageStore(str(tmp_path / "lineage.sqlite"))
+    store.add(PromptCandidate(prompt_id="root", stage=PromptStage.BASELINE, content="solve it"))
+    # Two branches of mutations, 500 generations deep each; only the second one pays off
+    for branch, gain in (("a", 0.0), ("b", 0.0004)):
+        parent = "root"
+        for depth in range(1, 501):
+            prompt_id = f"{branch}-{depth}"
+            store.add(PromptCandidate(
+                prompt_id=prompt_id, stage=PromptStage.HARDENED, content=f"solve it v{depth}", parent_prompt_id=parent,
+            ))
+            store.record(result(prompt_id, 0.5 + gain * depth))
+            parent = prompt_id
+
+    assert store.depth("b-500") == 500
+    assert store.ancestors("a-3") == ["a-2", "a-1", "root"]
+    assert store.descendants("b-498") == ["b-499", "b-500"]
+    assert sorted(store.descendants("root", max_distance=1)) == ["a-1", "b-1"]
+    assert store.get("b-2").parent_prompt_id == "b-1"
+    assert store.best_in_subtree("root", "toy", "m") == ("b-500", pytest.approx(0.7))
+    assert store.best_in_subtree("a-1", "toy", "m")[1] == 0.5
+    assert [branch for branch, _ in store.rank_branches("root", "toy", "m")] == ["b-1", "a-1"]
+    assert store.subtree_stats("a-1", "toy", "m")["evaluations"] == 500
+
+    with pytest.raises(ValueError):
+        store.add(PromptCandidate(prompt_id="orphan", stage=PromptStage.HARDENED, content="x", parent_prompt_id="missing"))
+
+    statements = []
+    store._conn.set_trace_callback(statements.append)
+    store.best_in_subtree("root", "toy", "m")
+    store.best_in_subtree("b-500", "toy", "m")
+    store.depth("a-500")
+    store._conn.set_trace_callback(None)
+    # One indexed lookup each, however deep the prompt or large its subtree, rather than a tree walk
+    assert len(statements) == 3
+    for sql in statements:
+        plan = store._conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        assert all(detail.startswith("SEARCH") for *_, detail in plan)
+    store.close()
+
+    reopened = LineageStore(str(tmp_path / "lineage.sqlite"))
+    assert reopened.best_in_subtree("b-250", "toy", "m")[0] == "b-500"
+    reopened.close()
+
+def test_record_is_idempotent_and_skips_partial_results():
+    store = LineageStore(":memory:")
+    store.add(PromptCandidate(prompt_id="root", stage=PromptStage.BASELINE, content="solve it"))
+    store.add(PromptCandidate(prompt_id="child", stage=PromptStage.HARDENED, content="solve it v1", parent_prompt_id="root"))
+    store.record(result("root", 0.5))
+    store.record(result("root", 0.5))
+    store.record(result("child", 0.9, stopped_early=True, questions_evaluated=20))
+
+    assert store.subtree_stats("root", "toy", "m") == {
+        "best_prompt_id": "root", "best_accuracy": 0.5, "evaluations": 1, "mean_accuracy": 0.5,
+    }
+    store.close()
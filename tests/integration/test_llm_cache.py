@@ -0,0 +1,80 @@
+import dspy
+
+from src.utils.cache import ResponseCache
+from src.utils.llm_client import CachedLM, get_llm_client
+from tests.mock_llm import MockLM
+
+def run_questions(lm, questions):
+    predict = dspy.Predict("question -> answer")
+    with dspy.context(lm=lm):
+        return [predict(question=q).answer for q in questions]
+
+def test_rerun_on_unchanged_prompts_makes_no_network_calls(tmp_path):
+    mock = MockLM(responder=lambda messages: "[[ ## answer ## ]]\n42\n\n[[ ## completed ## ]]")
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"))
+    lm = CachedLM(mock, cache)
+    questions = ["What is 6*7?", "What is 40+2?"]
+
+    first = run_questions(lm, questions)
+    assert mock.calls == 2
+
+    # A fresh process re-opens the same store
+    reopened = CachedLM(mock, ResponseCache(path=str(tmp_path / "responses.sqlite")))
+    second = run_questions(reopened, questions)
+
+    assert second == first == ["42", "42"]
+    assert mock.calls == 2
+    assert reopened.response_cache.stats()["hits"] == 2
+
+def test_cache_key_includes_sampling_kwargs(tmp_path):
+    mock = MockLM()
+    lm = CachedLM(mock, ResponseCache(path=str(tmp_path / "responses.sqlite")))
+
+    lm(messages=[{"role": "user", "content": "hi"}], temperature=0.0)
+    lm(messages=[{"role": "user", "content": "hi"}], temperature=0.0)
+    lm(messages=[{"role": "user", "content": "hi"}], temperature=0.7)
+
+    assert mock.calls == 2
+    assert lm.response_cache.stats()["misses"] == 2
+
+def test_ttl_and_lru_eviction(tmp_path):
+    mock = MockLM(model="mock/expiring")
+    cache = ResponseCache(
+        path=str(tmp_path / "responses.sqlite"),
+        max_bytes=1500,
+        model_ttls={"mock/expiring": 0.0},
+    )
+    lm = CachedLM(mock, cache)
+
+    lm("first")
+    lm("first")
+    assert mock.calls == 2
+    assert cache.expirations == 1
+
+    for i in range(10):
+        lm(f"question {i}")
+    assert cache.evictions > 0
+    assert cache.stats()["entries"] < 10
+
+def test_eviction_tracks_stored_bytes_across_reopen(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(path=path, max_bytes=1000)
+    for i in range(20):
+        cache.put(f"k{i}", "m", {"answer": "x" * 90})
+    # Overwriting a key replaces its size rather than adding to it
+    cache.put("k19", "m", {"answer": "y" * 90})
+
+    stored = cache._conn.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+    assert cache._bytes == stored <= 1000
+    assert cache.get("k19") == {"answer": "y" * 90}
+    assert cache.get("k0") is None
+    cache.close()
+
+    reopened = ResponseCache(path=path, max_bytes=1000)
+    assert reopened._bytes == stored
+
+def test_get_llm_client_wraps_with_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "sk-test")
+    lm = get_llm_client("openrouter/test-model", cache=ResponseCache(path=str(tmp_path / "r.sqlite")))
+    assert isinstance(lm, CachedLM)
+    assert lm.lm.kwargs["api_base"] == "https://openrouter.ai/api/v1"
@@ -0,0 +1,28 @@
+from src.utils.llm_client import AsyncBatchEngine
+from tests.mock_llm import MockLM
+
+def test_batch_runs_in_waves_and_preserves_order():
+    mock = MockLM(delay=0.05)
+    engine = AsyncBatchEngine(mock, max_in_flight=8)
+    prompts = [f"question {i}" for i in range(40)]
+
+    outputs = engine.run(prompts)
+    engine.close()
+
+    assert [out[0] for out in outputs] == [f"echo: question {i}" for i in range(40)]
+    # Waves of 8 overlapping calls, never more
+    assert mock.max_in_flight == 8
+
+def test_batch_collects_failures_in_place():
+    def responder(messages):
+        if "bad" in messages[-1]["content"]:
+            raise RuntimeError("provider error")
+        return "ok"
+
+    engine = AsyncBatchEngine(MockLM(responder=responder), max_in_flight=2)
+    outputs = engine.run(["good", "bad", [{"role": "user", "content": "good"}]], return_exceptions=True)
+    engine.close()
+
+    assert outputs[0] == ["ok"]
+    assert isinstance(outputs[1], RuntimeError)
+    assert outputs[2] == ["ok"]
@@ -0,0 +1,83 @@
+import itertools
+import threading
+
+from src.evaluation.loaders import PrefetchingLoader
+
+class FakeHub:
+    """Stands in for a streamed HF dataset and counts every record pulled over the network."""
+    def __init__(self, size):
+        self.size = size
+        self.pulled = 0
+
+    def __call__(self, start):
+        for index in range(start, self.size):
+            self.pulled += 1
+            yield {"id": f"SuperGPQA-{index}", "question": f"Q{index}", "answer": str(index % 4)}
+
+def make_loader(hub, cache_dir, **kwargs):
+    return PrefetchingLoader(
+        "SuperGPQA", experiment_id="exp-001", cache_dir=str(cache_dir),
+        segment_size=16, prefetch=8, source=hub, **kwargs,
+    )
+
+def test_second_epoch_reads_from_the_segment_cache(tmp_path):
+    hub = FakeHub(100)
+    first = [r["id"] for r in make_loader(hub, tmp_path)]
+    assert hub.pulled == 100
+
+    second = [r["id"] for r in make_loader(hub, tmp_path)]
+    assert second == first == [f"SuperGPQA-{i}" for i in range(100)]
+    assert hub.pulled == 100
+
+def test_interrupted_run_resumes_from_cache(tmp_path):
+    hub = FakeHub(100)
+    partial = list(itertools.islice(make_loader(hub, tmp_path), 40))
+    assert len(partial) == 40
+
+    resumed = [r["id"] for r in make_loader(hub, tmp_path)]
+    assert resumed == [f"SuperGPQA-{i}" for i in range(100)]
+    # Only records not yet cached (bounded by prefetch read-ahead) were fetched again
+    assert hub.pulled <= 100 + 8
+
+def test_shards_are_deterministic_and_disjoint(tmp_path):
+    hub = FakeHub(200)
+    shards = [
+        [r["id"] for r in make_loader(hub, tmp_path, num_shards=3, shard_index=i, seed=7)]
+        for i in range(3)
+    ]
+    assert sorted(itertools.chain(*shards)) == sorted(f"SuperGPQA-{i}" for i in range(200))
+    assert all(shards)
+    again = [r["id"] for r in make_loader(hub, tmp_path, num_shards=3, shard_index=1, seed=7)]
+    assert again == shards[1]
+    reshuffled = [r["id"] for r in make_loader(hub, tmp_path, num_shards=3, shard_index=1, seed=8)]
+    assert reshuffled != shards[1]
+
+def test_parallel_shard_loaders_share_one_download(tmp_path):
+    hub = FakeHub(300)
+    results = [None, None]
+
+    def consume(i):
+        results[i] = [r["id"] for r in make_loader(hub, tmp_path, num_shards=2, shard_index=i)]
+
+    threads = [threading.Thread(target=consume, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results[0]) + len(results[1]) == 300
+    assert hub.pulled == 300
+
+def test_one_thread_can_interleave_shard_loaders(tmp_path):
+    hub = FakeHub(300)
+    pairs = []
+    consumer = threading.Thread(
+        target=lambda: pairs.extend(zip(*(make_loader(hub, tmp_path, num_shards=2, shard_index=i) for i in range(2)))),
+        daemon=True,
+    )
+    consumer.start()
+    consumer.join(timeout=10)
+
+    assert not consumer.is_alive()
+    assert pairs
+    assert hub.pulled == 300
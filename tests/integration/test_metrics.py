@@ -0,0 +1,74 @@
+import json
+import urllib.request
+
+import dspy
+import httpx
+import litellm
+import pytest
+
+from src.utils.llm_client import RateLimitScheduler, RateLimitedLM
+from src.utils.observability import MetricsCallback
+from tests.mock_llm import MockLM
+
+def run_program(lm, questions):
+    predict = dspy.Predict("question -> answer")
+    with dspy.context(lm=lm):
+        for q in questions:
+            predict(question=q)
+
+def test_metrics_cover_latency_tokens_and_errors():
+    metrics = MetricsCallback()
+    lm = MockLM(responder=lambda messages: "[[ ## answer ## ]]\n4\n\n[[ ## completed ## ]]", callbacks=[metrics])
+    run_program(lm, [f"What is {i}+{4 - i}?" for i in range(5)])
+
+    failing = MockLM(model="mock/failing", responder=lambda messages: 1 / 0, callbacks=[metrics])
+    with pytest.raises(ZeroDivisionError):
+        failing("question")
+
+    snapshot = metrics.snapshot()["models"]
+    ok = snapshot["mock/model"]
+    assert ok["calls"] == 5
+    assert ok["prompt_tokens"] == 50
+    assert ok["completion_tokens"] == 25
+    assert 0 < ok["latency_p50"] <= ok["latency_p95"] <= ok["latency_p99"]
+    assert ok["tokens_per_second"] > 0
+    assert snapshot["mock/failing"]["errors"] == 1
+
+def test_retries_are_attributed_to_the_model():
+    state = {"calls": 0}
+
+    def responder(messages):
+        state["calls"] += 1
+        if state["calls"] <= 2:
+            raise litellm.RateLimitError(
+                message="slow down", llm_provider="openrouter", model="mock/model",
+                response=httpx.Response(429),
+            )
+        return "ok"
+
+    metrics = MetricsCallback()
+    scheduler = RateLimitScheduler(default_rate=100.0, base_backoff=0.001)
+    lm = RateLimitedLM(MockLM(responder=responder, callbacks=[metrics]), scheduler)
+    lm("question")
+    lm("question")
+
+    assert metrics.snapshot()["models"]["mock/model"]["retries"] == 2
+
+def test_prometheus_endpoint_and_json_snapshot(tmp_path):
+    metrics = MetricsCallback()
+    MockLM(callbacks=[metrics])("question")
+
+    server = metrics.serve_prometheus(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url).read().decode()
+    finally:
+        server.shutdown()
+    assert 'dspy_lm_latency_seconds_bucket{model="mock/model",le="+Inf"} 1' in body
+    assert 'dspy_lm_completion_tokens_total{model="mock/model"} 5' in body
+
+    path = tmp_path / "metrics.json"
+    stop = metrics.write_snapshots(str(path), interval=0.01)
+    stop.set()
+    metrics.write_snapshot(str(path))
+    assert json.loads(path.read_text())["models"]["mock/model"]["calls"] == 1
@@ -18,3 +18,28 @@ def test_prompt_candidate():
     )
     assert prompt.stage == PromptStage.BASELINE
     assert prompt.parent_prompt_id is None
+
+def test_compact_records_convert_at_boundaries(tmp_path):
+    from src.evaluation.exporter import DatasetExporter, read_outputs
+    from src.models.records import EvaluationTally, OutputRecord
+
+    tally = EvaluationTally(eval_id="e-1", prompt_id="p-001", benchmark_name="math", model_used="gpt-4")
+    records = []
+    for i in range(4):
+        record = OutputRecord(
+            output_id=f"o-{i}", eval_id="e-" + "1", prompt_id="p-001", model_used="gpt-4",
+            input_query=f"{i}+1?", raw_output=str(i + 1), parsed_answer=str(i + 1),
+            expected_answer="1", is_correct=i == 0,
+        )
+        tally.add(record, cost=0.01)
+        records.append(record)
+
+    assert records[0].eval_id is records[1].eval_id
+    path = DatasetExporter().persist_outputs("e-1", records, str(tmp_path))
+    assert list(read_outputs(path)) == [r.to_model() for r in records]
+    assert OutputRecord.from_model(records[2].to_model()) == records[2]
+
+    result = tally.to_model(duration_seconds=1.5, dataset_path=path)
+    assert result.accuracy == 0.25
+    assert len(result.failed_cases) == 3
+    assert round(result.api_cost, 6) == 0.04
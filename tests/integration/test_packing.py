@@ -0,0 +1,65 @@
+import json
+import re
+
+import pytest
+
+from src.evaluation.packing import parse_packed_answers
+from src.models.domain import PromptCandidate, PromptStage
+from tests.mock_llm import MockLM
+
+PROMPT = PromptCandidate(prompt_id="p", stage=PromptStage.BASELINE, content="Answer the question.")
+
+def answer(question):
+    number = int(question.split()[-1])
+    return f"The answer is {number if number % 3 else -1}"
+
+def packing_responder(messages):
+    if len(messages) == 2:
+        return answer(messages[-1]["content"])
+    questions = re.findall(r"Question \d+:\n(.+)", messages[-1]["content"])
+    return "```json\n" + json.dumps([answer(q) for q in questions]) + "\n```"
+
+@pytest.fixture
+def evaluate(make_harness, toy_benchmark):
+    def run(lm, **kwargs):
+        harness = make_harness({lm.model: lm}, max_in_flight=8, max_concurrency=8, **kwargs)
+        [result] = harness.evaluate([PROMPT], toy_benchmark(30))
+        return harness, result
+
+    return run
+
+def test_packed_evaluation_matches_single_question_results(tmp_path, evaluate):
+    single = MockLM("mock/model", responder=packing_responder, cost=0.01)
+    _, expected = evaluate(single, output_dir=str(tmp_path / "single"))
+
+    packed = MockLM("mock/model", responder=packing_responder, cost=0.01)
+    harness, result = evaluate(packed, output_dir=str(tmp_path / "packed"), pack_size=8)
+
+    # 30 questions in chunks of 8: 4 requests instead of 30
+    assert packed.calls == harness.packed_calls == 4
+    assert harness.packing_fallbacks == 0
+    assert result.accuracy == expected.accuracy == 20 / 30
+    assert result.questions_evaluated == 30
+    assert result.api_cost == pytest.approx(0.04)
+    assert expected.api_cost == pytest.approx(0.30)
+
+def test_unparsable_packed_response_falls_back_to_single_questions(evaluate):
+    def responder(messages):
+        if len(messages) == 3 and "What is 9" in messages[-1]["content"]:
+            return "Here are my answers: 8, 9, 10"
+        return packing_responder(messages)
+
+    lm = MockLM("mock/model", responder=responder)
+    harness, result = evaluate(lm, pack_size=8)
+
+    # The chunk holding q-9 is re-asked one question at a time
+    assert harness.packing_fallbacks == 1
+    assert lm.calls == 4 + 8
+    assert result.accuracy == 20 / 30
+
+def test_parse_packed_answers_requires_one_answer_per_question():
+    assert parse_packed_answers('["The answer is 1", 2]', 2) == ["The answer is 1", "2"]
+    assert parse_packed_answers('Sure!\n["a", "b"]', 2) == ["a", "b"]
+    assert parse_packed_answers('["a"]', 2) is None
+    assert parse_packed_answers('[["a"], "b"]', 2) is None
+    assert parse_packed_answers("not json", 1) is None
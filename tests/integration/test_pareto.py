@@ -0,0 +1,66 @@
+import random
+
+import numpy as np
+
+from src.models.domain import PromptCandidate, PromptStage
+from src.optimization.pareto import ParetoIndex
+from tests.mock_llm import MockLM, skill_responder
+
+def brute_force_frontier(scores):
+    best = scores.max(axis=0)
+    on_best = [i for i in range(len(scores)) if (scores[i] == best).any()]
+    return {
+        i for i in on_best
+        if not any((scores[j] >= scores[i]).all() and (scores[j] > scores[i]).any() for j in on_best)
+    }
+
+def test_incremental_frontier_matches_a_full_rebuild():
+    rng = np.random.default_rng(0)
+    scores = (rng.random((300, 400)) < rng.random((300, 1)) * 0.6).astype(np.float32)
+    questions = [f"q-{i}" for i in range(400)]
+    index = ParetoIndex(initial_candidates=4, initial_instances=16)
+    for i, row in enumerate(scores):
+        index.add(f"p-{i}", dict(zip(questions, row.tolist())))
+
+        if i % 50 == 49:
+            expected = brute_force_frontier(scores[:i + 1])
+            assert set(index.frontier()) == {f"p-{j}" for j in expected}
+
+    best = scores.max(axis=0)
+    weights = index.weights()
+    for prompt_id, weight in weights.items():
+        assert weight == int((scores[int(prompt_id[2:])] == best).sum())
+
+    rng = random.Random(0)
+    assert all(index.sample_parent(rng) in weights for _ in range(200))
+
+def test_merging_more_scores_rebuilds_the_frontier():
+    index = ParetoIndex()
+    index.add("a", {"q1": 1.0, "q2": 0.0})
+    index.add("b", {"q1": 1.0, "q2": 1.0})
+    assert index.frontier() == ["b"]
+    assert index.dominates("b", "a")
+
+    index.add("a", {"q3": 1.0})
+    assert set(index.frontier()) == {"a", "b"}
+    assert index.weights() == {"a": 2, "b": 2}
+
+    index.add("c", {"q1": 0.0, "q2": 0.0, "q3": 0.0, "q4": 1.0, "q5": 1.0, "q6": 1.0})
+    rng = random.Random(0)
+    draws = [index.sample_parent(rng) for _ in range(7000)]
+    # Weights 2:2:3 over the questions each candidate is best on
+    assert abs(draws.count("c") / 7000 - 3 / 7) < 0.03
+
+def test_index_fills_from_persisted_evaluations(make_harness, toy_benchmark):
+    harness = make_harness({"mock/model": MockLM(responder=skill_responder)})
+    prompts = [PromptCandidate(prompt_id=f"p-{s}", stage=PromptStage.BASELINE, content=f"skill={s}") for s in (30, 60)]
+    results = harness.evaluate(prompts, toy_benchmark(100))
+
+    index = ParetoIndex()
+    for result in results:
+        index.add_result(result)
+
+    # skill=60 answers a superset of what skill=30 answers
+    assert index.frontier() == ["p-60"]
+    assert index.num_instances == 100
+    assert index.mean_score("p-30") == 0.3
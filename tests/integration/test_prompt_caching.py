@@ -0,0 +1,90 @@
+import dspy
+
+from src.evaluation.harness import render_messages
+from src.models.domain import PromptCandidate, PromptStage
+from src.utils.llm_client import PrefixCachingLM, cached_prompt_tokens, mark_cacheable_prefix
+from src.utils.observability import MetricsCallback
+from tests.mock_llm import MockLM, make_response
+
+INSTRUCTIONS = "Follow these rules carefully. " * 100
+
+class PromptCacheLM(MockLM):
+    """
+    Provider with prompt caching: a prefix ending in a cache breakpoint (or any system prefix,
+    when `automatic`) is billed as cached input once it has been seen. One token per 4 characters.
+    """
+    def __init__(self, automatic=False, **kwargs):
+        super().__init__(**kwargs)
+        self.automatic = automatic
+        self.seen = set()
+        self.requests = []
+
+    def _respond(self, prompt, messages):
+        self.requests.append(messages)
+        self.calls += 1
+        text = lambda m: m["content"] if isinstance(m["content"], str) else "".join(part["text"] for part in m["content"])
+        prefix = ""
+        for message in messages:
+            if message["role"] != "system":
+                break
+            marked = not isinstance(message["content"], str) and "cache_control" in message["content"][-1]
+            prefix += text(message)
+            if not (marked or self.automatic):
+                prefix = ""
+        total = sum(len(text(m)) for m in messages) // 4
+        cached = len(prefix) // 4 if prefix in self.seen else 0
+        if prefix:
+            self.seen.add(prefix)
+        return make_response(self.model, "The answer is 1", prompt_tokens=total, cached_tokens=cached)
+
+def ask_all(lm, questions):
+    prompt = PromptCandidate(prompt_id="p", stage=PromptStage.BASELINE, content=INSTRUCTIONS)
+    for question in questions:
+        lm(messages=render_messages(prompt, question))
+
+def test_instruction_prefix_is_marked_cacheable():
+    messages = [{"role": "system", "content": INSTRUCTIONS}, {"role": "user", "content": "What is 1"}]
+    marked = mark_cacheable_prefix(messages)
+
+    assert marked[0]["content"] == [{"type": "text", "text": INSTRUCTIONS, "cache_control": {"type": "ephemeral"}}]
+    assert marked[1] == messages[1]
+    # The caller's messages are left untouched
+    assert messages[0]["content"] == INSTRUCTIONS
+    assert mark_cacheable_prefix(messages, min_prefix_chars=10 * len(INSTRUCTIONS)) is messages
+    assert mark_cacheable_prefix([{"role": "user", "content": "hi"}]) == [{"role": "user", "content": "hi"}]
+
+def test_repeated_prefix_is_served_from_provider_cache():
+    provider = PromptCacheLM(model="openrouter/anthropic/claude-3.5-haiku")
+    lm = PrefixCachingLM(provider)
+    ask_all(lm, [f"What is {i}" for i in range(10)])
+
+    assert all(request[0]["content"][-1]["cache_control"] == {"type": "ephemeral"} for request in provider.requests)
+    assert lm.calls == 10
+    # Every call after the first reads the instructions from the cache
+    assert lm.cached_tokens == 9 * (len(INSTRUCTIONS) // 4)
+    assert lm.uncached_tokens < lm.prompt_tokens / 5
+
+def test_automatic_caching_providers_get_plain_requests():
+    provider = PromptCacheLM(model="openrouter/openai/gpt-4o-mini", automatic=True)
+    lm = PrefixCachingLM(provider)
+    ask_all(lm, ["What is 1", "What is 2"])
+
+    assert all(isinstance(request[0]["content"], str) for request in provider.requests)
+    assert lm.cached_tokens == len(INSTRUCTIONS) // 4
+
+def test_cached_tokens_are_tracked_per_model():
+    metrics = MetricsCallback()
+    provider = PromptCacheLM(model="openrouter/anthropic/claude-3.5-haiku", callbacks=[metrics])
+    lm = PrefixCachingLM(provider)
+    with dspy.context(callbacks=[metrics]):
+        ask_all(lm, ["What is 1", "What is 2", "What is 3"])
+
+    stats = metrics.snapshot()["models"]["openrouter/anthropic/claude-3.5-haiku"]
+    assert stats["cached_prompt_tokens"] == lm.cached_tokens == 2 * (len(INSTRUCTIONS) // 4)
+    assert 0.5 < stats["prompt_cache_hit_rate"] < 1
+    assert 'dspy_lm_cached_prompt_tokens_total{model="openrouter/anthropic/claude-3.5-haiku"}' in metrics.to_prometheus()
+
+def test_cached_tokens_from_anthropic_usage():
+    assert cached_prompt_tokens({"prompt_tokens": 100, "cache_read_input_tokens": 60}) == 60
+    assert cached_prompt_tokens({"prompt_tokens": 100}) == 0
+    assert cached_prompt_tokens(None) == 0
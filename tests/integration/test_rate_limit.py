@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import litellm
+
+from src.utils.cache import ResponseCache
+from src.utils.llm_client import (
+    CachedLM,
+    CallPriority,
+    PrefixCachingLM,
+    RateLimitScheduler,
+    RateLimitedLM,
+    get_llm_client,
+)
+from tests.mock_llm import MockLM
+
+def throttled_once(retry_after="0.05"):
+    state = {"calls": 0}
+
+    def responder(messages):
+        state["calls"] += 1
+        if state["calls"] == 1:
+            raise litellm.RateLimitError(
+                message="rate limited",
+                llm_provider="openrouter",
+                model="mock/model",
+                response=httpx.Response(429, headers={"retry-after": retry_after}),
+            )
+        return "ok"
+
+    return responder
+
+def test_429_is_retried_and_teaches_the_scheduler():
+    scheduler = RateLimitScheduler(default_rate=10.0, base_backoff=0.01)
+    lm = RateLimitedLM(MockLM(responder=throttled_once()), scheduler)
+
+    assert lm("hello") == ["ok"]
+
+    bucket = scheduler.buckets["mock/model"]
+    assert scheduler.throttled == 1
+    assert bucket.ceiling == 10.0
+    assert bucket.rate < 10.0
+
+def test_rate_settles_just_under_learned_ceiling():
+    scheduler = RateLimitScheduler(default_rate=4.0)
+    scheduler.on_rate_limited("m")
+    for _ in range(1000):
+        scheduler.on_success("m")
+
+    bucket = scheduler.buckets["m"]
+    assert bucket.rate == scheduler.headroom * bucket.ceiling
+
+def test_burst_of_429s_is_one_backoff_episode_and_ceiling_is_reprobed():
+    scheduler = RateLimitScheduler(model_rates={"m": 8.0}, probe_interval=0.0)
+    episodes = [scheduler.acquire("m") for _ in range(4)]
+    for episode in episodes:
+        scheduler.on_rate_limited("m", episode=episode)
+
+    bucket = scheduler.buckets["m"]
+    assert scheduler.throttled == 4
+    assert bucket.ceiling == 8.0
+    assert bucket.rate == 4.0
+
+    for _ in range(1000):
+        scheduler.on_success("m")
+    assert bucket.ceiling > 8.0
+    assert bucket.rate > 0.9 * 8.0
+
+def test_free_models_start_at_openrouter_free_tier_rate():
+    scheduler = RateLimitScheduler()
+    scheduler.acquire("stepfun/step-3.5-flash:free")
+    assert scheduler.buckets["stepfun/step-3.5-flash:free"].rate == 20 / 60
+
+def test_evaluation_calls_are_served_before_reflection():
+    scheduler = RateLimitScheduler(model_rates={"m": 50.0})
+    scheduler.acquire("m")
+    scheduler.buckets["m"].tokens = 0.0
+    order = []
+
+    async def call(priority):
+        await scheduler.aacquire("m", priority)
+        order.append(priority)
+
+    async def main():
+        await asyncio.gather(
+            *[call(CallPriority.REFLECTION) for _ in range(3)],
+            *[call(CallPriority.EVALUATION) for _ in range(3)],
+        )
+
+    asyncio.run(main())
+    assert order == [CallPriority.EVALUATION] * 3 + [CallPriority.REFLECTION] * 3
+
+def test_get_llm_client_layers_cache_over_scheduler(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "sk-test")
+    lm = get_llm_client(
+        "openrouter/test-model",
+        cache=ResponseCache(path=str(tmp_path / "r.sqlite")),
+        scheduler=RateLimitScheduler(),
+        priority=CallPriority.REFLECTION,
+    )
+    assert isinstance(lm, CachedLM)
+    assert isinstance(lm.lm, RateLimitedLM)
+    assert lm.lm.priority == CallPriority.REFLECTION
+    assert isinstance(lm.lm.lm, PrefixCachingLM)
+    assert lm.lm.lm.lm.num_retries == 0
@@ -0,0 +1,161 @@
+import time
+
+import litellm
+import pytest
+
+from src.utils.llm_client import AsyncBatchEngine, RoutedLM, get_llm_client
+from src.utils.routing import Endpoint, EndpointRouter
+from src.utils.transport import TransportLM
+from tests.mock_llm import StandInServer
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(name, delay=0.0, status=200):
+        server = StandInServer(responder=lambda messages: f"from {name}", delay=delay, status=status)
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.close()
+
+def routed(*named_servers, **kwargs) -> RoutedLM:
+    lms = {
+        name: TransportLM("openrouter/mock/model", api_base=server.url, api_key="sk-test", cache=False, num_retries=0)
+        for name, server in named_servers
+    }
+    return RoutedLM("openrouter/mock/model", lms, **kwargs)
+
+def ask(lm, i=0):
+    return lm(messages=[{"role": "user", "content": f"question {i}"}])[0]
+
+def test_requests_go_to_the_fastest_endpoint(servers):
+    slow, fast = servers("slow", delay=0.2), servers("fast", delay=0.01)
+    lm = routed(("slow", slow), ("fast", fast))
+
+    answers = [ask(lm, i) for i in range(12)]
+
+    # Each endpoint is sampled once, then the fast one takes everything
+    assert slow.requests == 1
+    assert fast.requests == 11
+    assert answers[-1] == "from fast"
+    assert lm.router.snapshot()["fast"]["latency_p50"] < lm.router.snapshot()["slow"]["latency_p50"]
+
+def test_failing_endpoint_fails_over_and_is_taken_out_of_rotation(servers):
+    down, backup = servers("down", status=503), servers("backup")
+    lm = routed(("down", down), ("backup", backup))
+
+    answers = [ask(lm, i) for i in range(10)]
+
+    assert answers == ["from backup"] * 10
+    # Three consecutive failures open the circuit; later requests skip the endpoint
+    assert down.requests == 3
+    assert lm.failovers == 3
+    assert lm.router.snapshot()["down"]["open"]
+
+def test_client_errors_are_raised_without_failover(servers):
+    rejecting, backup = servers("rejecting", status=400), servers("backup")
+    lm = routed(("rejecting", rejecting), ("backup", backup))
+    engine = AsyncBatchEngine(max_in_flight=1)
+    try:
+        for i in range(4):
+            with pytest.raises(litellm.BadRequestError):
+                ask(lm, i)
+            with pytest.raises(litellm.BadRequestError):
+                engine.submit(lm.acall(messages=[{"role": "user", "content": f"async {i}"}]))
+    finally:
+        engine.close()
+
+    # The request was at fault, not the endpoint: no failover and no strike against its health
+    assert (rejecting.requests, backup.requests) == (8, 0)
+    assert lm.failovers == 0
+    assert lm.router.snapshot()["rejecting"]["errors"] == 0
+    assert not lm.router.snapshot()["rejecting"]["open"]
+
+def test_slow_request_is_hedged_to_the_next_endpoint(servers):
+    primary, secondary = servers("primary", delay=0.01), servers("secondary", delay=0.2)
+    # A hedge floor far above normal latency, so only the stalled request is duplicated
+    lm = routed(("primary", primary), ("secondary", secondary), hedge_quantile=0.9, min_hedge_delay=0.5)
+    engine = AsyncBatchEngine(max_in_flight=1)
+    try:
+        # Open connections first so cold starts do not skew the ranking
+        for endpoint_lm in lm.endpoint_lms:
+            engine.submit(endpoint_lm.acall(messages=[{"role": "user", "content": "connect"}]))
+        for i in range(8):
+            engine.submit(lm.acall(messages=[{"role": "user", "content": f"warm-up {i}"}]))
+        assert lm.hedges == 0
+
+        primary.delay = 30.0
+        [answer] = engine.submit(lm.acall(messages=[{"role": "user", "content": "stalled"}]))
+    finally:
+        engine.close()
+
+    # Answered by the hedge; the stalled primary request was abandoned
+    assert answer == "from secondary"
+    assert lm.hedges == 1
+
+def test_router_probes_an_open_endpoint_after_cooldown():
+    router = EndpointRouter(["a", "b"], cooldown=0.05, max_consecutive_failures=2)
+    router.record(1, 0.1, ok=True)
+    router.record(0, 0.1, ok=False)
+    router.record(0, 0.1, ok=False)
+    assert router.rank() == [1, 0]
+
+    time.sleep(0.06)
+    # Back in rotation with no samples, so it is probed first
+    assert router.rank() == [0, 1]
+    assert router.snapshot()["a"] == {
+        "requests": 2, "errors": 2, "error_rate": 0.0, "latency_p50": None, "latency_p95": None, "open": False,
+    }
+
+def test_router_weighs_latency_by_error_rate():
+    router = EndpointRouter(["flaky", "steady"], max_consecutive_failures=10, failure_threshold=0.9)
+    for _ in range(4):
+        router.record(0, 0.1, ok=True)
+        router.record(0, 0.1, ok=False)
+        router.record(1, 0.15, ok=True)
+    assert router.rank() == [1, 0]
+
+def test_get_llm_client_routes_across_endpoints(monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "sk-openrouter")
+    lm = get_llm_client(
+        "openrouter/mock/model",
+        endpoints=[
+            Endpoint("openrouter", "https://openrouter.ai/api/v1"),
+            Endpoint("mirror", "http://127.0.0.1:9/v1", api_key="sk-mirror", model="openai/mock-model"),
+        ],
+        prompt_caching=False,
+        hedge_quantile=0.95,
+    )
+    assert isinstance(lm, RoutedLM)
+    assert lm.model == "openrouter/mock/model"
+    assert lm.router.names == ["openrouter", "mirror"]
+    mirror = lm.endpoint_lms[1]
+    assert (mirror.model, mirror.kwargs["api_key"], mirror.num_retries) == ("openai/mock-model", "sk-mirror", 0)
+    assert lm.endpoint_lms[0].kwargs["api_key"] == "sk-openrouter"
+
+def test_openrouter_key_is_not_sent_to_other_endpoints(monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "sk-openrouter")
+    with pytest.raises(ValueError, match="'mirror'"):
+        get_llm_client(
+            "openrouter/mock/model",
+            endpoints=[
+                Endpoint("openrouter", "https://openrouter.ai/api/v1"),
+                Endpoint("mirror", "http://127.0.0.1:9/v1"),
+            ],
+            prompt_caching=False,
+        )
+
+def test_idle_endpoint_is_probed_again():
+    router = EndpointRouter(["a", "b"], probe_interval=0.05)
+    router.record(0, 0.5, ok=True)
+    router.record(1, 0.1, ok=True)
+    assert router.rank() == [1, 0]
+
+    time.sleep(0.03)
+    router.record(1, 0.1, ok=True)
+    time.sleep(0.03)
+    # "a" has been idle past the probe interval, "b" has not
+    assert router.rank() == [0, 1]
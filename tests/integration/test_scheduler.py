@@ -0,0 +1,67 @@
+from src.models.domain import ExperimentConfig, PromptCandidate, PromptStage
+from src.optimization.scheduler import SuccessiveHalvingScheduler, halving_plan, plan_cost
+from tests.mock_llm import MockLM, skill_responder
+
+def make_candidates(stage, skills):
+    return [
+        PromptCandidate(prompt_id=f"{stage.value.lower()}-{skill}", stage=stage, content=f"skill={skill}")
+        for skill in skills
+    ]
+
+def test_halving_plan_promotes_a_third_to_three_times_the_questions():
+    plan = halving_plan(27, 270, eta=3, min_size=10)
+    assert plan == [(10, 27), (30, 9), (90, 3), (270, 1)]
+    # The final pass only asks what the survivor's earlier rungs did not
+    assert plan_cost(plan) == 27 * 10 + 9 * 20 + 3 * 60 + 180
+
+def test_successive_halving_finds_the_best_prompt_within_the_call_budget(make_harness, toy_benchmark):
+    mock = MockLM(responder=skill_responder)
+    harness = make_harness({"mock/small": mock}, max_in_flight=32)
+    questions = toy_benchmark(300)["toy"]
+    spent = 0
+    config = ExperimentConfig(
+        experiment_id="exp", large_model="mock/large", small_model="mock/small",
+        benchmarks=["toy"], budget_iterations=2000,
+    )
+
+    for stage in (PromptStage.BASELINE, PromptStage.HARDENED):
+        scheduler = SuccessiveHalvingScheduler.from_config(config, harness, min_size=10)
+        skills = [(i * 7) % 90 + 5 for i in range(40)]
+        explored = scheduler.max_candidates(300, 2000, len(skills))
+        results = scheduler.run(make_candidates(stage, skills), "toy", questions)
+
+        # Full passes would fit only 6 candidates in the budget
+        assert explored > 3 * (2000 // 300)
+        # The final pass replays the survivor's rung answers instead of asking them again
+        assert scheduler.calls_spent == plan_cost(halving_plan(explored, 300, min_size=10)) <= 2000
+        spent += scheduler.calls_spent
+        assert results[0].questions_evaluated == 300
+        assert results[0].prompt_id == f"{stage.value.lower()}-{max(skills[:explored])}"
+
+    assert mock.calls == spent
+
+def test_hyperband_spends_the_budget_across_brackets(make_harness, toy_benchmark):
+    mock = MockLM(responder=skill_responder)
+    harness = make_harness({"mock/small": mock}, max_in_flight=32)
+    questions = toy_benchmark(270)["toy"]
+    scheduler = SuccessiveHalvingScheduler(harness, "mock/small", budget_calls=3000, min_size=10)
+
+    results = scheduler.hyperband(make_candidates(PromptStage.BASELINE, list(range(5, 95))), "toy", questions)
+
+    assert scheduler.calls_spent == mock.calls <= 3000
+    assert len(results) > 1
+    assert all(r.questions_evaluated == 270 for r in results)
+    assert results == sorted(results, key=lambda r: -r.accuracy)
+
+def test_packed_calls_are_measured_not_estimated(make_harness, toy_benchmark):
+    def responder(messages):
+        questions = messages[-1]["content"].count("Question ")
+        return "[" + ", ".join(['"x"'] * questions) + "]" if questions else "x"
+
+    mock = MockLM(responder=responder)
+    harness = make_harness({"mock/small": mock}, pack_size=10)
+    scheduler = SuccessiveHalvingScheduler(harness, "mock/small", budget_calls=1000, min_size=10)
+
+    scheduler.run(make_candidates(PromptStage.BASELINE, range(9)), "toy", toy_benchmark(90)["toy"])
+
+    assert scheduler.calls_spent == mock.calls < plan_cost(halving_plan(9, 90, min_size=10)) / 5
@@ -0,0 +1,188 @@
+import errno
+import os
+
+import pytest
+
+from src.evaluation.harness import Cascade
+from src.models.domain import EvaluationResult, PromptCandidate, PromptStage
+from src.optimization.dedup import PromptDeduplicator
+from src.runner.state import ExperimentStateManager, ExperimentStatus
+from tests.mock_llm import MockLM, skill_responder
+
+def make_result(i):
+    return EvaluationResult(
+        eval_id=f"eval-{i}", prompt_id=f"p-{i}", benchmark_name="toy", model_used="m",
+        accuracy=i / 1000, api_cost=0.0, duration_seconds=1.0, failed_cases=[{"question": "q", "output": "o"}],
+    )
+
+def test_state_survives_restart_with_group_committed_saves(tmp_path):
+    state = ExperimentStateManager("exp-1", max_budget_iterations=500, base_dir=str(tmp_path))
+    state.update_status(ExperimentStatus.STAGE_1_RUNNING)
+    for i in range(500):
+        state.save_candidate(PromptCandidate(prompt_id=f"p-{i}", stage=PromptStage.BASELINE, content=f"prompt {i}"))
+        state.save_result(make_result(i))
+        state.increment_iterations()
+    state.checkpoint()
+
+    # 1500 saves share a handful of fsyncs instead of one each
+    assert state._wal.syncs < 50
+    assert not state.can_continue_optimization()
+    state.close()
+
+    resumed = ExperimentStateManager("exp-1", max_budget_iterations=500, base_dir=str(tmp_path))
+    assert resumed.status == ExperimentStatus.STAGE_1_RUNNING
+    assert resumed.current_iterations == 500
+    assert resumed.load_result("eval-250").accuracy == 0.25
+    assert len(resumed.load_candidates()) == 500
+    resumed.close()
+
+def test_compaction_and_torn_tail_recovery(tmp_path):
+    state = ExperimentStateManager("exp-2", max_budget_iterations=10, base_dir=str(tmp_path), compact_bytes=20_000)
+    for i in range(200):
+        state.save_result(make_result(i))
+    state.update_status(ExperimentStatus.STAGE_2_RUNNING)
+    state.close()
+    # Compactions run on the writer thread, which close() drains
+    assert state._wal.compactions > 0
+
+    log_path = os.path.join(str(tmp_path), "exp-2", "wal.log")
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write('0000abcd {"seq": 99999, "record": {"op": "status", "sta')
+
+    resumed = ExperimentStateManager("exp-2", max_budget_iterations=10, base_dir=str(tmp_path))
+    assert resumed.status == ExperimentStatus.STAGE_2_RUNNING
+    assert len(resumed.load_results()) == 200
+    resumed.save_result(make_result(200))
+    resumed.close()
+
+    again = ExperimentStateManager("exp-2", max_budget_iterations=10, base_dir=str(tmp_path))
+    assert again.load_result("eval-200") is not None
+    again.close()
+
+def test_write_failure_is_raised_instead_of_blocking(tmp_path, monkeypatch):
+    state = ExperimentStateManager("exp-disk", max_budget_iterations=10, base_dir=str(tmp_path))
+    state.save_result(make_result(0))
+    state.checkpoint()
+
+    def full_disk(fd):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(os, "fsync", full_disk)
+    # A durable save waits on the failing write and gets its error
+    with pytest.raises(OSError, match="No space left"):
+        state.update_status(ExperimentStatus.STAGE_1_RUNNING)
+    with pytest.raises(OSError, match="No space left"):
+        state.save_result(make_result(1))
+    with pytest.raises(OSError, match="No space left"):
+        state.checkpoint()
+    with pytest.raises(OSError, match="No space left"):
+        state.close()
+
+class Crash(BaseException):
+    pass
+
+def test_interrupted_evaluation_resumes_without_reasking_answered_questions(tmp_path, make_harness, toy_benchmark):
+    benchmark = toy_benchmark(60)
+    prompt = PromptCandidate(prompt_id="p-1", stage=PromptStage.HARDENED, content="skill=50")
+    answered = []
+
+    def crashing(messages):
+        if len(answered) == 40:
+            raise Crash()
+        answered.append(messages[-1]["content"])
+        return skill_responder(messages)
+
+    state = ExperimentStateManager("exp-3", max_budget_iterations=10, base_dir=str(tmp_path / "ckpt"))
+    harness = make_harness({"m": MockLM(responder=crashing)}, max_in_flight=4, output_dir=str(tmp_path / "out"), max_concurrency=4, state=state)
+    try:
+        harness.evaluate([prompt], benchmark)
+    except Crash:
+        pass
+    state.close()
+
+    resumed_state = ExperimentStateManager("exp-3", max_budget_iterations=10, base_dir=str(tmp_path / "ckpt"))
+    mock = MockLM(responder=skill_responder)
+    harness = make_harness({"m": mock}, output_dir=str(tmp_path / "out"), max_concurrency=4, engine=harness.engine, state=resumed_state)
+    [result] = harness.evaluate([prompt], benchmark)
+
+    assert mock.calls == 60 - 40
+    assert result.accuracy == 0.5
+    assert result.questions_evaluated == 60
+
+    # A finished evaluation is reused outright, and its per-question checkpoints are dropped
+    [again] = harness.evaluate([prompt], benchmark)
+    assert mock.calls == 20
+    assert again.eval_id == result.eval_id
+    assert resumed_state.load_outputs(result.eval_id) == {}
+    resumed_state.close()
+
+def test_resumed_cascade_keeps_its_cost_split_and_escalations(tmp_path, make_harness, toy_benchmark):
+    benchmark = toy_benchmark(100)
+    prompt = PromptCandidate(prompt_id="p-1", stage=PromptStage.HARDENED, content="skill=70")
+    cascade = Cascade(["small", "large"])
+
+    def large_responder(messages):
+        return skill_responder([{"content": "skill=90"}, messages[-1]])
+
+    def crashing(messages):
+        if crashing.calls == 60:
+            raise Crash()
+        crashing.calls += 1
+        return skill_responder(messages)
+    crashing.calls = 0
+
+    state = ExperimentStateManager("exp-4", max_budget_iterations=10, base_dir=str(tmp_path / "ckpt"))
+    harness = make_harness(
+        {"small": MockLM("small", responder=crashing, cost=0.001), "large": MockLM("large", responder=large_responder, cost=0.02)},
+        max_in_flight=4, max_concurrency=4, state=state,
+    )
+    try:
+        harness.evaluate([prompt], benchmark, [cascade])
+    except Crash:
+        pass
+    state.close()
+
+    resumed_state = ExperimentStateManager("exp-4", max_budget_iterations=10, base_dir=str(tmp_path / "ckpt"))
+    harness = make_harness(
+        {"small": MockLM("small", responder=skill_responder, cost=0.001), "large": MockLM("large", responder=large_responder, cost=0.02)},
+        engine=harness.engine, max_concurrency=4, state=resumed_state,
+    )
+    [result] = harness.evaluate([prompt], benchmark, [cascade])
+    resumed_state.close()
+
+    assert result.escalations == 30
+    assert result.cost_by_model == {"small": pytest.approx(0.1), "large": pytest.approx(0.6)}
+
+def test_cost_without_an_answer_is_checkpointed_until_the_result(tmp_path):
+    state = ExperimentStateManager("exp-5", max_budget_iterations=10, base_dir=str(tmp_path))
+    state.save_cost("eval-1", {"m": 0.25})
+    state.save_cost("eval-1", {"m": 0.25, "n": 0.1})
+    state.close()
+
+    resumed = ExperimentStateManager("exp-5", max_budget_iterations=10, base_dir=str(tmp_path))
+    assert resumed.load_costs("eval-1") == {"m": 0.5, "n": 0.1}
+    resumed.save_result(make_result(1))
+    assert resumed.load_costs("eval-1") == {}
+    resumed.close()
+
+def test_early_stopped_result_is_not_reused_and_a_full_pass_resumes_it(tmp_path, make_harness, toy_benchmark):
+    mock = MockLM(responder=skill_responder)
+    state = ExperimentStateManager("exp-stop", max_budget_iterations=10, base_dir=str(tmp_path / "state"))
+    harness = make_harness({"m": mock}, max_in_flight=4, max_concurrency=4, state=state, dedup=PromptDeduplicator())
+    benchmark = toy_benchmark(300)
+    weak = PromptCandidate(prompt_id="weak", stage=PromptStage.BASELINE, content="skill=35")
+
+    [incumbent] = harness.evaluate([PromptCandidate(prompt_id="incumbent", stage=PromptStage.BASELINE, content="skill=70")], benchmark)
+    [stopped] = harness.evaluate([weak], benchmark, incumbents=[incumbent])
+    assert stopped.stopped_early and stopped.questions_evaluated < 300
+    asked = mock.calls - 300
+    assert state.load_result(stopped.eval_id) is None
+    assert len(state.load_outputs(stopped.eval_id)) == asked
+
+    [full] = harness.evaluate([weak], benchmark)
+    state.close()
+
+    assert not full.stopped_early
+    assert (full.questions_evaluated, full.accuracy) == (300, 0.35)
+    # Only the questions the cut-off pass never asked
+    assert mock.calls == 300 + 300
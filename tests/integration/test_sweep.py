@@ -0,0 +1,121 @@
+import asyncio
+
+from src.models.domain import ExperimentConfig, PromptCandidate, PromptStage
+from src.runner.sweep import FairGate, SweepRunner
+from tests.mock_llm import MockLM, skill_responder
+
+def make_config(experiment_id, large="mock/large", small="mock/small"):
+    return ExperimentConfig(
+        experiment_id=experiment_id, large_model=large, small_model=small, benchmarks=["toy"], budget_iterations=10,
+    )
+
+def test_sweep_shares_a_per_model_budget(tmp_path, toy_benchmark):
+    mocks = {}
+
+    def factory(model):
+        mocks[model] = MockLM(model, responder=skill_responder, delay=0.02)
+        return mocks[model]
+
+    runner = SweepRunner(lm_factory=factory, max_in_flight_per_model=4, output_dir=str(tmp_path))
+
+    def experiment(context):
+        size = 400 if context.config.experiment_id == "big" else 20
+        prompt = PromptCandidate(prompt_id=context.config.experiment_id, stage=PromptStage.BASELINE, content=f"skill={size // 4}")
+        [result] = context.harness().evaluate([prompt], toy_benchmark(size), [context.config.small_model])
+        return result
+
+    outcomes = runner.run([make_config("big"), make_config("small")], experiment)
+    runner.close()
+
+    assert outcomes["big"].questions_evaluated == 400
+    assert outcomes["small"].questions_evaluated == 20
+    # One client and one budget of 4 per model, not per experiment
+    assert sorted(mocks) == ["mock/large", "mock/small"]
+    assert mocks["mock/small"].max_in_flight <= 4
+    assert runner.gate("mock/small").granted == {"big": 400, "small": 20}
+
+def test_fair_gate_hands_freed_slots_round_robin():
+    gate = FairGate(capacity=1)
+    order = []
+
+    async def call(tenant):
+        await gate.acquire(tenant)
+        order.append(tenant)
+        await asyncio.sleep(0)
+        gate.release()
+
+    async def main():
+        await asyncio.gather(*[call("big") for _ in range(6)], *[call("small") for _ in range(3)])
+
+    asyncio.run(main())
+    # The small tenant queued behind five big calls, yet alternates with them instead of waiting
+    assert order == ["big", "big", "small", "big", "small", "big", "small", "big", "big"]
+
+def test_shared_evaluations_are_computed_once_across_the_grid(tmp_path, toy_benchmark):
+    mocks = {}
+
+    def factory(model):
+        mocks[model] = MockLM(model, responder=skill_responder, delay=0.01)
+        return mocks[model]
+
+    runner = SweepRunner(lm_factory=factory, max_in_flight_per_model=8, output_dir=str(tmp_path))
+    configs = [make_config(f"exp-{i}", small=f"mock/small-{i % 2}") for i in range(4)]
+
+    def experiment(context):
+        baseline = PromptCandidate(prompt_id=f"{context.config.experiment_id}-baseline", stage=PromptStage.BASELINE, content="skill=40")
+        return context.evaluate([baseline], toy_benchmark(30))
+
+    outcomes = runner.run(configs, experiment)
+    runner.close()
+
+    # The large-model baseline is evaluated once for all four experiments, each small model once
+    assert mocks["mock/large"].calls == 30
+    assert mocks["mock/small-0"].calls == 30 and mocks["mock/small-1"].calls == 30
+    for experiment_id, results in outcomes.items():
+        assert [r.accuracy for r in results] == [0.4, 0.4]
+        assert all(r.prompt_id == f"{experiment_id}-baseline" for r in results)
+    assert sum(r.duplicate_of is not None for results in outcomes.values() for r in results) == 8 - 3
+
+def test_benchmark_subsets_and_prompt_variants_are_not_shared(tmp_path, toy_benchmark):
+    runner = SweepRunner(lm_factory=lambda model: MockLM(model, responder=skill_responder), output_dir=str(tmp_path))
+    runs = {"a": ("skill=40", 100), "b": ("skill=40", 10), "c": ("SKILL=40", 100)}
+
+    def experiment(context):
+        content, size = runs[context.config.experiment_id]
+        prompt = PromptCandidate(prompt_id=context.config.experiment_id, stage=PromptStage.BASELINE, content=content)
+        return context.evaluate([prompt], toy_benchmark(size))
+
+    outcomes = {}
+    for experiment_id in runs:
+        outcomes.update(runner.run([make_config(experiment_id)], experiment))
+    runner.close()
+
+    assert all(r.questions_evaluated == 100 for r in outcomes["a"])
+    assert all(r.questions_evaluated == 10 and r.duplicate_of is None for r in outcomes["b"])
+    assert all(r.duplicate_of is None for r in outcomes["c"])
+
+def test_results_with_errors_are_not_shared_with_later_experiments(tmp_path, toy_benchmark):
+    calls = {"count": 0}
+
+    def outage_then_recovery(messages):
+        calls["count"] += 1
+        if calls["count"] <= 5:
+            raise RuntimeError("provider outage")
+        return skill_responder(messages)
+
+    runner = SweepRunner(lm_factory=lambda model: MockLM(model, responder=outage_then_recovery), output_dir=str(tmp_path))
+
+    def experiment(context):
+        prompt = PromptCandidate(prompt_id=context.config.experiment_id, stage=PromptStage.BASELINE, content="skill=40")
+        [result] = context.evaluate([prompt], toy_benchmark(20), [context.config.small_model])
+        return result
+
+    first = runner.run([make_config("first")], experiment)["first"]
+    second = runner.run([make_config("second")], experiment)["second"]
+    third = runner.run([make_config("third")], experiment)["third"]
+    runner.close()
+
+    assert first.errors == 5
+    # Recomputed rather than inheriting the outage; the clean result is then shared
+    assert (second.errors, second.questions_evaluated, second.duplicate_of) == (0, 20, None)
+    assert third.duplicate_of == "second"
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.utils import observability
+from src.utils.cache import ResponseCache
+from src.utils.llm_client import AsyncBatchEngine, CachedLM
+from src.utils.observability import LangfuseCallback, SamplingRule, TracingPolicy, tracing_stage
+from tests.mock_llm import MockLM
+
+class FakeGeneration:
+    def __init__(self, client, **fields):
+        self.client = client
+        self.fields = fields
+
+    def update(self, **fields):
+        self.fields.update(fields)
+
+    def end(self):
+        self.client.ended.append(self.fields)
+
+class FakeLangfuse:
+    """Records exported generations; with `gate`, every export blocks until the gate opens."""
+    def __init__(self, gate=None, **kwargs):
+        self.gate = gate
+        self.ended = []
+
+    def start_generation(self, **fields):
+        if self.gate is not None:
+            self.gate.wait()
+        return FakeGeneration(self, **fields)
+
+    def flush(self):
+        pass
+
+@pytest.fixture
+def fake_langfuse(monkeypatch):
+    monkeypatch.setattr(observability, "Langfuse", lambda **kwargs: FakeLangfuse())
+
+def test_lm_calls_do_not_wait_on_langfuse(monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(observability, "Langfuse", lambda **kwargs: FakeLangfuse(gate=gate))
+    handler = LangfuseCallback("pk", "sk", "http://langfuse.test", batch_size=8, flush_interval=0.05)
+    lm = MockLM(callbacks=[handler])
+
+    for i in range(20):
+        lm(f"question {i}")
+
+    # Every call returned while Langfuse could not accept a single export
+    assert handler.langfuse.ended == []
+    gate.set()
+    handler.flush()
+    assert len(handler.langfuse.ended) == 20
+    assert handler.exporter.exported == 20
+    assert len(handler.active_generations) == 0
+
+def test_errors_are_exported_with_error_level(fake_langfuse):
+    def responder(messages):
+        raise RuntimeError("boom")
+
+    handler = LangfuseCallback("pk", "sk", "http://langfuse.test")
+    lm = MockLM(responder=responder, callbacks=[handler])
+    with pytest.raises(RuntimeError):
+        lm("question")
+
+    handler.flush()
+    [generation] = handler.langfuse.ended
+    assert generation["level"] == "ERROR"
+    assert generation["output"] == "boom"
+
+def test_full_buffer_spills_to_disk(fake_langfuse, tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    handler = LangfuseCallback(
+        "pk", "sk", "http://langfuse.test",
+        capacity=2, batch_size=100, flush_interval=60, spill_path=str(spill),
+    )
+    lm = MockLM(callbacks=[handler])
+    for i in range(5):
+        lm(f"question {i}")
+
+    assert len(handler.exporter) == 2
+    assert handler.exporter.spilled == 3
+    lines = [json.loads(line) for line in spill.read_text().splitlines()]
+    assert [line["model"] for line in lines] == ["mock/model"] * 3
+
+def test_wrapped_lms_are_traced_once_per_call(fake_langfuse, tmp_path):
+    handler = LangfuseCallback("pk", "sk", "http://langfuse.test")
+    lm = CachedLM(MockLM(callbacks=[handler]), ResponseCache(path=str(tmp_path / "r.sqlite")))
+    lm("question")
+    lm("question")
+    lm.copy(temperature=0.5)
+
+    handler.flush()
+    assert len(handler.langfuse.ended) == 2
+
+def test_orphaned_generations_are_closed_with_timeout(fake_langfuse):
+    handler = LangfuseCallback("pk", "sk", "http://langfuse.test", generation_ttl=0.05)
+    lm = MockLM()
+    # An LM call whose end callback never fires
+    handler.on_lm_start(call_id="orphan", instance=lm, inputs={"prompt": "lost"})
+    time.sleep(0.1)
+
+    MockLM(callbacks=[handler])("question")
+    handler.flush()
+
+    assert "orphan" not in handler.active_generations
+    assert handler.active_generations.stats() == {"active": 0, "expired": 1, "evicted": 0}
+    levels = sorted(g.get("level", "DEFAULT") for g in handler.langfuse.ended)
+    assert levels == ["DEFAULT", "WARNING"]
+
+def test_registry_memory_stays_flat(monkeypatch):
+    monkeypatch.setattr(observability, "Langfuse", FakeLangfuse)
+    handler = LangfuseCallback("pk", "sk", "http://langfuse.test", max_active_generations=100)
+    lm = MockLM()
+    for i in range(1000):
+        handler.on_lm_start(call_id=f"call-{i}", instance=lm, inputs={})
+
+    assert len(handler.active_generations) == 100
+    assert handler.active_generations.evicted == 900
+    handler.flush()
+    assert len(handler.langfuse.ended) == 900
+
+def test_policy_samples_per_stage_but_keeps_errors(fake_langfuse):
+    policy = TracingPolicy(stages={"HARDENED": SamplingRule(head=0.0)}, max_payload_chars=64)
+    handler = LangfuseCallback("pk", "sk", "http://langfuse.test", policy=policy)
+
+    def responder(messages):
+        if "fail" in messages[-1]["content"]:
+            raise RuntimeError("boom")
+        return "x" * 500
+
+    lm = MockLM(responder=responder, callbacks=[handler])
+    with tracing_stage("HARDENED"):
+        for i in range(10):
+            lm(f"question {i}")
+        with pytest.raises(RuntimeError):
+            lm("fail")
+    lm("question outside the stage")
+
+    handler.flush()
+    assert handler.sampled_out == 10
+    errored, traced = handler.langfuse.ended
+    assert errored["level"] == "ERROR"
+    assert errored["metadata"]["stage"] == "HARDENED"
+    assert traced["output"]["truncated"] is True
+    assert traced["output"]["original_chars"] > 500
+    assert len(traced["output"]["sha256"]) == 64
+
+def test_engine_batches_carry_the_tracing_stage(fake_langfuse):
+    handler = LangfuseCallback("pk", "sk", "http://langfuse.test")
+    engine = AsyncBatchEngine(MockLM(callbacks=[handler]), max_in_flight=4)
+    with tracing_stage("EVALUATION"):
+        engine.run([f"question {i}" for i in range(8)])
+    engine.close()
+
+    handler.flush()
+    assert {g["metadata"]["stage"] for g in handler.langfuse.ended} == {"EVALUATION"}
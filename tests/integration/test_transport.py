@@ -0,0 +1,79 @@
+import asyncio
+import uuid
+
+import pytest
+
+from src.utils.llm_client import AsyncBatchEngine
+from src.utils.transport import SharedTransport, TransportLM
+from tests.mock_llm import StandInServer
+
+@pytest.fixture
+def server():
+    server = StandInServer(responder=lambda messages: "The answer is 42", delay=0.02)
+    yield server
+    server.close()
+
+def make_lm(model, server, transport, **kwargs):
+    return TransportLM(model, transport=transport, api_base=server.url, api_key="sk-test", cache=False, **kwargs)
+
+def test_models_share_keep_alive_connections(server):
+    transport = SharedTransport(max_connections=4)
+    large = make_lm("openrouter/mock/large", server, transport)
+    small = make_lm("openrouter/mock/small", server, transport)
+    reflection = make_lm("openrouter/mock/reflection", server, transport)
+
+    for lm in (large, small, reflection, large, small):
+        assert lm(messages=[{"role": "user", "content": "What is 6*7?"}]) == ["The answer is 42"]
+    transport.close()
+
+    # Five calls from three LMs over one connection
+    assert server.requests == 5
+    assert server.connections == 1
+
+def test_async_calls_of_all_models_reuse_a_bounded_pool(server):
+    transport = SharedTransport(max_connections=4)
+    large = make_lm("openrouter/mock/large", server, transport)
+    small = make_lm("openrouter/mock/small", server, transport)
+    engine = AsyncBatchEngine(max_in_flight=16, transport=transport)
+
+    async def ask_both(round):
+        return await asyncio.gather(*(
+            lm.acall(messages=[{"role": "user", "content": f"{round} question {i}"}])
+            for lm in (large, small)
+            for i in range(16)
+        ))
+
+    try:
+        outputs = engine.submit(ask_both(0)) + engine.submit(ask_both(1))
+    finally:
+        engine.close()
+        transport.close()
+
+    assert len(outputs) == server.requests == 64
+    # 32 concurrent requests per round are queued onto at most 4 connections, kept across rounds
+    assert server.connections <= 4
+
+def test_request_cache_ignores_the_pooled_client(server):
+    transport = SharedTransport()
+    lm = TransportLM("openrouter/mock/large", transport=transport, api_base=server.url, api_key="sk-test", cache=True)
+    question = f"Is {uuid.uuid4()} cached?"
+
+    first = lm(messages=[{"role": "user", "content": question}])
+    second = lm(messages=[{"role": "user", "content": question}])
+    transport.close()
+
+    assert first == second
+    assert server.requests == 1
+
+def test_transport_settings():
+    transport = SharedTransport(max_connections=8, keepalive_expiry=30.0, http2=False)
+    assert transport.limits.max_connections == 8
+    assert transport.limits.max_keepalive_connections == 8
+    assert transport.limits.keepalive_expiry == 30.0
+    assert transport.handler() is transport.handler()
+    assert transport.handler().client._transport._pool._http2 is False
+    transport.close()
+
+    pooled = SharedTransport()
+    assert pooled.handler().client._transport._pool._http2 is True
+    pooled.close()
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import dspy
+import litellm
+
+_calls_lock = threading.Lock()
+
+def make_response(model, content, prompt_tokens=10, completion_tokens=5, cached_tokens=None):
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+    if cached_tokens is not None:
+        usage["prompt_tokens_details"] = {"cached_tokens": cached_tokens}
+    return litellm.ModelResponse(
+        model=model,
+        choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        usage=usage,
+    )
+
+def skill_responder(messages):
+    """
+    Scripted model whose accuracy is set by the system prompt: "skill=70" answers 70% of
+    "What is <n>" questions correctly, always the same ones.
+    """
+    skill = int(messages[0]["content"].split("=")[1])
+    number = int(messages[-1]["content"].split()[-1])
+    return f"The answer is {number if (number * 37) % 100 < skill else -1}"
+
+class MockLM(dspy.LM):
+    """
+    Offline stand-in for an OpenRouter model.
+    `responder` maps the rendered messages to the completion text, so tests can
+    script both successes and failures. Every forward call is counted as a network call
+    and billed `cost`.
+    """
+    def __init__(self, model="mock/model", responder=None, delay=0.0, callbacks=None, cost=0.0, **kwargs):
+        super().__init__(model=model, cache=False, callbacks=callbacks, **kwargs)
+        self.responder = responder or (lambda messages: f"echo: {messages[-1]['content']}")
+        self.delay = delay
+        self.cost = cost
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _respond(self, prompt, messages):
+        messages = messages or [{"role": "user", "content": prompt}]
+        with _calls_lock:
+            self.calls += 1
+        response = make_response(self.model, self.responder(messages))
+        response._hidden_params["response_cost"] = self.cost
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        if self.delay:
+            time.sleep(self.delay)
+        return self._respond(prompt, messages)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            return self._respond(prompt, messages)
+        finally:
+            self.in_flight -= 1
+
+class StandInServer:
+    """
+    Local OpenAI-compatible `/chat/completions` endpoint standing in for a provider. Answers with
+    `responder(messages)` after `delay` seconds (or `status` with an error body) and records the
+    client port of every request, so tests can count the connections used.
+    """
+    def __init__(self, responder=None, delay=0.0, status=200):
+        self.responder = responder or (lambda messages: f"echo: {messages[-1]['content']}")
+        self.delay = delay
+        self.status = status
+        self.ports = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with _calls_lock:
+                    server.ports.append(self.client_address[1])
+                if server.delay:
+                    time.sleep(server.delay)
+                if server.status != 200:
+                    body = {"error": {"message": "stand-in failure", "type": "server_error", "code": server.status}}
+                else:
+                    body = make_response(request["model"], server.responder(request["messages"])).model_dump(warnings=False)
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(server.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    @property
+    def requests(self) -> int:
+        return len(self.ports)
+
+    @property
+    def connections(self) -> int:
+        return len(set(self.ports))
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()